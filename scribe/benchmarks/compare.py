@@ -0,0 +1,106 @@
+"""
+Compares two benchmark results of benchmarks.run, e.g. of the main branch and a change:
+
+    python -m benchmarks.compare base.json head.json --fail-above 10
+
+Throughputs (*_per_second) are better when higher, latencies (*_ms, seconds) when lower. With --fail-above the exit
+code is 1 if any of them regressed by more than the given percent.
+"""
+import argparse
+import json
+import sys
+from typing import Any
+
+
+def flatten(results: dict[str, Any], prefix: str = '') -> dict[str, float]:
+    """
+    :returns: dict - Numeric metrics by their dotted path, the run meta is skipped.
+    """
+    metrics = {}
+    for key, value in results.items():
+        if not prefix and key == 'meta':
+            continue
+
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f'{path}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[path] = float(value)
+
+    return metrics
+
+
+def direction(path: str) -> int:
+    """
+    :returns: int - 1 if the metric is better when higher, -1 if when lower, 0 if it is not a performance metric.
+    """
+    key = path.rsplit('.', 1)[-1]
+    if key.endswith('_per_second'):
+        return 1
+    if key.endswith('_ms') or key == 'seconds' or '_median_ms.' in path:
+        return -1
+
+    return 0
+
+
+def compare(base: dict, head: dict) -> list[tuple[str, float, float, float | None, int]]:
+    """
+    :returns: list - (path, base, head, change in percent, direction) of the metrics of both results.
+    """
+    base_metrics, head_metrics = flatten(base), flatten(head)
+    rows = []
+    for path, old in base_metrics.items():
+        if path not in head_metrics:
+            continue
+        new = head_metrics[path]
+        change = (new - old) / old * 100 if old else None
+        rows.append((path, old, new, change, direction(path)))
+
+    return rows
+
+
+def regressions(rows: list[tuple[str, float, float, float | None, int]], percent: float) -> list[str]:
+    return [
+        path for path, _, _, change, sign in rows
+        if sign and change is not None and -sign * change > percent
+    ]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base', help='results of the baseline run')
+    parser.add_argument('head', help='results of the compared run')
+    parser.add_argument('--fail-above', type=float, help='regression percent failing the comparison')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    with open(args.base) as base, open(args.head) as head:
+        base, head = json.load(base), json.load(head)
+
+    print(f"base {base['meta'].get('commit')}, head {head['meta'].get('commit')}")
+    if base['meta'].get('params') != head['meta'].get('params'):
+        print('warning: the runs have different params')
+
+    rows = compare(base, head)
+    width = max((len(row[0]) for row in rows), default=0)
+    for path, old, new, change, sign in rows:
+        delta = 'n/a' if change is None else f'{change:+.1f}%'
+        mark = ''
+        if sign and change is not None and change:
+            mark = 'better' if sign * change > 0 else 'worse'
+        print(f'{path:<{width}}  {old:>12g}  {new:>12g}  {delta:>8}  {mark}')
+
+    if args.fail_above is not None:
+        failed = regressions(rows, args.fail_above)
+        if failed:
+            print(f'regressed by more than {args.fail_above}%: {", ".join(failed)}')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Generated benchmark corpus. The same seed always yields the same documents, queries and answer.
+"""
+from typing import NamedTuple
+
+import pymupdf
+from faker import Faker
+
+
+class Corpus(NamedTuple):
+    files: dict[str, bytes]
+    queries: list[str]
+    size: int  # bytes of text
+
+
+def generate_corpus(
+        docs: int,
+        paragraphs: int = 8,
+        queries: int = 200,
+        file_format: str = 'pdf',
+        seed: int = 42
+) -> Corpus:
+    """
+    :param paragraphs: Paragraphs per document, pdf documents get a page per paragraph.
+    :param file_format: pdf for the semantic ingestion, txt for the base one.
+    :param queries: Amount of queries, sampled from the sentences of the corpus.
+    """
+    fake = Faker()
+    fake.seed_instance(seed)
+
+    files = {}
+    sentences = []
+    size = 0
+    for i in range(docs):
+        texts = [fake.paragraph(nb_sentences=8) for _ in range(paragraphs)]
+        sentences.extend(sentence for text in texts for sentence in text.split('. '))
+        size += sum(len(text) for text in texts)
+
+        files[f'doc-{i:05d}.{file_format}'] = to_pdf(texts) if file_format == 'pdf' else '\n\n'.join(texts).encode()
+
+    queries = [fake.random_element(sentences) for _ in range(queries)]
+
+    return Corpus(files, queries, size)
+
+
+def generate_answer(tokens: int, seed: int = 42) -> str:
+    fake = Faker()
+    fake.seed_instance(seed)
+
+    return ' '.join(fake.words(tokens))
+
+
+def to_pdf(pages: list[str]) -> bytes:
+    doc = pymupdf.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=11)
+
+    return doc.tobytes()
@@ -0,0 +1,108 @@
+"""
+Deterministic stand-ins for the embedding and chat model providers, so the benchmarks run offline and their
+results depend on scribe only.
+"""
+import asyncio
+import re
+from hashlib import blake2b
+from typing import Any, AsyncIterator, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.adapters.chat_model import AbstractChatModel, LangchainChatModel
+from src.domain.models import ChatModel, EmbeddingModel
+from src.domain.services.chat_model_builder import ChatModelBuilder
+from src.domain.services.embedding_model_builder import EmbeddingModelBuilder
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class FakeEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Hashes the words of a text into a fixed number of dimensions, so texts sharing words are close and
+    the retrieval results are meaningful. Same texts always get the same embeddings.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        matrix = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            for word in WORD_PATTERN.findall(text.lower()):
+                digest = int.from_bytes(blake2b(word.encode(), digest_size=8).digest(), 'little')
+                matrix[row, digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+
+        return list(matrix)
+
+
+class FakeEmbeddingModelBuilder(EmbeddingModelBuilder):
+    """
+    Builds the fake embedding function for every embedding model, the embedding caches are kept.
+    """
+
+    def __init__(self, *args, dimensions: int = 384, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dimensions = dimensions
+
+    def build(self, embedding_model: EmbeddingModel) -> FakeEmbeddingFunction:
+        return FakeEmbeddingFunction(self.dimensions)
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """
+    Streams the same answer word by word, waiting token_delay seconds before every word.
+    """
+    answer: str
+    token_delay: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake-streaming'
+
+    def _generate(
+            self,
+            messages: list[BaseMessage],
+            stop: Optional[list[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _astream(
+            self,
+            messages: list[BaseMessage],
+            stop: Optional[list[str]] = None,
+            run_manager: Optional[Any] = None,
+            **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for token in re.findall(r'\S+\s*', self.answer):
+            if self.token_delay > 0:
+                await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeChatModelBuilder(ChatModelBuilder):
+    """
+    Builds the fake streaming chat model for every chat model, wrapped in the LangchainChatModel, so the turns
+    go through the same SSE encoding and coalescing as the real ones.
+    """
+
+    def __init__(self, *args, answer: str, token_delay: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.answer = answer
+        self.token_delay = token_delay
+
+    def build(self, chat_model: ChatModel) -> AbstractChatModel:
+        return LangchainChatModel(
+            FakeStreamingChatModel(answer=self.answer, token_delay=self.token_delay),
+            coalesce_window=self.coalesce_window,
+            coalesce_chars=self.coalesce_chars
+        )
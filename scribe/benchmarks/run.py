@@ -0,0 +1,426 @@
+"""
+Offline benchmark of the ingestion, retrieval and chat turns through the FastAPI app.
+
+Chroma and the app are served in-process by uvicorn on free local ports, the embedding and chat models are replaced
+with the deterministic fakes of benchmarks.fakes, the corpus is generated. Results are written as JSON, so runs of
+different commits can be compared with benchmarks.compare.
+
+Run from the scribe directory:
+
+    python -m benchmarks.run --docs 100 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Sequence
+
+import httpx
+import uvicorn
+
+
+class BackgroundServer:
+    """
+    Serves an ASGI app by uvicorn in a daemon thread.
+    """
+
+    def __init__(self, app: Any, port: int):
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(
+            app,
+            host='127.0.0.1',
+            port=port,
+            lifespan='off',
+            log_config=None,  # keeps the logging configured by the app
+            log_level='warning',
+            access_log=False
+        ))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> 'BackgroundServer':
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f'Server on the port {self.port} failed to start.')
+            time.sleep(0.05)
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def latency_stats(samples: Sequence[float]) -> dict[str, float]:
+    """
+    :returns: dict - Mean and percentiles of the samples in milliseconds.
+    """
+    if len(samples) < 2:
+        samples = list(samples) * 2
+    quantiles = statistics.quantiles(samples, n=100, method='inclusive')
+
+    return {
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(quantiles[49] * 1000, 3),
+        'p95_ms': round(quantiles[94] * 1000, 3),
+        'p99_ms': round(quantiles[98] * 1000, 3)
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def post(client: httpx.AsyncClient, url: str, **kwargs) -> dict:
+    res = await client.post(url, **kwargs)
+    res.raise_for_status()
+
+    return res.json()
+
+
+async def setup_entities(client: httpx.AsyncClient, args: argparse.Namespace) -> dict[str, int]:
+    """
+    Creates the collection, processing config and base chat the benchmarks run against.
+
+    :returns: dict - Ids of the vec_col, cnf and base_chat.
+    """
+    api_key = await post(client, '/api-key/', json={'name': 'bench', 'api_key': 'fake'})
+    embed_model = await post(client, '/embed-model/', json={
+        'name': 'all-MiniLM-L6-v2',
+        'device': 'cpu',
+        'api_key_credential_id': 0
+    })
+    vec_col = await post(client, '/vec-col/', json={
+        'name': 'bench',
+        'embedding_model_id': embed_model['id'],
+        'distance_func': 'cosine'
+    })
+
+    if args.ingestion == 'semantic':
+        cnf = await post(client, '/sem-doc-proc-cnf/', json={'name': 'bench', 'thresh': 0.75, 'max_chunk_size': 512})
+    else:
+        cnf = await post(client, '/doc-proc-cnf/', json={
+            'name': 'bench',
+            'chunking_strategy': 'basic',
+            'max_characters': 1000
+        })
+
+    # anthropic models count tokens without tiktoken's encodings download
+    chat_model = await post(client, '/chat-model/', json={
+        'name': 'claude-3-5-haiku-20241022',
+        'api_key_credential_id': api_key['id']
+    })
+    base_chat = await post(client, '/base-chat/', json={
+        'name': 'bench',
+        'desc': 'benchmark chat',
+        'chat_model_id': chat_model['id'],
+        'vec_col_id': vec_col['id'],
+        'answer_cache': args.answer_cache
+    })
+
+    return {'vec_col': vec_col['id'], 'cnf': cnf['id'], 'base_chat': base_chat['id']}
+
+
+async def bench_ingestion(
+        client: httpx.AsyncClient,
+        ids: dict[str, int],
+        files: dict[str, bytes],
+        size: int,
+        args: argparse.Namespace
+) -> dict:
+    """
+    Uploads the corpus in jobs of files_per_job files and waits for all the jobs to complete.
+    """
+    items = list(files.items())
+    start = time.perf_counter()
+
+    pending = set()
+    for i in range(0, len(items), args.files_per_job):
+        job = await post(
+            client,
+            f'/vec-doc/{ids["vec_col"]}',
+            data={'doc_processing_cnf_id': ids['cnf'], 'cnf_type': args.ingestion},
+            files=[('files', (name, content)) for name, content in items[i:i + args.files_per_job]]
+        )
+        pending.add(job['id'])
+
+    chunks = 0
+    while pending:
+        await asyncio.sleep(0.05)
+        for job_id in list(pending):
+            res = await client.get(f'/ingestion-job/{job_id}')
+            res.raise_for_status()
+            job = res.json()
+
+            if job['status'] in ('failed', 'cancelled'):
+                raise RuntimeError(f"Ingestion job {job_id} {job['status']}: {job['error']}")
+            if job['status'] == 'completed':
+                pending.discard(job_id)
+                chunks += job['chunks_stored']
+
+    seconds = time.perf_counter() - start
+
+    return {
+        'docs': len(items),
+        'chunks': chunks,
+        'bytes': size,
+        'seconds': round(seconds, 3),
+        'docs_per_second': round(len(items) / seconds, 2),
+        'chunks_per_second': round(chunks / seconds, 2),
+        'text_mb_per_second': round(size / seconds / 1024 / 1024, 3)
+    }
+
+
+async def bench_queries(
+        client: httpx.AsyncClient,
+        ids: dict[str, int],
+        queries: list[str],
+        args: argparse.Namespace
+) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def query(query_string: str, record: bool = True) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await post(client, f'/vec-doc/{ids["vec_col"]}/query', json={
+                'query_string': query_string,
+                'n_results': args.n_results,
+                'mode': args.mode
+            })
+            if record:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(query(query_string, record=False) for query_string in queries[:args.warmup]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(query(query_string) for query_string in queries))
+    seconds = time.perf_counter() - start
+
+    return {
+        'queries': len(queries),
+        'concurrency': args.concurrency,
+        'mode': args.mode,
+        'queries_per_second': round(len(queries) / seconds, 2),
+        **latency_stats(latencies)
+    }
+
+
+async def bench_streams(
+        client: httpx.AsyncClient,
+        ids: dict[str, int],
+        queries: list[str],
+        args: argparse.Namespace
+) -> dict:
+    """
+    Streams args.streams turns, args.concurrency at once. Time to first token is measured by the client,
+    stage durations are the medians of the turns' stats events.
+    """
+    semaphore = asyncio.Semaphore(args.concurrency)
+    first_tokens, durations, stages = [], [], {}
+    counts = {'tokens': 0, 'events': 0}
+
+    async def turn(query_string: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            first_token = None
+            event = None
+            async with client.stream('POST', f'/base-chat/{ids["base_chat"]}/stream', json={
+                'query_string': query_string,
+                'n_results': args.n_results,
+                'mode': args.mode,
+                'stream_format': args.stream_format
+            }) as res:
+                res.raise_for_status()
+                async for line in res.aiter_lines():
+                    if line.startswith('event: '):
+                        event = line.removeprefix('event: ')
+                        counts['events'] += 1
+                        if event == 'response' and first_token is None:
+                            first_token = time.perf_counter()
+                    elif line.startswith('data: ') and event == 'stats':
+                        stats = json.loads(line.removeprefix('data: '))
+                        counts['tokens'] += stats['tokens'] or 0
+                        for stage, seconds in stats['stages'].items():
+                            stages.setdefault(stage, []).append(seconds)
+
+            durations.append(time.perf_counter() - start)
+            if first_token is not None:
+                first_tokens.append(first_token - start)
+
+    turns = [queries[i % len(queries)] for i in range(args.streams)]
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(query_string) for query_string in turns))
+    seconds = time.perf_counter() - start
+
+    return {
+        'streams': args.streams,
+        'concurrency': args.concurrency,
+        'stream_format': args.stream_format,
+        'streams_per_second': round(args.streams / seconds, 2),
+        'tokens_per_second': round(counts['tokens'] / seconds, 2),
+        'events_per_stream': round(counts['events'] / args.streams, 1),
+        'first_token': latency_stats(first_tokens),
+        'duration': latency_stats(durations),
+        'server_stage_median_ms': {
+            stage: round(statistics.median(values) * 1000, 3) for stage, values in sorted(stages.items())
+        }
+    }
+
+
+async def run_benchmarks(port: int, files: dict[str, bytes], size: int, queries: list[str], args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=600, limits=limits) as client:
+        ids = await setup_entities(client, args)
+
+        return {
+            'ingestion': await bench_ingestion(client, ids, files, size, args),
+            'query': await bench_queries(client, ids, queries, args),
+            'stream': await bench_streams(client, ids, queries, args)
+        }
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=100, help='documents in the generated corpus')
+    parser.add_argument('--paragraphs', type=int, default=8, help='paragraphs (pdf pages) per document')
+    parser.add_argument(
+        '--ingestion',
+        choices=['semantic', 'base'],
+        default='semantic',
+        help='semantic ingests pdf files; base ingests txt files with unstructured, which needs the nltk data locally'
+    )
+    parser.add_argument('--files-per-job', type=int, default=10, help='files uploaded with one ingestion job')
+    parser.add_argument('--queries', type=int, default=500, help='measured queries')
+    parser.add_argument('--warmup', type=int, default=20, help='queries sent before the measured ones')
+    parser.add_argument('--mode', choices=['dense', 'lexical', 'hybrid'], default='dense')
+    parser.add_argument('--n-results', type=int, default=4)
+    parser.add_argument('--streams', type=int, default=100, help='measured chat turns')
+    parser.add_argument('--concurrency', type=int, default=16, help='queries and chat turns in flight')
+    parser.add_argument('--stream-format', choices=['base64', 'json'], default='base64')
+    parser.add_argument('--answer-tokens', type=int, default=150, help='words streamed by the fake chat model')
+    parser.add_argument('--token-delay', type=float, default=0.005, help='seconds the fake chat model takes per word')
+    parser.add_argument('--answer-cache', action='store_true', help='enable the answer cache of the base chat')
+    parser.add_argument('--dimensions', type=int, default=384, help='dimensions of the fake embeddings')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='JSON results file, printed to stdout if not provided')
+    parser.add_argument('--verbose', action='store_true', help='keep the debug and info logs of the app')
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> dict:
+    args = parse_args(argv)
+
+    # the app is configured from the env on import: file dbs and caches as in production, in a temporary home
+    home = tempfile.mkdtemp(prefix='scribe-bench-')
+    os.environ['SCRIBE_DB'] = 'prod'
+    os.environ['SCRIBE_DB_PATH'] = os.path.join(home, 'scribe.db')
+    os.environ['HOME'] = home
+    os.environ['ANONYMIZED_TELEMETRY'] = 'False'
+
+    from chromadb.config import Settings
+    from chromadb.server.fastapi import FastAPI as ChromaServer
+    from dependency_injector import providers
+
+    from benchmarks.corpus import generate_answer, generate_corpus
+    from benchmarks.fakes import FakeChatModelBuilder, FakeEmbeddingModelBuilder
+    from src import bootstrap as scribe_bootstrap
+    from src.adapters.async_vector_client import ChromaPooledAsyncVectorClient
+    from src.api.app import app
+
+    corpus = generate_corpus(
+        args.docs,
+        paragraphs=args.paragraphs,
+        queries=args.queries,
+        file_format='pdf' if args.ingestion == 'semantic' else 'txt',
+        seed=args.seed
+    )
+
+    chroma_port = free_port()
+    chroma_app = ChromaServer(Settings(anonymized_telemetry=False, allow_reset=True)).app()
+
+    with BackgroundServer(chroma_app, chroma_port):
+        scribe_bootstrap.bootstrap()
+        if not args.verbose:
+            logging.disable(logging.INFO)
+            # chroma's telemetry client logs an error for every event it skips
+            logging.getLogger('chromadb.telemetry.product.posthog').disabled = True
+
+        container = scribe_bootstrap.CONTAINER
+        container.async_vector_db_client.override(providers.Singleton(
+            ChromaPooledAsyncVectorClient,
+            port=chroma_port,
+            max_connections=args.concurrency * 2
+        ))
+        container.embedding_model_builder.override(providers.Factory(
+            FakeEmbeddingModelBuilder,
+            container.codec,
+            registry=container.embedding_model_registry,
+            cache=container.embedding_cache,
+            query_cache=container.query_embedding_cache,
+            dimensions=args.dimensions
+        ))
+        container.chat_model_builder_service.override(providers.Factory(
+            FakeChatModelBuilder,
+            container.codec,
+            answer=generate_answer(args.answer_tokens, seed=args.seed),
+            token_delay=args.token_delay,
+            **container.chat_model_builder_service.kwargs
+        ))
+
+        try:
+            with BackgroundServer(app, free_port()) as scribe_server:
+                results = asyncio.run(run_benchmarks(scribe_server.port, corpus.files, corpus.size, corpus.queries, args))
+        finally:
+            container.ingestion_job_queue().stop()
+            container.parse_process_pool().shutdown(cancel_futures=True)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'params': {key: value for key, value in vars(args).items() if key not in ('output', 'verbose')}
+        },
+        **results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return report
+
+
+if __name__ == '__main__':
+    main()
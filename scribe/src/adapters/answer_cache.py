@@ -0,0 +1,112 @@
+"""
+Semantic cache of the BaseChat answers.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Sequence
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    query_embedding: np.ndarray
+    doc_ids: tuple[str, ...]
+    events: list[str]
+    created: float
+
+
+class SemanticAnswerCache:
+    """
+    LRU cache of the streamed answers of one base chat. An answer is reused for a query, which embedding is similar
+    to the cached query's one above thresh, and which retrieved the same chunks, so the answer is grounded in the same
+    context. Answers expire after ttl seconds.
+
+    The cache lives in the base chat's ChatPipeline, so it's dropped with the pipeline, whenever the chat's config
+    or collection changes.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600, thresh: float = 0.95):
+        """
+        :param thresh: Minimal cosine similarity of the query embeddings.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.thresh = thresh
+
+        self._answers: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def get(self, query_embedding: Sequence[float], doc_ids: Sequence[str]) -> list[str] | None:
+        """
+        :returns: list - SSE events of the most similar cached answer, None on a miss.
+        """
+        unit = self.normalize(query_embedding)
+        doc_ids = tuple(doc_ids)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_similarity = None, self.thresh
+            for key, answer in list(self._answers.items()):
+                if now - answer.created > self.ttl:
+                    del self._answers[key]
+                    continue
+
+                if answer.doc_ids != doc_ids:
+                    continue
+
+                similarity = float(np.dot(unit, answer.query_embedding))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None:
+                return None
+
+            self._answers.move_to_end(best_key)
+
+            return self._answers[best_key].events
+
+    def put(self, query_embedding: Sequence[float], doc_ids: Sequence[str], events: list[str]) -> None:
+        answer = CachedAnswer(self.normalize(query_embedding), tuple(doc_ids), events, time.monotonic())
+
+        with self._lock:
+            self._answers[self._next_key] = answer
+            self._next_key += 1
+
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+    async def record(
+            self,
+            stream: AsyncIterator[str],
+            query_embedding: Sequence[float],
+            doc_ids: Sequence[str]
+    ) -> AsyncIterator[str]:
+        """
+        Passes the events of the stream through and caches them, once the stream is complete. Interrupted
+        streams aren't cached.
+        """
+        events = []
+        async for event in stream:
+            events.append(event)
+            yield event
+
+        self.put(query_embedding, doc_ids, events)
+
+    @staticmethod
+    async def replay(events: list[str]) -> AsyncIterator[str]:
+        for event in events:
+            yield event
+
+    @staticmethod
+    def normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+
+        return vector / norm if norm else vector
+
+    def __len__(self) -> int:
+        return len(self._answers)
@@ -1,13 +1,25 @@
+import asyncio
+import logging
+import time
 from abc import ABC
-from typing import Callable
+from typing import Callable, Optional, Union
 
-from chromadb import AsyncClientAPI
+import httpx
+from chromadb import AsyncClientAPI, AsyncHttpClient
+from chromadb.api.async_fastapi import AsyncFastAPI
+from chromadb.config import DEFAULT_TENANT, DEFAULT_DATABASE, Settings
 
 
 class AbstractAsyncClient(ABC):
     async def async_init(self):
         pass
 
+    async def aclose(self):
+        pass
+
+    async def close_pool(self):
+        pass
+
 
 class ChromaAsyncVectorClient(AbstractAsyncClient):
 
@@ -17,3 +29,129 @@ class ChromaAsyncVectorClient(AbstractAsyncClient):
 
     async def async_init(self) -> AsyncClientAPI:
         return await self.setup_func(**self.kwargs)
+
+
+class ChromaPooledAsyncVectorClient(AbstractAsyncClient):
+    """
+    Long-lived chroma client. The AsyncClientAPI is created once (heartbeat, tenant and database validation)
+    and is shared across the handlers, reusing keep-alive connections from the pool.
+    If the server wasn't reachable for the health check, the client is recreated.
+
+    AsyncFastAPI keeps one httpx.AsyncClient per event loop (unbounded, without timeouts) in its private _clients.
+    The pool for the current event loop is registered there beforehand, so chroma picks up the configured limits
+    and timeouts. The pool is built as chroma builds its own one (json content type, server headers and ssl verify
+    settings), this relies on chromadb 0.5 internals, pinned by the tests. Pools are bound to their loops, so every
+    loop closes its own one (see close_pool) before it is closed.
+    """
+
+    def __init__(
+            self,
+            host: str = 'localhost',
+            port: int = 8001,
+            max_connections: int = 20,
+            max_keepalive_connections: int = 10,
+            keepalive_expiry: float = 30.0,
+            connect_timeout: float = 5.0,
+            timeout: Optional[float] = 60.0,
+            health_check_interval: float = 30.0,
+            ssl: bool = False,
+            headers: Optional[dict[str, str]] = None,
+            ssl_verify: Optional[Union[bool, str]] = None,
+            tenant: str = DEFAULT_TENANT,
+            database: str = DEFAULT_DATABASE
+    ):
+        """
+        :param headers: Headers sent to the server, e.g. auth tokens. By default chroma's CHROMA_SERVER_HEADERS env.
+        :param ssl_verify: Whether to verify the server's certificate, or a path of the CA bundle.
+        By default chroma's CHROMA_SERVER_SSL_VERIFY env, the certificate is verified if neither is set.
+        """
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.tenant = tenant
+        self.database = database
+        self.health_check_interval = health_check_interval
+
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+
+        self.settings = Settings()
+        if headers is not None:
+            self.settings.chroma_server_headers = headers
+        if ssl_verify is not None:
+            self.settings.chroma_server_ssl_verify = ssl_verify
+
+        self._client: Optional[AsyncClientAPI] = None
+        self._last_health_check = 0.0
+
+    async def async_init(self) -> AsyncClientAPI:
+        """
+        :returns: AsyncClientAPI - The shared client, connected on the first call.
+        """
+        self._register_pool()
+
+        # no lock here: the worst case of a race is one redundant connect on start-up
+        if self._client is None:
+            self._client = await self._connect()
+        elif time.monotonic() - self._last_health_check > self.health_check_interval:
+            try:
+                await self._client.heartbeat()
+                self._last_health_check = time.monotonic()
+            except Exception as e:
+                logging.warning(f'ChromaDB heartbeat failed, reconnecting: {e}')
+                await self.aclose()
+                self._register_pool()
+                self._client = await self._connect()
+
+        return self._client
+
+    async def aclose(self) -> None:
+        """
+        Drops the shared client and closes the pooled connections of the current event loop.
+        """
+        self._client = None
+        await self.close_pool()
+
+    async def close_pool(self) -> None:
+        """
+        Closes the pooled connections of the current event loop. Failures are logged, so the shutdown continues.
+        """
+        http_client = AsyncFastAPI._clients.pop(asyncio.get_running_loop().__hash__(), None)
+        if http_client is None:
+            return
+
+        try:
+            await http_client.aclose()
+        except Exception as e:
+            logging.warning(f'Failed to close the ChromaDB connection pool: {e}')
+
+    def _register_pool(self) -> None:
+        loop_hash = asyncio.get_running_loop().__hash__()
+        if loop_hash not in AsyncFastAPI._clients:
+            headers = {**(self.settings.chroma_server_headers or {}), 'Content-Type': 'application/json'}
+            verify = self.settings.chroma_server_ssl_verify
+            AsyncFastAPI._clients[loop_hash] = httpx.AsyncClient(
+                headers=headers,
+                verify=True if verify is None else verify,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+
+    async def _connect(self) -> AsyncClientAPI:
+        client = await AsyncHttpClient(
+            host=self.host,
+            port=self.port,
+            ssl=self.ssl,
+            headers=self.settings.chroma_server_headers,
+            settings=self.settings,
+            tenant=self.tenant,
+            database=self.database
+        )
+        self._last_health_check = time.monotonic()
+        logging.info(f'Connected to ChromaDB at {self.host}:{self.port}.')
+
+        return client
@@ -1,16 +1,73 @@
-import json
+import asyncio
 from base64 import b64encode
 from abc import ABC
-from typing import AsyncGenerator, AsyncIterator
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional
 
+import orjson
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables.base import Runnable
 from langchain_core.messages.ai import AIMessageChunk
 
 from src.adapters.chroma_models import VectorChromaDocument
+from src.enums import StreamFormat
 
 AsyncStream = AsyncGenerator[str, None]
 
+_END = object()
+
+
+async def coalesce(chunks: AsyncIterator[str], window: float, max_chars: int) -> AsyncIterator[str]:
+    """
+    Joins the chunks arriving within the window after the first buffered one, up to max_chars. The source is
+    drained by a separate task, so a slow chunk never holds the buffered ones back longer than the window.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def drain() -> None:
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(_END)
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.create_task(drain())
+    buffer, size, deadline = [], 0, None
+
+    try:
+        while True:
+            try:
+                if deadline is None:
+                    item = await queue.get()
+                else:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+            except TimeoutError:
+                yield ''.join(buffer)
+                buffer, size, deadline = [], 0, None
+                continue
+
+            if item is _END or isinstance(item, Exception):
+                break
+
+            buffer.append(item)
+            size += len(item)
+            if deadline is None:
+                deadline = loop.time() + window
+
+            if size >= max_chars:
+                yield ''.join(buffer)
+                buffer, size, deadline = [], 0, None
+
+        if buffer:
+            yield ''.join(buffer)
+
+        if isinstance(item, Exception):
+            raise item
+    finally:
+        task.cancel()
+
 
 class AbstractChatModel(ABC):
 
@@ -20,7 +77,15 @@ class AbstractChatModel(ABC):
     def invoke(self, prompt):
         pass
 
-    def async_stream(self, prompt, docs_context: list = None, **kwargs) -> AsyncStream:
+    def async_stream(
+            self,
+            prompt,
+            docs_context: list = None,
+            context_tokens: int | None = None,
+            stream_format: StreamFormat = StreamFormat.BASE64,
+            on_chunk: Optional[Callable[[str], None]] = None,
+            **kwargs
+    ) -> AsyncStream:
         pass
 
     async def async_invoke(self, prompt):
@@ -30,40 +95,74 @@ class AbstractChatModel(ABC):
 class LangchainChatModel(AbstractChatModel):
     def __init__(
             self,
-            chat_model: Runnable
+            chat_model: Runnable,
+            coalesce_window: float = 0.0,
+            coalesce_chars: int = 256
     ):
+        """
+        :param coalesce_window: Seconds the response chunks are joined into one event for, 0 sends every chunk.
+        :param coalesce_chars: Size of the joined chunks, that is sent before the window closes.
+        """
         self.chat_model = chat_model
+        self.coalesce_window = coalesce_window
+        self.coalesce_chars = coalesce_chars
 
     def async_stream(
             self,
             prompt: ChatPromptTemplate,
             docs_context: list[VectorChromaDocument] = None,
+            context_tokens: int | None = None,
+            stream_format: StreamFormat = StreamFormat.BASE64,
+            on_chunk: Optional[Callable[[str], None]] = None,
             **kwargs
     ) -> AsyncStream:
         """
         :param docs_context: list of VectorChromaDocument returned in a stream for additional verbosity
+        :param context_tokens: Token count of the context, returned in a stream as the context event.
+        :param stream_format: Encoding of the response events, base64 or a JSON string.
+        :param on_chunk: Called with every generated chunk, before the chunks are coalesced.
         :param prompt: ChatPromptTemplate.
         :param kwargs: Keyword arguments that will be passed to the ChatPromptTemplate.
         """
         chain = prompt | self.chat_model
 
-        return self.langchain_async_generator_wrapper(chain.astream(kwargs), docs_context)
+        chunks = self.chunk_contents(chain.astream(kwargs), on_chunk)
+        if self.coalesce_window > 0:
+            chunks = coalesce(chunks, self.coalesce_window, self.coalesce_chars)
+
+        return self.langchain_async_generator_wrapper(chunks, docs_context, context_tokens, stream_format)
 
     @staticmethod
-    async def langchain_async_generator_wrapper(
+    async def chunk_contents(
             iterator: AsyncIterator[AIMessageChunk],
-            docs_context: list[VectorChromaDocument] | None
+            on_chunk: Optional[Callable[[str], None]] = None
+    ) -> AsyncIterator[str]:
+        async for chunk in iterator:
+            if chunk.content:
+                if on_chunk is not None:
+                    on_chunk(chunk.content)
+                yield chunk.content
+
+    @staticmethod
+    async def langchain_async_generator_wrapper(
+            chunks: AsyncIterator[str],
+            docs_context: list[VectorChromaDocument] | None,
+            context_tokens: int | None = None,
+            stream_format: StreamFormat = StreamFormat.BASE64
     ) -> AsyncStream:
-        if docs_context:
-            yield f'event: docs\ndata: {json.dumps([doc.__dict__ for doc in docs_context])}\n\n'
+        if context_tokens is not None:
+            yield f'event: context\ndata: {orjson.dumps({'tokens': context_tokens}).decode()}\n\n'
 
-        async for chunk in iterator:
-            enc_chunk = chunk.content.encode('utf-8')
-            b64_chunk = b64encode(enc_chunk)
-            dec_chunk = b64_chunk.decode('utf-8')
-            yield 'event: response' \
-                + f'\ndata: {dec_chunk}' \
-                + '\n\n'
+        if docs_context:
+            yield f'event: docs\ndata: {orjson.dumps([doc.__dict__ for doc in docs_context]).decode()}\n\n'
+
+        # json strings escape the newlines, so both encodings fit a single data line
+        if stream_format == StreamFormat.JSON:
+            async for chunk in chunks:
+                yield f'event: response\ndata: {orjson.dumps(chunk).decode()}\n\n'
+        else:
+            async for chunk in chunks:
+                yield f'event: response\ndata: {b64encode(chunk.encode()).decode()}\n\n'
 
     def stream(self, input_: str):
         raise NotImplementedError
@@ -0,0 +1,114 @@
+"""
+Process-wide cache of the resolved BaseChat pipelines.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal, Optional
+
+from chromadb import AsyncClientAPI
+from chromadb.api.models import AsyncCollection
+
+from src.adapters.answer_cache import SemanticAnswerCache
+from src.adapters.chat_model import AbstractChatModel
+from src.domain.models import BaseChat
+
+ChatPipelineDependency = Literal['base_chat', 'chat_model', 'system_prompt', 'vec_col', 'embedding_model', 'api_key']
+
+
+@dataclass
+class ChatPipeline:
+    """
+    Everything the BaseChat needs for a turn, apart from retrieval and generation.
+    """
+    base_chat: BaseChat
+    chat_model: AbstractChatModel
+    system_prompt: str | None
+    count_tokens: Optional[Callable[[str], int]] = None
+    embedding_function: Optional[Any] = None
+    collection: Optional[AsyncCollection] = None
+    # client the collection handle is bound to, the handle is reloaded when the client reconnects
+    vector_db_client: Optional[AsyncClientAPI] = None
+    answer_cache: Optional[SemanticAnswerCache] = None
+    dependencies: set[tuple[ChatPipelineDependency, int]] = field(default_factory=set)
+
+    @staticmethod
+    def resolve_dependencies(base_chat: BaseChat) -> set[tuple[ChatPipelineDependency, int]]:
+        """
+        :returns: set - (dependency, id) pairs of the objects the base chat pipeline is built from.
+        """
+        dependencies: set[tuple[ChatPipelineDependency, int]] = {
+            ('base_chat', base_chat.id),
+            ('chat_model', base_chat.chat_model.id),
+            ('api_key', base_chat.chat_model.api_key_credential_id)
+        }
+
+        if base_chat.system_prompt is not None:
+            dependencies.add(('system_prompt', base_chat.system_prompt.id))
+
+        if base_chat.vec_col is not None:
+            dependencies.add(('vec_col', base_chat.vec_col.id))
+            dependencies.add(('embedding_model', base_chat.vec_col.embedding_model.id))
+            dependencies.add(('api_key', base_chat.vec_col.embedding_model.api_key_credential_id))
+
+        return dependencies
+
+
+class ChatPipelineCache:
+    """
+    LRU cache of the ChatPipeline's by base chat id. Pipelines are dropped, when any object they are built from
+    is updated or deleted.
+
+    Every invalidation bumps the config version. A pipeline is stored only with the version read before it
+    was resolved, so a pipeline built from the config, that was changed meanwhile, is never cached.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+
+        self._pipelines: OrderedDict[int, ChatPipeline] = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, base_chat_id: int) -> ChatPipeline | None:
+        with self._lock:
+            pipeline = self._pipelines.get(base_chat_id)
+            if pipeline is not None:
+                self._pipelines.move_to_end(base_chat_id)
+
+            return pipeline
+
+    def put(self, base_chat_id: int, version: int, pipeline: ChatPipeline) -> bool:
+        """
+        :param version: Config version read before the pipeline was resolved.
+        :returns: bool - True if the pipeline was cached.
+        """
+        with self._lock:
+            if version != self._version:
+                return False
+
+            self._pipelines[base_chat_id] = pipeline
+            self._pipelines.move_to_end(base_chat_id)
+
+            while len(self._pipelines) > self.max_entries:
+                self._pipelines.popitem(last=False)
+
+            return True
+
+    def invalidate(self, dependency: ChatPipelineDependency, id_: int) -> None:
+        """
+        Drops the pipelines built from the object.
+        """
+        with self._lock:
+            self._version += 1
+
+            for base_chat_id, pipeline in list(self._pipelines.items()):
+                if (dependency, id_) in pipeline.dependencies:
+                    del self._pipelines[base_chat_id]
+
+    def __len__(self) -> int:
+        return len(self._pipelines)
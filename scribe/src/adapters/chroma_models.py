@@ -1,8 +1,12 @@
 """
 Primitive mappings of chroma objects, retrieved from the db, to serializable python objects.
 """
+import base64
+import json
+
 import numpy
 from chromadb.api import Collection
+from chromadb.api.types import GetResult
 from typing import Optional
 
 
@@ -14,13 +18,13 @@ class VectorChromaDocument:
             id_: str,
             document: str,
             metadata: dict[str, list | str | int | float],
-            embedding: numpy.ndarray,
+            embedding: Optional[numpy.ndarray] = None,
             distance: Optional[float] = None
     ):
         self.id_ = id_[:16] + '...'
         self.document = document
         self.metadata = self._filter_metadata(metadata)
-        self.embedding: str = self._embedding_repr(embedding)
+        self.embedding: str | None = self._embedding_repr(embedding) if embedding is not None else None
         self.distance = round(distance, 4) if distance else None
 
     @staticmethod
@@ -41,3 +45,31 @@ class VectorChromaDocument:
                 metadata.pop(key)
 
         return metadata
+
+
+def encode_embedding(embedding: numpy.ndarray) -> str:
+    """
+    :returns: str - Base64 of the embedding's little-endian float32 bytes.
+    """
+    return base64.b64encode(numpy.asarray(embedding, dtype='<f4').tobytes()).decode()
+
+
+def decode_embedding(encoded: str) -> numpy.ndarray:
+    return numpy.frombuffer(base64.b64decode(encoded), dtype='<f4')
+
+
+def get_result_to_ndjson(res: GetResult) -> bytes:
+    """
+    Serializes a page of documents into NDJSON lines of id, document, metadata and, if fetched, embedding.
+    Ids and metadata are kept whole, so the lines are suitable for backups.
+    """
+    embeddings = res.get('embeddings')
+    lines = []
+    for i, id_ in enumerate(res['ids']):
+        record = {'id': id_, 'document': res['documents'][i], 'metadata': res['metadatas'][i]}
+        if embeddings is not None:
+            record['embedding'] = encode_embedding(embeddings[i])
+
+        lines.append(json.dumps(record, ensure_ascii=False))
+
+    return ('\n'.join(lines) + '\n').encode() if lines else b''
@@ -0,0 +1,230 @@
+"""
+Binary archive of a vector collection, to move collections between environments without re-embedding them.
+
+The archive is an uncompressed tar of:
+    - manifest.json: format version, collection name, embedding model, distance function, count and dimensions;
+    - embeddings.npy: (count, dimensions) little-endian float32 matrix;
+    - documents.jsonl: id, document and metadata per line, in the order of the embedding rows.
+
+Members are stored uncompressed, so embeddings are memory-mapped straight from the archive file.
+"""
+import asyncio
+import io
+import json
+import tarfile
+import tempfile
+import time
+from contextlib import aclosing
+from itertools import islice
+from typing import AsyncIterator, BinaryIO, Iterator, NamedTuple
+
+import numpy as np
+from chromadb.api.types import GetResult
+
+ARCHIVE_VERSION = 1
+MANIFEST = 'manifest.json'
+EMBEDDINGS = 'embeddings.npy'
+DOCUMENTS = 'documents.jsonl'
+
+
+class CollectionArchiveError(ValueError):
+    def __init__(self, reason: str):
+        super().__init__(f'Invalid collection archive: {reason}.')
+
+
+class CollectionArchiveManifest(NamedTuple):
+    name: str
+    embedding_model: str
+    distance_func: str
+    count: int
+    dimensions: int
+    version: int = ARCHIVE_VERSION
+
+
+class ArchiveRecord(NamedTuple):
+    id_: str
+    document: str
+    metadata: dict
+    embedding: np.ndarray
+
+
+async def stream_archive(
+        pages: AsyncIterator[GetResult],
+        count: int,
+        name: str,
+        embedding_model: str,
+        distance_func: str,
+        chunk_size: int = 1 << 20
+) -> AsyncIterator[bytes]:
+    """
+    Streams the archive of a collection of count documents, fetched with embeddings by pages. Tar members need
+    their sizes up front: the manifest and the embeddings are streamed as the pages arrive, dimensions are taken
+    from the first page, while the documents are spooled into a temporary file and streamed last.
+
+    :param pages: Pages of at most count documents.
+    :raises CollectionArchiveError: if the embeddings have different dimensions, or the collection has fewer than
+    count documents, e.g. deleted during the export.
+    """
+    async with aclosing(pages):
+        first = await anext(pages, None)
+        dimensions = len(first['embeddings'][0]) if first is not None and first['ids'] and count else 0
+        manifest = CollectionArchiveManifest(
+            name=name,
+            embedding_model=embedding_model,
+            distance_func=distance_func,
+            count=count,
+            dimensions=dimensions
+        )
+        manifest_bytes = json.dumps(manifest._asdict()).encode()
+        yield tar_header(MANIFEST, len(manifest_bytes)) + manifest_bytes + tar_padding(len(manifest_bytes))
+
+        npy_header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(
+            npy_header,
+            {'descr': '<f4', 'fortran_order': False, 'shape': (count, dimensions)}
+        )
+        embeddings_size = npy_header.tell() + count * dimensions * 4
+        yield tar_header(EMBEDDINGS, embeddings_size) + npy_header.getvalue()
+
+        with tempfile.TemporaryFile() as documents:
+            written = 0
+            res = first
+            while res is not None and written < count:
+                embeddings = np.asarray(res['embeddings'], dtype='<f4').reshape(len(res['ids']), -1)
+                if len(embeddings) and embeddings.shape[1] != dimensions:
+                    raise CollectionArchiveError('embeddings have different dimensions')
+
+                # documents added during the export are left out, so the rows match the manifest's count
+                embeddings = embeddings[:count - written]
+                await asyncio.to_thread(write_documents, documents, res, len(embeddings))
+                yield embeddings.tobytes()
+                written += len(embeddings)
+                res = await anext(pages, None)
+
+            if written < count:
+                raise CollectionArchiveError(f'the collection has {written} of {count} documents')
+            yield tar_padding(embeddings_size)
+
+            documents_size = documents.tell()
+            documents.seek(0)
+            yield tar_header(DOCUMENTS, documents_size)
+            while chunk := await asyncio.to_thread(documents.read, chunk_size):
+                yield chunk
+            yield tar_padding(documents_size)
+
+    # end of archive blocks, padded to the record size as tarfile does
+    size = sum(
+        tarfile.BLOCKSIZE + member_size + len(tar_padding(member_size))
+        for member_size in (len(manifest_bytes), embeddings_size, documents_size)
+    )
+    end = 2 * tarfile.BLOCKSIZE
+    yield bytes(end + (-(size + end) % tarfile.RECORDSIZE))
+
+
+def write_documents(documents: BinaryIO, res: GetResult, count: int) -> None:
+    documents.writelines(
+        json.dumps({'id': id_, 'document': document, 'metadata': metadata}).encode() + b'\n'
+        for id_, document, metadata in islice(zip(res['ids'], res['documents'], res['metadatas']), count)
+    )
+
+
+def tar_header(name: str, size: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+
+    return info.tobuf(tarfile.PAX_FORMAT, tarfile.ENCODING, 'surrogateescape')
+
+
+def tar_padding(size: int) -> bytes:
+    return bytes(-size % tarfile.BLOCKSIZE)
+
+
+class CollectionArchiveReader:
+    """
+    Reads an archive file. Embeddings are memory-mapped from the file, documents are read line by line,
+    so archives of any size are read with constant memory.
+    """
+
+    def __init__(self, path: str):
+        """
+        :raises CollectionArchiveError: if the file isn't a collection archive.
+        """
+        self.path = path
+
+        try:
+            self._tar = tarfile.open(path, mode='r:')
+        except tarfile.TarError:
+            raise CollectionArchiveError('not an uncompressed tar file')
+
+        try:
+            self._members = {member.name: member for member in self._tar.getmembers()}
+            missing = {MANIFEST, EMBEDDINGS, DOCUMENTS} - self._members.keys()
+            if missing:
+                raise CollectionArchiveError(f"missing {', '.join(sorted(missing))}")
+
+            self.manifest = self.read_manifest()
+            self.embeddings = self.map_embeddings()
+        except Exception:
+            self._tar.close()
+            raise
+
+    def read_manifest(self) -> CollectionArchiveManifest:
+        try:
+            manifest = CollectionArchiveManifest(**json.load(self._tar.extractfile(self._members[MANIFEST])))
+        except (ValueError, TypeError):
+            raise CollectionArchiveError(f'malformed {MANIFEST}')
+
+        if manifest.version != ARCHIVE_VERSION:
+            raise CollectionArchiveError(f'unsupported version {manifest.version}')
+
+        return manifest
+
+    def map_embeddings(self) -> np.ndarray:
+        member = self._members[EMBEDDINGS]
+        with open(self.path, 'rb') as file:
+            file.seek(member.offset_data)
+            try:
+                np.lib.format.read_magic(file)
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+            except ValueError:
+                raise CollectionArchiveError(f'malformed {EMBEDDINGS}')
+            offset = file.tell()
+
+        expected = (self.manifest.count, self.manifest.dimensions)
+        if shape != expected or fortran_order or dtype != np.dtype('<f4'):
+            raise CollectionArchiveError(f'{EMBEDDINGS} is not a {expected} float32 matrix')
+
+        # mmap can't map an empty range
+        if self.manifest.count == 0:
+            return np.empty(shape, dtype=dtype)
+
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    def records(self) -> Iterator[ArchiveRecord]:
+        """
+        :raises CollectionArchiveError: if documents and embeddings don't match.
+        """
+        count = 0
+        for i, line in enumerate(self._tar.extractfile(self._members[DOCUMENTS])):
+            if i >= self.manifest.count:
+                raise CollectionArchiveError(f'{DOCUMENTS} has more lines than embeddings')
+
+            try:
+                record = json.loads(line)
+                yield ArchiveRecord(record['id'], record['document'], record['metadata'], self.embeddings[i])
+            except (ValueError, KeyError):
+                raise CollectionArchiveError(f'malformed line {i + 1} of {DOCUMENTS}')
+            count += 1
+
+        if count != self.manifest.count:
+            raise CollectionArchiveError(f'{DOCUMENTS} has fewer lines than embeddings')
+
+    def close(self) -> None:
+        self._tar.close()
+
+    def __enter__(self) -> 'CollectionArchiveReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,316 @@
+"""
+Persistent content-addressed cache of the document embeddings and in-memory cache of the query embeddings.
+"""
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC
+from collections import OrderedDict
+from hashlib import sha224
+from typing import Callable, Iterable
+
+import numpy as np
+from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
+
+from src.system.metrics import (
+    EMBEDDING_CACHE_HITS,
+    EMBEDDING_CACHE_MISSES,
+    EMBEDDING_CACHE_EVICTIONS,
+    EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_HITS,
+    QUERY_EMBEDDING_CACHE_MISSES
+)
+
+
+def content_hash(text: str) -> str:
+    """
+    :returns: str - sha224 of the text, the same hash VectorDocument uses as its id.
+    """
+    return sha224(text.encode()).hexdigest()
+
+
+class AbstractEmbeddingCache(ABC):
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, np.ndarray]:
+        pass
+
+    def put_many(self, model: str, embeddings: dict[str, np.ndarray]) -> None:
+        pass
+
+
+class SqliteEmbeddingCache(AbstractEmbeddingCache):
+    """
+    Embeddings are stored as float32 blobs keyed by (model, content hash). When the stored blobs exceed
+    the size budget, the least recently used embeddings are evicted.
+    """
+
+    # sqlite's default limit of the query variables is 999
+    max_query_params = 500
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        :param path: Path of the sqlite file, ':memory:' keeps the cache in memory.
+        :param max_bytes: Size budget of the stored embeddings in bytes.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embedding ('
+            'model TEXT NOT NULL, '
+            'hash TEXT NOT NULL, '
+            'vector BLOB NOT NULL, '
+            'last_used REAL NOT NULL, '
+            'PRIMARY KEY (model, hash)'
+            ') WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS embedding_last_used ON embedding (last_used)')
+
+        self.size = self._conn.execute('SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embedding').fetchone()[0]
+        EMBEDDING_CACHE_SIZE.set(self.size)
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, np.ndarray]:
+        """
+        :returns: dict - Cached embeddings by hash, missing hashes are omitted.
+        """
+        found: dict[str, np.ndarray] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+
+        with self._lock:
+            for i in range(0, len(unique_hashes), self.max_query_params):
+                part = unique_hashes[i:i + self.max_query_params]
+                placeholders = ', '.join('?' * len(part))
+                rows = self._conn.execute(
+                    f'SELECT hash, vector FROM embedding WHERE model = ? AND hash IN ({placeholders})',
+                    [model, *part]
+                ).fetchall()
+
+                for hash_, vector in rows:
+                    found[hash_] = np.frombuffer(vector, dtype=np.float32).copy()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    'UPDATE embedding SET last_used = ? WHERE model = ? AND hash = ?',
+                    [(now, model, hash_) for hash_ in found]
+                )
+
+        EMBEDDING_CACHE_HITS.labels(model).inc(len(found))
+        EMBEDDING_CACHE_MISSES.labels(model).inc(len(unique_hashes) - len(found))
+
+        return found
+
+    def put_many(self, model: str, embeddings: dict[str, np.ndarray]) -> None:
+        if not embeddings:
+            return None
+
+        now = time.time()
+        rows = [
+            (model, hash_, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for hash_, embedding in embeddings.items()
+        ]
+
+        with self._lock:
+            size = self.size
+            self._conn.execute('BEGIN')
+            try:
+                for model_, hash_, vector, last_used in rows:
+                    replaced = self._conn.execute(
+                        'SELECT LENGTH(vector) FROM embedding WHERE model = ? AND hash = ?',
+                        (model_, hash_)
+                    ).fetchone()
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO embedding (model, hash, vector, last_used) VALUES (?, ?, ?, ?)',
+                        (model_, hash_, vector, last_used)
+                    )
+                    self.size += len(vector) - (replaced[0] if replaced else 0)
+
+                self._evict_over_budget()
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                self.size = size
+                raise
+
+        EMBEDDING_CACHE_SIZE.set(self.size)
+
+    def _evict_over_budget(self) -> None:
+        while self.size > self.max_bytes:
+            rows = self._conn.execute(
+                'SELECT model, hash, LENGTH(vector) FROM embedding ORDER BY last_used LIMIT 256'
+            ).fetchall()
+            if not rows:
+                break
+
+            for model, hash_, length in rows:
+                if self.size <= self.max_bytes:
+                    break
+
+                self._conn.execute('DELETE FROM embedding WHERE model = ? AND hash = ?', (model, hash_))
+                self.size -= length
+                EMBEDDING_CACHE_EVICTIONS.labels(model).inc()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Embeds only the documents missing from the cache with one call to the wrapped embedding function
+    and caches the new embeddings.
+    """
+
+    def __init__(
+            self,
+            embedding_function: Callable[[Documents], Embeddings],
+            cache: AbstractEmbeddingCache,
+            model: str
+    ):
+        """
+        :param model: Name of the embedding model, embeddings of different models never mix.
+        """
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.model = model
+
+    def __call__(self, input: Documents) -> Embeddings:
+        hashes = [content_hash(text) for text in input]
+        embeddings = self.cache.get_many(self.model, hashes)
+
+        missing = {hash_: text for hash_, text in zip(hashes, input) if hash_ not in embeddings}
+        if missing:
+            computed = self.embedding_function(list(missing.values()))
+            new_embeddings = {
+                hash_: np.asarray(embedding, dtype=np.float32)
+                for hash_, embedding in zip(missing.keys(), computed)
+            }
+            self.cache.put_many(self.model, new_embeddings)
+            embeddings.update(new_embeddings)
+
+        return [embeddings[hash_] for hash_ in hashes]
+
+
+def normalize_query(query: str) -> str:
+    """
+    :returns: str - Query with unicode normalized and whitespace collapsed.
+    """
+    return ' '.join(unicodedata.normalize('NFC', query).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of the query embeddings keyed by (model, normalized query). Entries expire after the ttl.
+    """
+
+    def __init__(
+            self,
+            max_entries: int,
+            ttl: float | None = None,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        :param ttl: Seconds an entry is valid for, if not provided, entries are only evicted by LRU.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+
+        self._entries: OrderedDict[tuple[str, str], tuple[np.ndarray, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, query: str) -> np.ndarray | None:
+        key = (model, normalize_query(query))
+
+        with self._lock:
+            embedding = self._lookup(key)
+
+        if embedding is None:
+            QUERY_EMBEDDING_CACHE_MISSES.labels(model).inc()
+        else:
+            QUERY_EMBEDDING_CACHE_HITS.labels(model).inc()
+
+        return embedding
+
+    def put(self, model: str, query: str, embedding: np.ndarray) -> None:
+        key = (model, normalize_query(query))
+
+        with self._lock:
+            self._entries[key] = (np.asarray(embedding, dtype=np.float32), self.clock())
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def warm(
+            self,
+            model: str,
+            queries: Iterable[str],
+            embedding_function: Callable[[Documents], Embeddings]
+    ) -> int:
+        """
+        Embeds the queries missing from the cache with one call.
+
+        :returns: int - Amount of embedded queries.
+        """
+        with self._lock:
+            missing = list(dict.fromkeys(
+                query for query in map(normalize_query, queries) if self._lookup((model, query)) is None
+            ))
+
+        if not missing:
+            return 0
+
+        for query, embedding in zip(missing, embedding_function(missing)):
+            self.put(model, query, embedding)
+
+        return len(missing)
+
+    def _lookup(self, key: tuple[str, str]) -> np.ndarray | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        embedding, created_at = entry
+        if self.ttl is not None and self.clock() - created_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+
+        return embedding
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedQueryEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Embeds queries through the QueryEmbeddingCache, only the missing ones are passed to the wrapped
+    embedding function.
+    """
+
+    def __init__(
+            self,
+            embedding_function: Callable[[Documents], Embeddings],
+            cache: QueryEmbeddingCache,
+            model: str
+    ):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.model = model
+
+    def __call__(self, input: Documents) -> Embeddings:
+        embeddings = [self.cache.get(self.model, query) for query in input]
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            for i, embedding in zip(missing, self.embedding_function([input[i] for i in missing])):
+                embeddings[i] = np.asarray(embedding, dtype=np.float32)
+                self.cache.put(self.model, input[i], embeddings[i])
+
+        return embeddings
@@ -0,0 +1,166 @@
+"""
+Process-wide registry of local (sentence transformers) embedding models.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, cast
+
+from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
+
+from src.enums import EmbeddingModelName, Device
+from src.system.metrics import (
+    EMBEDDING_MODEL_LOADS,
+    EMBEDDING_MODEL_EVICTIONS,
+    EMBEDDING_MODEL_HITS,
+    EMBEDDING_MODEL_MEMORY
+)
+
+RegistryKey = tuple[EmbeddingModelName, Device]
+
+
+class LocalEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function around an already loaded SentenceTransformer model.
+    Mirrors chromadb's SentenceTransformerEmbeddingFunction, but doesn't own the model.
+    """
+
+    def __init__(self, model: Any, normalize_embeddings: bool = False):
+        self.model = model
+        self.normalize_embeddings = normalize_embeddings
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return cast(
+            Embeddings,
+            [
+                embedding for embedding in self.model.encode(
+                    list(input),
+                    convert_to_numpy=True,
+                    normalize_embeddings=self.normalize_embeddings
+                )
+            ]
+        )
+
+
+def load_sentence_transformer(name: EmbeddingModelName, device: Device) -> Any:
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name.value, device=device.value)
+
+
+def estimate_model_size(model: Any) -> int:
+    """
+    :returns: int - Amount of bytes occupied by the model parameters and buffers.
+    """
+    params = sum(p.numel() * p.element_size() for p in model.parameters())
+    buffers = sum(b.numel() * b.element_size() for b in model.buffers())
+
+    return params + buffers
+
+
+class EmbeddingModelRegistry:
+    """
+    Loads every local embedding model once per (EmbeddingModelName, Device) and shares it across requests.
+    When the estimated memory of the loaded models exceeds the memory budget, the least recently used
+    models are evicted. The model, that was just requested, is never evicted.
+    """
+
+    def __init__(
+            self,
+            memory_budget: int,
+            loader: Callable[[EmbeddingModelName, Device], Any] = load_sentence_transformer,
+            sizer: Callable[[Any], int] = estimate_model_size
+    ):
+        """
+        :param memory_budget: Memory budget in bytes for all the loaded models.
+        :param loader: Loads a model for the provided name and device.
+        :param sizer: Estimates memory occupied by a loaded model in bytes.
+        """
+        self.memory_budget = memory_budget
+        self.loader = loader
+        self.sizer = sizer
+
+        self._models: OrderedDict[RegistryKey, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[RegistryKey, threading.Lock] = {}
+
+        self.loads = 0
+        self.evictions = 0
+        self.hits = 0
+
+    def get(self, name: EmbeddingModelName, device: Device) -> LocalEmbeddingFunction:
+        key = (name, device)
+
+        model = self._lookup(key)
+        if model is not None:
+            return LocalEmbeddingFunction(model)
+
+        # only one load per key, while other keys stay available
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            model = self._lookup(key)
+            if model is not None:
+                return LocalEmbeddingFunction(model)
+
+            logging.info(f'Loading embedding model {name.value} on {device.value}.')
+            model = self.loader(name, device)
+            size = self.sizer(model)
+
+            with self._lock:
+                self._models[key] = (model, size)
+                self.loads += 1
+                EMBEDDING_MODEL_LOADS.labels(name.value, device.value).inc()
+                self._evict_over_budget(keep=key)
+
+        return LocalEmbeddingFunction(model)
+
+    def evict(self, name: EmbeddingModelName, device: Device) -> None:
+        with self._lock:
+            self._evict((name, device))
+
+    @property
+    def memory_usage(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def stats(self) -> dict:
+        return {
+            'models': [f'{name.value}:{device.value}' for name, device in self._models.keys()],
+            'memory_usage': self.memory_usage,
+            'memory_budget': self.memory_budget,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'hits': self.hits
+        }
+
+    def _lookup(self, key: RegistryKey) -> Any | None:
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                return None
+
+            self._models.move_to_end(key)
+            self.hits += 1
+            EMBEDDING_MODEL_HITS.labels(key[0].value, key[1].value).inc()
+
+            return entry[0]
+
+    def _evict_over_budget(self, keep: RegistryKey) -> None:
+        for key in list(self._models.keys()):
+            if self.memory_usage <= self.memory_budget:
+                break
+
+            if key != keep:
+                self._evict(key)
+
+        EMBEDDING_MODEL_MEMORY.set(self.memory_usage)
+
+    def _evict(self, key: RegistryKey) -> None:
+        if self._models.pop(key, None) is None:
+            return
+
+        self.evictions += 1
+        EMBEDDING_MODEL_EVICTIONS.labels(key[0].value, key[1].value).inc()
+        EMBEDDING_MODEL_MEMORY.set(self.memory_usage)
+        logging.info(f'Evicted embedding model {key[0].value} on {key[1].value}.')
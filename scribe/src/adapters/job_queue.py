@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import queue
+import threading
+from abc import ABC
+from typing import Awaitable, Callable, Optional
+
+JobExecutor = Callable[[int], Awaitable[None]]
+WorkerTeardown = Callable[[], Awaitable[None]]
+
+
+class AbstractJobQueue(ABC):
+    # set while the queue is stopped, so executors tell the jobs interrupted by a shutdown from the cancelled ones
+    stopping: bool = False
+
+    def start(self, execute: JobExecutor, teardown: Optional[WorkerTeardown] = None) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def put(self, job_id: int) -> None:
+        pass
+
+    def cancel(self, job_id: int) -> bool:
+        pass
+
+
+class ThreadedAsyncJobQueue(AbstractJobQueue):
+    """
+    Processes jobs by their ids with a pool of worker threads. Every worker owns a long-lived event loop, so jobs
+    don't compete with the requests served on the app's event loop, and loop-bound resources (e.g. pooled
+    http clients) are reused between the jobs of a worker.
+
+    The queue holds only ids, job state is persisted by the executor.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+
+        self._queue: queue.Queue[Optional[int]] = queue.Queue()
+        self._threads: list[threading.Thread] = []
+        self._running: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self._lock = threading.Lock()
+        self._execute: Optional[JobExecutor] = None
+        self._teardown: Optional[WorkerTeardown] = None
+
+    def start(self, execute: JobExecutor, teardown: Optional[WorkerTeardown] = None) -> None:
+        """
+        :param teardown: Awaited on the loop of every worker before the loop is closed, e.g. to close the
+        loop-bound resources.
+        """
+        if self._threads:
+            return
+
+        self._execute = execute
+        self._teardown = teardown
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'scribe-ingestion-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """
+        Cancels the running jobs and stops the workers. Jobs left in the queue stay pending.
+        """
+        self.stopping = True
+        with self._lock:
+            for loop, task in self._running.values():
+                loop.call_soon_threadsafe(task.cancel)
+
+        for _ in self._threads:
+            self._queue.put(None)
+
+        for thread in self._threads:
+            thread.join()
+
+        self._threads.clear()
+        self.stopping = False
+
+    def put(self, job_id: int) -> None:
+        self._queue.put(job_id)
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        :returns: bool - True if the job was running and got cancelled.
+        """
+        with self._lock:
+            running = self._running.get(job_id)
+            if running is None:
+                return False
+
+            loop, task = running
+            loop.call_soon_threadsafe(task.cancel)
+
+            return True
+
+    def _work(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                break
+
+            task = loop.create_task(self._execute(job_id))
+            with self._lock:
+                self._running[job_id] = (loop, task)
+
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                logging.info(f'Ingestion job {job_id} is cancelled.')
+            except Exception as e:
+                logging.error(f'Ingestion job {job_id} failed: {e}')
+            finally:
+                with self._lock:
+                    self._running.pop(job_id, None)
+
+        if self._teardown is not None:
+            try:
+                loop.run_until_complete(self._teardown())
+            except Exception as e:
+                logging.warning(f'Ingestion worker teardown failed: {e}')
+
+        loop.close()
@@ -0,0 +1,262 @@
+"""
+Persistent BM25 inverted index of the vector collections' documents.
+"""
+import math
+import re
+import sqlite3
+import threading
+from abc import ABC
+from collections import Counter, defaultdict
+from typing import Iterable
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    :returns: list - Lowercased word tokens, identifiers like 'err_404' or 'E1234' are kept whole.
+    """
+    return _TOKEN.findall(text.lower())
+
+
+def doc_name(metadata: dict) -> str | None:
+    """
+    :returns: str - Name of the document a chunk belongs to, its filename or url.
+    """
+    return metadata.get('filename') or metadata.get('url')
+
+
+class AbstractLexicalIndex(ABC):
+
+    def add(self, collection: str, ids: list[str], documents: list[str], metadatas: list[dict]) -> None:
+        pass
+
+    def delete(self, collection: str, doc_name: str) -> None:
+        pass
+
+    def delete_ids(self, collection: str, ids: list[str]) -> None:
+        pass
+
+    def drop(self, collection: str) -> None:
+        pass
+
+    def count(self, collection: str) -> int:
+        pass
+
+    def is_backfilled(self, collection: str) -> bool:
+        pass
+
+    def mark_backfilled(self, collection: str) -> None:
+        pass
+
+    def search(
+            self,
+            collection: str,
+            query: str,
+            n_results: int,
+            doc_names: list[str] | None = None
+    ) -> list[tuple[str, float]]:
+        pass
+
+
+class SqliteBM25Index(AbstractLexicalIndex):
+    """
+    Inverted index of the term frequencies per collection, kept in sqlite, so documents are indexed and removed
+    incrementally and the index survives restarts. Documents are scored with Okapi BM25.
+    """
+
+    # sqlite's default limit of the query variables is 999
+    max_query_params = 500
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        """
+        :param path: Path of the sqlite file, ':memory:' keeps the index in memory.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS document ('
+            'collection TEXT NOT NULL, '
+            'id TEXT NOT NULL, '
+            'name TEXT, '
+            'length INTEGER NOT NULL, '
+            'PRIMARY KEY (collection, id)'
+            ') WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS document_name ON document (collection, name)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS posting ('
+            'collection TEXT NOT NULL, '
+            'term TEXT NOT NULL, '
+            'id TEXT NOT NULL, '
+            'tf INTEGER NOT NULL, '
+            'PRIMARY KEY (collection, term, id)'
+            ') WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS posting_id ON posting (collection, id)')
+        # collections whose documents stored before the index existed are indexed
+        self._conn.execute('CREATE TABLE IF NOT EXISTS backfill (collection TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def add(self, collection: str, ids: list[str], documents: list[str], metadatas: list[dict]) -> None:
+        """
+        Indexes the documents, documents with already indexed ids are replaced.
+        """
+        rows = []
+        postings = []
+        # the last of the duplicate ids wins, as in chroma's upsert
+        for id_, (document, metadata) in dict(zip(ids, zip(documents, metadatas))).items():
+            tokens = tokenize(document)
+            rows.append((collection, id_, doc_name(metadata), len(tokens)))
+            postings.extend((collection, term, id_, tf) for term, tf in Counter(tokens).items())
+
+        if not rows:
+            return None
+
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'DELETE FROM posting WHERE collection = ? AND id = ?',
+                    [(collection, id_) for _, id_, _, _ in rows]
+                )
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO document (collection, id, name, length) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+                self._conn.executemany(
+                    'INSERT INTO posting (collection, term, id, tf) VALUES (?, ?, ?, ?)',
+                    postings
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def delete(self, collection: str, doc_name: str) -> None:
+        """
+        Removes the chunks of the document by its filename or url.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.execute(
+                    'DELETE FROM posting WHERE collection = ? AND id IN '
+                    '(SELECT id FROM document WHERE collection = ? AND name = ?)',
+                    (collection, collection, doc_name)
+                )
+                self._conn.execute('DELETE FROM document WHERE collection = ? AND name = ?', (collection, doc_name))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def delete_ids(self, collection: str, ids: list[str]) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                params = [(collection, id_) for id_ in ids]
+                self._conn.executemany('DELETE FROM posting WHERE collection = ? AND id = ?', params)
+                self._conn.executemany('DELETE FROM document WHERE collection = ? AND id = ?', params)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def drop(self, collection: str) -> None:
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.execute('DELETE FROM posting WHERE collection = ?', (collection,))
+                self._conn.execute('DELETE FROM document WHERE collection = ?', (collection,))
+                self._conn.execute('DELETE FROM backfill WHERE collection = ?', (collection,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM document WHERE collection = ?', (collection,)).fetchone()[0]
+
+    def is_backfilled(self, collection: str) -> bool:
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM backfill WHERE collection = ?', (collection,)).fetchone() is not None
+
+    def mark_backfilled(self, collection: str) -> None:
+        with self._lock:
+            self._conn.execute('INSERT OR IGNORE INTO backfill (collection) VALUES (?)', (collection,))
+
+    def search(
+            self,
+            collection: str,
+            query: str,
+            n_results: int,
+            doc_names: list[str] | None = None
+    ) -> list[tuple[str, float]]:
+        """
+        :param doc_names: If provided, only chunks of these documents are scored.
+        :returns: list - (id, score) pairs of the best scored documents, best first.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:self.max_query_params]
+        if not terms:
+            return []
+
+        placeholders = ', '.join('?' * len(terms))
+        with self._lock:
+            total, avg_length = self._conn.execute(
+                'SELECT COUNT(*), AVG(length) FROM document WHERE collection = ?',
+                (collection,)
+            ).fetchone()
+            if not total:
+                return []
+
+            # document frequencies are taken over the whole collection, filters only narrow the scored documents
+            doc_freqs = dict(self._conn.execute(
+                f'SELECT term, COUNT(*) FROM posting WHERE collection = ? AND term IN ({placeholders}) GROUP BY term',
+                [collection, *terms]
+            ).fetchall())
+
+            name_filter = ''
+            params = [collection, collection, *terms]
+            if doc_names is not None:
+                name_filter = f" AND d.name IN ({', '.join('?' * len(doc_names))})"
+                params.extend(doc_names)
+
+            rows = self._conn.execute(
+                'SELECT p.term, p.id, p.tf, d.length FROM posting p '
+                'JOIN document d ON d.collection = ? AND d.id = p.id '
+                f'WHERE p.collection = ? AND p.term IN ({placeholders}){name_filter}',
+                params
+            ).fetchall()
+
+        scores: dict[str, float] = defaultdict(float)
+        for term, id_, tf, length in rows:
+            df = doc_freqs[term]
+            idf = math.log((total - df + 0.5) / (df + 0.5) + 1)
+            norm = self.k1 * (1 - self.b + self.b * length / (avg_length or 1))
+            scores[id_] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list[str]], k: int = 60) -> list[str]:
+    """
+    Fuses rankings of ids by the sum of 1 / (k + rank) over the rankings an id appears in.
+
+    :returns: list - Fused ranking, best first.
+    """
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] += 1 / (k + rank)
+
+    return sorted(scores, key=lambda id_: scores[id_], reverse=True)
@@ -10,7 +10,12 @@ from sqlalchemy import (
     JSON,
     ForeignKey,
     Enum,
-    Float
+    Float,
+    LargeBinary,
+    UniqueConstraint,
+    Engine,
+    false,
+    inspect
 )
 from sqlalchemy.orm import (
     registry,
@@ -26,14 +31,19 @@ from src.domain.models import (
     BaseChat,
     ChatModel,
     EmbeddingModel,
-    VectorCollection
+    VectorCollection,
+    IngestionJob,
+    IngestionJobFile,
+    DocumentManifest
 )
 from src.enums import (
     ChatModelName,
     ChunkingStrategy,
     EmbeddingModelName,
     DistanceFunction,
-    Device
+    Device,
+    DocProcType,
+    JobStatus
 )
 
 
@@ -136,9 +146,52 @@ def map_sqlalchemy_models(registry_: registry):
         Column('chat_model_id', Integer, ForeignKey('chat_model.id'), nullable=False),
         Column('system_prompt_id', Integer, ForeignKey('system_prompt.id'), nullable=True),
         Column('vec_col_id', Integer, ForeignKey('vector_collection.id'), nullable=True),
+        Column('answer_cache', Boolean, nullable=False, default=False, server_default=false()),
         Column('datetime', DateTime, default=datetime.now)
     )
 
+    ingestion_job_table = Table(
+        'ingestion_job',
+        registry_.metadata,
+        Column('id', Integer, primary_key=True),
+        Column('vec_col_id', Integer, ForeignKey('vector_collection.id'), nullable=False),
+        Column('cnf_type', Enum(DocProcType), nullable=False),
+        Column('doc_processing_cnf_id', Integer, nullable=False),
+        Column('urls', JSON, nullable=True),
+        Column('upsert', Boolean, nullable=False, default=False),
+        Column('status', Enum(JobStatus), nullable=False),
+        Column('chunks_parsed', Integer, nullable=False),
+        Column('chunks_embedded', Integer, nullable=False),
+        Column('chunks_stored', Integer, nullable=False),
+        Column('chunks_deleted', Integer, nullable=False, default=0),
+        Column('chunks_unchanged', Integer, nullable=False, default=0),
+        Column('error', String, nullable=True),
+        Column('datetime', DateTime, default=datetime.now)
+    )
+
+    # uploaded files are kept until the job is finished, so pending jobs survive restarts
+    ingestion_job_file_table = Table(
+        'ingestion_job_file',
+        registry_.metadata,
+        Column('id', Integer, primary_key=True),
+        Column('job_id', Integer, ForeignKey('ingestion_job.id'), nullable=False),
+        Column('filename', String, nullable=False),
+        Column('content', LargeBinary, nullable=False)
+    )
+
+    document_manifest_table = Table(
+        'document_manifest',
+        registry_.metadata,
+        Column('id', Integer, primary_key=True),
+        Column('vec_col_id', Integer, ForeignKey('vector_collection.id'), nullable=False),
+        Column('name', String, nullable=False),
+        Column('chunks', Integer, nullable=False),
+        Column('size', Integer, nullable=False),
+        Column('embedding_model', String, nullable=False),
+        Column('datetime', DateTime, default=datetime.now, onupdate=datetime.now),
+        UniqueConstraint('vec_col_id', 'name')
+    )
+
     registry_.map_imperatively(ApiKeyCredential, api_key_credential_table)
     registry_.map_imperatively(FakeModel, fake_table)
     registry_.map_imperatively(SystemPrompt, system_prompt_table)
@@ -176,3 +229,23 @@ def map_sqlalchemy_models(registry_: registry):
             'vec_col': relationship(VectorCollection, uselist=False)
         }
     )
+
+    registry_.map_imperatively(IngestionJobFile, ingestion_job_file_table)
+    registry_.map_imperatively(DocumentManifest, document_manifest_table)
+    registry_.map_imperatively(
+        IngestionJob,
+        ingestion_job_table,
+        properties={
+            'files': relationship(IngestionJobFile, cascade='all, delete-orphan')
+        }
+    )
+
+
+def upgrade_sqlalchemy_schema(engine: Engine):
+    """
+    Adds the columns introduced after their tables, create_all only creates the missing tables.
+    """
+    with engine.begin() as connection:
+        base_chat_columns = {column['name'] for column in inspect(connection).get_columns('base_chat')}
+        if 'answer_cache' not in base_chat_columns:
+            connection.exec_driver_sql('ALTER TABLE base_chat ADD COLUMN answer_cache BOOLEAN NOT NULL DEFAULT 0')
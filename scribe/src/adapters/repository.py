@@ -4,6 +4,8 @@ from typing import get_args, Sequence, Optional, Type
 import overrides
 from sqlalchemy import func
 from sqlalchemy import select
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
 
@@ -43,6 +45,21 @@ class AbstractRepository[T](ABC):
         """
         pass
 
+    def update_where(
+            self,
+            id_: int,
+            where: dict,
+            **kwargs
+    ) -> bool:
+        """
+        Updates the record identified by the given id only if it still matches the where criteria,
+        as a single statement, so concurrent writers can't interleave between the check and the update.
+
+        :param where: Filtering criteria the record must match, e.g., field_name=value pairs.
+        :returns: bool - True if the record was updated.
+        """
+        pass
+
     def delete(self, id_: int) -> None:
         pass
 
@@ -113,6 +130,12 @@ class SqlAlchemyRepository[T](AbstractRepository):
 
         return item
 
+    def update_where(self, id_: int, where: dict, **kwargs) -> bool:
+        type_T = get_args(self.__orig_class__)[0]
+        statement = update(type_T).where(type_T.id == id_).filter_by(**where).values(**kwargs)
+
+        return self.session.execute(statement).rowcount > 0
+
     def delete(self, id_: int) -> None:
         """
         :raises ItemNotFoundError: if a nonexistent **id_** is provided.
@@ -195,3 +218,192 @@ class SqlAlchemyRelationRepository[T](SqlAlchemyRepository):
         statement = select(type_T).where(type_T.id == id_).options(joinedload('*'))
 
         return self.session.execute(statement).scalar()
+
+
+class AbstractAsyncRepository[T](ABC):
+
+    async def add(self, item: T) -> T:
+        pass
+
+    async def read(self, id_: int) -> T:
+        pass
+
+    async def read_all(
+            self,
+            offset: Optional[int] = None,
+            limit: Optional[int] = None,
+            **kwargs
+    ) -> Sequence[T]:
+        """
+        Reads all values from the database for the provided type T.
+
+        :param offset: Optional offset value for pagination implementation.
+        :param limit: Optional limit value for pagination implementation.
+        :param kwargs: Optional filtering criteria, e.g., field_name=value pairs.
+        """
+        pass
+
+    async def update(
+            self,
+            id_: int,
+            **kwargs
+    ) -> T:
+        """
+        Updates an existing record in the database identified by the given id.
+
+        :param id_: The unique identifier of the record to be updated.
+        :param kwargs: Optional keyword arguments representing the fields to be updated and their new values.
+        """
+        pass
+
+    async def delete(self, id_: int) -> None:
+        pass
+
+    async def count(self) -> int | None:
+        pass
+
+
+class AsyncSqlAlchemyRepository[T](AbstractAsyncRepository):
+    """
+    SqlAlchemyRepository counterpart on top of the AsyncSession. Relationships are never loaded lazily
+    with the AsyncSession, so the ones accessed by the caller should be loaded by the statements.
+    """
+
+    def __init__(
+            self,
+            session: AsyncSession
+    ):
+        self.session = session
+
+    async def add(self, item: T) -> T:
+        self.session.add(item)
+        await self.session.flush()
+
+        return item
+
+    async def read(self, id_: int) -> T:
+        """
+        :raises ItemNotFoundError: if a nonexistent **id_** is provided.
+        """
+        type_T = get_args(self.__orig_class__)[0]
+        statement = select(type_T).where(type_T.id == id_)
+
+        res = (await self.session.execute(statement)).scalar()
+        if res is None:
+            raise ItemNotFoundError(id_, type_T)
+
+        return res
+
+    async def read_all(
+            self,
+            offset: int | None = None,
+            limit: int | None = None,
+            **kwargs
+    ) -> Sequence[T]:
+        type_T = get_args(self.__orig_class__)[0]
+        statement = select(type_T).offset(offset).limit(limit).filter_by(**kwargs)
+        return (await self.session.execute(statement)).scalars().all()
+
+    async def update(self, id_: int, **kwargs) -> T:
+        """
+        :raises ItemNotFoundError: if a nonexistent **id_** is provided.
+        """
+        type_T = get_args(self.__orig_class__)[0]
+
+        item = await self.session.get(type_T, id_)
+        if item is None:
+            raise ItemNotFoundError(id_, type_T)
+
+        item_dict = item.__dict__
+
+        # resolving attributes to be updated in obj_ based on the provided **kwargs
+        for key, value in kwargs.items():
+            if key in item_dict:
+                setattr(item, key, value)
+
+        await self.session.flush()
+
+        return item
+
+    async def delete(self, id_: int) -> None:
+        """
+        :raises ItemNotFoundError: if a nonexistent **id_** is provided.
+        """
+        type_T = get_args(self.__orig_class__)[0]
+
+        item = await self.session.get(type_T, id_)
+        if item is None:
+            raise ItemNotFoundError(id_, type_T)
+
+        await self.session.delete(item)
+
+    async def count(self) -> int | None:
+        """
+        Counts rows in a type_T table.
+        """
+        type_T = get_args(self.__orig_class__)[0]
+        statement = select(func.count()).select_from(type_T)
+
+        return (await self.session.execute(statement)).scalar()
+
+
+class AsyncSqlAlchemyRelationRepository[T](AsyncSqlAlchemyRepository):
+
+    @overrides.override
+    async def add(self, item: T) -> T:
+        type_T = get_args(self.__orig_class__)[0]
+        self.session.add(item)
+        await self.session.flush()
+
+        statement = select(type_T).where(type_T.id == item.id).options(joinedload('*'))
+
+        return (await self.session.execute(statement)).scalar()
+
+    @overrides.override
+    async def read(self, id_: int) -> T:
+        """
+        :raises ItemNotFoundError: if a nonexistent **id_** is provided.
+        """
+        type_T = get_args(self.__orig_class__)[0]
+        statement = select(type_T).where(type_T.id == id_).options(joinedload('*'))
+
+        res = (await self.session.execute(statement)).scalar()
+        if res is None:
+            raise ItemNotFoundError(id_, type_T)
+
+        return res
+
+    @overrides.override
+    async def read_all(
+            self,
+            offset: int | None = None,
+            limit: int | None = None,
+            **kwargs
+    ) -> Sequence[T]:
+        type_T = get_args(self.__orig_class__)[0]
+        statement = select(type_T).offset(offset).limit(limit).filter_by(**kwargs).options(joinedload('*'))
+        return (await self.session.execute(statement)).scalars().all()
+
+    @overrides.override
+    async def update(self, id_: int, **kwargs) -> T:
+        """
+        :raises ItemNotFoundError: if a nonexistent **id_** is provided.
+        """
+        type_T = get_args(self.__orig_class__)[0]
+
+        item = await self.session.get(type_T, id_)
+        if item is None:
+            raise ItemNotFoundError(id_, type_T)
+
+        item_dict = item.__dict__
+
+        # resolving attributes to be updated in obj_ based on the provided **kwargs
+        for key, value in kwargs.items():
+            if key in item_dict:
+                setattr(item, key, value)
+
+        await self.session.flush()
+
+        statement = select(type_T).where(type_T.id == id_).options(joinedload('*'))
+
+        return (await self.session.execute(statement)).scalar()
@@ -0,0 +1,80 @@
+"""
+Local cross-encoder reranking of the retrieved documents.
+"""
+import logging
+import threading
+from abc import ABC
+from typing import Any, Callable
+
+from src.adapters.chroma_models import VectorChromaDocument
+from src.enums import RerankerModelName, Device
+
+
+class AbstractReranker(ABC):
+    candidates: int
+
+    def rerank(self, query: str, docs: list[VectorChromaDocument], top_k: int) -> list[VectorChromaDocument]:
+        pass
+
+
+def load_cross_encoder(name: RerankerModelName, device: Device) -> Any:
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(name.value, device=device.value)
+
+
+class CrossEncoderReranker(AbstractReranker):
+    """
+    Scores (query, document) pairs with a sentence transformers cross-encoder and keeps the best ones.
+    The model is loaded on the first rerank and shared by all the requests of the process.
+    """
+
+    def __init__(
+            self,
+            name: RerankerModelName,
+            device: Device,
+            candidates: int = 50,
+            batch_size: int = 32,
+            loader: Callable[[RerankerModelName, Device], Any] = load_cross_encoder
+    ):
+        """
+        :param candidates: Amount of documents retrieved for reranking.
+        :param batch_size: Amount of pairs scored with one forward pass.
+        :param loader: Loads a model for the provided name and device.
+        """
+        self.name = name
+        self.device = device
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self.loader = loader
+
+        self._model: Any | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    logging.info(f'Loading reranker model {self.name.value} on {self.device.value}.')
+                    self._model = self.loader(self.name, self.device)
+
+        return self._model
+
+    def rerank(self, query: str, docs: list[VectorChromaDocument], top_k: int) -> list[VectorChromaDocument]:
+        """
+        Blocking, meant to be run in a worker thread.
+
+        :returns: list - top_k documents with the highest scores, best first.
+        """
+        if not docs:
+            return []
+
+        scores = self.model.predict(
+            [(query, doc.document) for doc in docs],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        ranked = sorted(zip(scores, range(len(docs))), key=lambda item: item[0], reverse=True)
+
+        return [docs[i] for _, i in ranked[:top_k]]
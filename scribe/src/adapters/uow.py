@@ -1,9 +1,15 @@
 from abc import ABC
 from typing import Type
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .repository import SqlAlchemyRepository, AbstractRepository
+from .repository import (
+    SqlAlchemyRepository,
+    AbstractRepository,
+    AsyncSqlAlchemyRepository,
+    AbstractAsyncRepository
+)
 
 
 class AbstractUoW(ABC):
@@ -27,6 +33,11 @@ class AbstractUoW(ABC):
 
 
 class AsyncAbstractUoW(ABC):
+    """
+    Async counterpart of the AbstractUoW, used as an async context manager.
+    """
+    repository: AbstractAsyncRepository
+
     async def commit(self):
         pass
 
@@ -67,3 +78,31 @@ class SqlAlchemyUoW(AbstractUoW):
 
     def __exit__(self, *args):
         self.session.close()
+
+
+class AsyncSqlAlchemyUoW(AsyncAbstractUoW):
+    """
+    SqlAlchemyUoW on top of the AsyncSession, so the async handlers don't block the event loop on db calls.
+
+    Rollbacks in case of exceptions or exit. Commits should be explicit.
+    """
+
+    def __init__(
+            self,
+            repository: Type[AsyncSqlAlchemyRepository],
+            session: AsyncSession
+    ):
+        self.session = session
+        self.repository = repository(self.session)
+
+    async def commit(self):
+        await self.session.commit()
+
+    async def rollback(self):
+        await self.session.rollback()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.session.close()
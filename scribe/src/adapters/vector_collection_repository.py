@@ -1,13 +1,19 @@
-from typing import Optional, Callable, Sequence
+import asyncio
+import time
+from typing import Optional, Callable, Sequence, Iterable, AsyncIterable, AsyncIterator, Sized, NamedTuple
 from abc import ABC
 
 from chromadb.api.models import AsyncCollection
 from chromadb import AsyncClientAPI
 from chromadb.errors import InvalidCollectionException, InvalidArgumentError
-from chromadb.api.types import GetResult
+from chromadb.api.types import GetResult, QueryResult, Embeddings
 
 from src.adapters.chroma_models import VectorChromaDocument
+from src.adapters.lexical_index import AbstractLexicalIndex, doc_name, reciprocal_rank_fusion
 from src.domain.models import VectorDocument
+from src.enums import RetrievalMode
+from src.system.pipeline import AsyncPipeline, abatched, aiter_items
+from src.system.tracing import ingestion_stage, observe_embedding_batch
 
 
 class AbstractAsyncVectorCollectionRepository[T](ABC):
@@ -86,14 +92,45 @@ class AsyncChromaVectorCollectionRepository(AbstractAsyncVectorCollectionReposit
         return await self.client.count_collections()
 
 
+class DocumentDiff(NamedTuple):
+    """Amounts of chunks added, deleted and left unchanged by an upsert."""
+    added: int
+    deleted: int
+    unchanged: int
+
+
 class AbstractAsyncDocumentRepository(ABC):
-    async def add(self, docs):
+    async def add(
+            self,
+            docs,
+            batch_size: int | None = None,
+            on_embedded: Optional[Callable[[int], None]] = None,
+            on_stored: Optional[Callable[[int], None]] = None
+    ):
+        pass
+
+    async def upsert(
+            self,
+            docs,
+            batch_size: int | None = None,
+            on_embedded: Optional[Callable[[int], None]] = None,
+            on_stored: Optional[Callable[[int], None]] = None
+    ) -> DocumentDiff:
         pass
 
     async def read(self):
         pass
 
-    async def read_all(self, limit: int | None, offset: int | None):
+    async def read_all(self, limit: int | None, offset: int | None, include_embeddings: bool = False):
+        pass
+
+    def read_pages(
+            self,
+            page_size: int,
+            offset: int = 0,
+            limit: int | None = None,
+            include_embeddings: bool = False
+    ) -> AsyncIterator:
         pass
 
     async def update(self):
@@ -105,47 +142,271 @@ class AbstractAsyncDocumentRepository(ABC):
     async def count(self):
         pass
 
-    async def peek(self):
+    async def peek(self, include_embeddings: bool = False):
         pass
 
-    async def query(self, query_string, doc_names, n_results):
+    async def query(
+            self,
+            query_string,
+            doc_names,
+            n_results,
+            include_embeddings: bool = False,
+            mode: RetrievalMode = RetrievalMode.DENSE
+    ):
         pass
 
     async def list_documents(self):
         pass
 
+    async def document_stats(self, name: str) -> tuple[int, int]:
+        pass
+
+    async def scan_documents(self) -> dict[str, tuple[int, int]]:
+        pass
+
+
+class LexicalIndexNotConfiguredError(RuntimeError):
+    def __init__(self, mode: RetrievalMode):
+        super().__init__(f"Retrieval mode: '{mode.value}' requires a lexical index.")
+
 
 class AsyncChromaDocumentRepository(AbstractAsyncDocumentRepository):
-    def __init__(self, async_collection: AsyncCollection):
+    default_batch_size = 64
+    # hybrid queries fuse this many times n_results candidates of every ranking
+    hybrid_candidates_factor = 4
+    rrf_k = 60
+
+    def __init__(
+            self,
+            async_collection: AsyncCollection,
+            embedding_function: Optional[Callable] = None,
+            max_concurrency: int = 4,
+            lexical_index: Optional[AbstractLexicalIndex] = None
+    ):
+        """
+        :param embedding_function: If supplied, documents and queries are embedded by the repository in a worker
+        thread, otherwise the collection's embedding function embeds them on the event loop.
+        :param max_concurrency: Maximum amount of batches in flight per stage.
+        :param lexical_index: If supplied, it's kept in sync on add and delete, and enables lexical and hybrid
+        queries.
+        """
         self.async_collection = async_collection
+        self.embedding_function = embedding_function
+        self.max_concurrency = max_concurrency
+        self.lexical_index = lexical_index
 
-    async def add(self, docs: list[VectorDocument]) -> None:
-        for doc in docs:
-            await self.async_collection.add(
-                ids=doc.id_,
-                metadatas=doc.metadata,
-                documents=doc.page_content
-            )
+    async def add(
+            self,
+            docs: Iterable[VectorDocument] | AsyncIterable[VectorDocument],
+            batch_size: int | None = None,
+            on_embedded: Optional[Callable[[int], None]] = None,
+            on_stored: Optional[Callable[[int], None]] = None
+    ) -> None:
+        """
+        Inserts documents in batches, every batch is embedded with one call and sent with one request.
+        Documents with duplicate ids are sent only once.
+
+        Documents may be an async iterable, e.g. chunks of documents that are still being parsed. Batches are
+        embedded and stored as soon as they are filled, while at most max_concurrency batches wait in front of
+        every stage.
+
+        :param batch_size: Amount of documents per batch, should respect the embedding provider's limits and
+        chroma's max_batch_size. If not provided, a list of documents is sent in one batch, an async iterable
+        in batches of the default_batch_size.
+        :param on_embedded: Called with the size of every embedded batch.
+        :param on_stored: Called with the size of every stored batch.
+        """
+        if batch_size is None:
+            batch_size = max(len(docs), 1) if isinstance(docs, Sized) else self.default_batch_size
+
+        async def unique_docs() -> AsyncIterator[VectorDocument]:
+            seen_ids = set()
+            async for doc in aiter_items(docs):
+                if doc.id_ not in seen_ids:
+                    seen_ids.add(doc.id_)
+                    yield doc
+
+        async def embed_batch(batch: list[VectorDocument]) -> tuple[list[VectorDocument], Embeddings | None]:
+            embeddings = None
+            if all(doc.embedding is not None for doc in batch):
+                # e.g. semantic chunks, embedded while chunking
+                embeddings = [doc.embedding for doc in batch]
+            elif self.embedding_function is not None:
+                start = time.perf_counter()
+                with ingestion_stage('repository', 'embed', collection=self.async_collection.name, size=len(batch)):
+                    embeddings = await asyncio.to_thread(
+                        self.embedding_function,
+                        [doc.page_content for doc in batch]
+                    )
+                observe_embedding_batch('repository', len(batch), time.perf_counter() - start)
+
+            if embeddings is not None and on_embedded is not None:
+                on_embedded(len(batch))
+
+            return batch, embeddings
+
+        async def store_batch(embedded_batch: tuple[list[VectorDocument], Embeddings | None]) -> None:
+            batch, embeddings = embedded_batch
+            ids = [doc.id_ for doc in batch]
+            metadatas = [doc.metadata for doc in batch]
+            documents = [doc.page_content for doc in batch]
+            with ingestion_stage('repository', 'insert', collection=self.async_collection.name, size=len(batch)):
+                await self.async_collection.add(
+                    ids=ids,
+                    metadatas=metadatas,
+                    documents=documents,
+                    embeddings=embeddings
+                )
+            if self.lexical_index is not None:
+                with ingestion_stage('repository', 'lexical_index', collection=self.async_collection.name):
+                    await asyncio.to_thread(
+                        self.lexical_index.add,
+                        self.async_collection.name,
+                        ids,
+                        documents,
+                        metadatas
+                    )
+
+            # the collection's embedding function embeds the batch while adding it
+            if embeddings is None and on_embedded is not None:
+                on_embedded(len(batch))
+            if on_stored is not None:
+                on_stored(len(batch))
+
+        await (
+            AsyncPipeline(abatched(unique_docs(), batch_size), maxsize=self.max_concurrency)
+            .pipe(embed_batch, workers=self.max_concurrency)
+            .pipe(store_batch, workers=self.max_concurrency)
+            .run()
+        )
 
         return None
 
+    async def upsert(
+            self,
+            docs: Iterable[VectorDocument] | AsyncIterable[VectorDocument],
+            batch_size: int | None = None,
+            on_embedded: Optional[Callable[[int], None]] = None,
+            on_stored: Optional[Callable[[int], None]] = None
+    ) -> DocumentDiff:
+        """
+        Replaces the stored chunks of the documents with the new ones. Chunk ids are content hashes, so the chunks
+        are diffed by id per filename or url: only new chunks are embedded and inserted, stale chunks are deleted
+        once the new ones are stored, and metadata of the unchanged chunks (e.g. chunk_index) is refreshed.
+
+        :param batch_size: See add.
+        :returns: DocumentDiff - Amounts of added, deleted and unchanged chunks.
+        """
+        stored: dict[str, set[str]] = {}
+        kept: dict[str, dict[str, dict]] = {}
+        added = 0
+
+        async def new_docs() -> AsyncIterator[VectorDocument]:
+            async for doc in aiter_items(docs):
+                name = doc_name(doc.metadata)
+                if name is not None and name not in stored:
+                    stored[name] = await self.stored_ids(name)
+                    kept[name] = {}
+
+                if name is not None and doc.id_ in stored[name]:
+                    kept[name][doc.id_] = doc.metadata
+                else:
+                    yield doc
+
+        def count_stored(amount: int) -> None:
+            nonlocal added
+            added += amount
+            if on_stored is not None:
+                on_stored(amount)
+
+        await self.add(new_docs(), batch_size=batch_size, on_embedded=on_embedded, on_stored=count_stored)
+
+        batch_size = batch_size or self.default_batch_size
+        stale = [id_ for name, ids in stored.items() for id_ in ids - kept[name].keys()]
+        for i in range(0, len(stale), batch_size):
+            await self.async_collection.delete(ids=stale[i:i + batch_size])
+        if stale and self.lexical_index is not None:
+            await asyncio.to_thread(self.lexical_index.delete_ids, self.async_collection.name, stale)
+
+        # no documents are passed, so the unchanged chunks aren't embedded again
+        unchanged = [(id_, metadata) for ids in kept.values() for id_, metadata in ids.items()]
+        for i in range(0, len(unchanged), batch_size):
+            ids, metadatas = zip(*unchanged[i:i + batch_size])
+            await self.async_collection.update(ids=list(ids), metadatas=list(metadatas))
+
+        return DocumentDiff(added=added, deleted=len(stale), unchanged=len(unchanged))
+
+    async def stored_ids(self, name: str) -> set[str]:
+        """
+        :returns: set - Ids of the stored chunks of the document by its filename or url.
+        """
+        res = await self.async_collection.get(where=self.doc_names_filter([name]), include=[])
+        return set(res['ids'])
+
     async def read(self):
         raise NotImplementedError
 
-    async def read_all(self, limit: int | None, offset: int | None) -> list[VectorChromaDocument]:
+    async def read_all(
+            self,
+            limit: int | None,
+            offset: int | None,
+            include_embeddings: bool = False
+    ) -> list[VectorChromaDocument]:
+        """
+        :param include_embeddings: Embeddings are fetched from chroma only if requested.
+        """
         res = await self.async_collection.get(
             limit=limit,
             offset=offset,
-            include=["metadatas", "documents", "embeddings"]
+            include=self.projection(['metadatas', 'documents'], include_embeddings)
         )
 
         return self.map_get_result(res)
 
+    async def read_pages(
+            self,
+            page_size: int,
+            offset: int = 0,
+            limit: int | None = None,
+            include_embeddings: bool = False
+    ) -> AsyncIterator[GetResult]:
+        """
+        Pages through the collection, so only a page or two are held in memory at once. The next page is fetched,
+        while the current one is consumed. Paging is offset based, since chroma has no other cursor, so documents
+        added or deleted meanwhile may shift the pages.
+
+        :param offset: Offset of the first document, e.g. to resume an interrupted read.
+        :param limit: Maximum amount of documents, if not provided, the collection is read to the end.
+        """
+        include = self.projection(['metadatas', 'documents'], include_embeddings)
+
+        def fetch(page_offset: int) -> asyncio.Task | None:
+            size = page_size if limit is None else min(page_size, offset + limit - page_offset)
+            if size <= 0:
+                return None
+
+            return asyncio.ensure_future(self.async_collection.get(limit=size, offset=page_offset, include=include))
+
+        page_offset = offset
+        next_page = fetch(page_offset)
+        try:
+            while next_page is not None:
+                res = await next_page
+                if not res['ids']:
+                    break
+
+                page_offset += len(res['ids'])
+                next_page = fetch(page_offset) if len(res['ids']) == page_size else None
+                yield res
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
     async def update(self):
         raise NotImplementedError
 
     async def delete(self, doc_name: str) -> None:
-        return await self.async_collection.delete(
+        await self.async_collection.delete(
             where={
                 '$or': [
                     {
@@ -163,11 +424,18 @@ class AsyncChromaDocumentRepository(AbstractAsyncDocumentRepository):
             }
         )
 
+        if self.lexical_index is not None:
+            await asyncio.to_thread(self.lexical_index.delete, self.async_collection.name, doc_name)
+
     async def count(self):
         return await self.async_collection.count()
 
-    async def peek(self) -> list[VectorChromaDocument]:
-        res = await self.async_collection.peek(limit=3)
+    async def peek(self, include_embeddings: bool = False) -> list[VectorChromaDocument]:
+        # collection.peek always includes the embeddings
+        res = await self.async_collection.get(
+            limit=3,
+            include=self.projection(['metadatas', 'documents'], include_embeddings)
+        )
         return self.map_get_result(res)
 
     async def query(
@@ -175,59 +443,174 @@ class AsyncChromaDocumentRepository(AbstractAsyncDocumentRepository):
             query_string: str,
             doc_names: Optional[list[str]] = None,
             n_results: Optional[int] = None,
+            include_embeddings: bool = False,
+            mode: RetrievalMode = RetrievalMode.DENSE
     ) -> list[VectorChromaDocument]:
+        """
+        :param include_embeddings: Embeddings are fetched from chroma only if requested.
+        :param mode: Dense ranks by embedding similarity, lexical by BM25 over the lexical index, hybrid fuses both
+        rankings with reciprocal rank fusion. Lexically retrieved documents have no distance.
+        :raises LexicalIndexNotConfiguredError:
+        """
         if n_results is None:
             n_results = 1
 
-        search_dict = None
-        if doc_names is not None:
-            search_dict = {
-                '$or': [
-                    {
-                        'filename': {
-                            '$in': doc_names
-                        }
-                    },
-                    {
-                        'url': {
-                            '$in': doc_names
-                        }
-                    }
-                ]
-            }
+        if mode == RetrievalMode.DENSE:
+            res = await self.dense_query(query_string, doc_names, n_results, include_embeddings)
+            return self.map_query_get_result(res)
+
+        if self.lexical_index is None:
+            raise LexicalIndexNotConfiguredError(mode)
+        await self.ensure_lexical_index()
+
+        if mode == RetrievalMode.LEXICAL:
+            lexical = await asyncio.to_thread(
+                self.lexical_index.search,
+                self.async_collection.name,
+                query_string,
+                n_results,
+                doc_names
+            )
+            ids = [id_ for id_, _ in lexical]
+            docs = await self.get_by_ids(ids, include_embeddings)
+
+            return [docs[id_] for id_ in ids if id_ in docs]
+
+        n_candidates = n_results * self.hybrid_candidates_factor
+        res, lexical = await asyncio.gather(
+            self.dense_query(query_string, doc_names, n_candidates, include_embeddings),
+            asyncio.to_thread(
+                self.lexical_index.search,
+                self.async_collection.name,
+                query_string,
+                n_candidates,
+                doc_names
+            )
+        )
+
+        dense_docs = dict(zip(res['ids'][0], self.map_query_get_result(res)))
+        fused_ids = reciprocal_rank_fusion([list(dense_docs), [id_ for id_, _ in lexical]], k=self.rrf_k)[:n_results]
 
-        res = await self.async_collection.query(
-            query_texts=query_string,
-            include=['metadatas', 'embeddings', 'documents', 'distances'],
+        # documents found only lexically are fetched by their ids
+        docs = dense_docs | await self.get_by_ids(
+            [id_ for id_ in fused_ids if id_ not in dense_docs],
+            include_embeddings
+        )
+
+        return [docs[id_] for id_ in fused_ids if id_ in docs]
+
+    async def dense_query(
+            self,
+            query_string: str,
+            doc_names: Optional[list[str]],
+            n_results: int,
+            include_embeddings: bool
+    ) -> QueryResult:
+        # the query is embedded by the repository's embedding function, e.g. through the query embedding cache
+        query_kwargs = dict(query_texts=query_string)
+        if self.embedding_function is not None:
+            query_kwargs = dict(query_embeddings=await asyncio.to_thread(self.embedding_function, [query_string]))
+
+        return await self.async_collection.query(
+            **query_kwargs,
+            include=self.projection(['metadatas', 'documents', 'distances'], include_embeddings),
             n_results=n_results,
-            where=search_dict
+            where=self.doc_names_filter(doc_names)
+        )
+
+    async def get_by_ids(self, ids: list[str], include_embeddings: bool) -> dict[str, VectorChromaDocument]:
+        """
+        :returns: dict - Documents by their ids, ids missing from chroma are omitted.
+        """
+        if not ids:
+            return {}
+
+        res = await self.async_collection.get(
+            ids=ids,
+            include=self.projection(['metadatas', 'documents'], include_embeddings)
         )
 
-        return self.map_query_get_result(res)
+        return dict(zip(res['ids'], self.map_get_result(res)))
+
+    async def ensure_lexical_index(self, page_size: int = 1000) -> None:
+        """
+        Indexes the documents of collections populated before the lexical index existed, once per collection.
+        Documents added since are indexed already, so a non-empty index doesn't mean the collection is.
+        """
+        name = self.async_collection.name
+        if await asyncio.to_thread(self.lexical_index.is_backfilled, name):
+            return None
+
+        total = await self.async_collection.count()
+        for offset in range(0, total, page_size):
+            res = await self.async_collection.get(limit=page_size, offset=offset, include=['metadatas', 'documents'])
+            await asyncio.to_thread(self.lexical_index.add, name, res['ids'], res['documents'], res['metadatas'])
+
+        await asyncio.to_thread(self.lexical_index.mark_backfilled, name)
+
+    @staticmethod
+    def doc_names_filter(doc_names: Optional[list[str]]) -> Optional[dict]:
+        if doc_names is None:
+            return None
+
+        return {
+            '$or': [
+                {
+                    'filename': {
+                        '$in': doc_names
+                    }
+                },
+                {
+                    'url': {
+                        '$in': doc_names
+                    }
+                }
+            ]
+        }
 
     async def list_documents(self) -> list[str]:
-        res = await self.async_collection.get()
+        return list(await self.scan_documents())
+
+    async def document_stats(self, name: str) -> tuple[int, int]:
+        """
+        :returns: tuple - Amount of the stored chunks of the document by its filename or url, and their size in bytes.
+        """
+        res = await self.async_collection.get(where=self.doc_names_filter([name]), include=['documents'])
+        return len(res['ids']), sum(len(document.encode()) for document in res['documents'])
+
+    async def scan_documents(self, page_size: int = 1000) -> dict[str, tuple[int, int]]:
+        """
+        Scans the whole collection page by page, prefer the document manifest.
+
+        :returns: dict - Amount of the stored chunks and their size in bytes by the document filename or url.
+        """
+        stats: dict[str, tuple[int, int]] = {}
 
-        doc_names = set()
-        for item in res['metadatas']:
-            filename = item.get('filename')
-            url = item.get('url')
+        total = await self.async_collection.count()
+        for offset in range(0, total, page_size):
+            res = await self.async_collection.get(limit=page_size, offset=offset, include=['metadatas', 'documents'])
+            for metadata, document in zip(res['metadatas'], res['documents']):
+                name = doc_name(metadata)
+                if name:
+                    chunks, size = stats.get(name, (0, 0))
+                    stats[name] = chunks + 1, size + len(document.encode())
 
-            if filename:
-                doc_names.add(filename)
-            elif url:
-                doc_names.add(url)
+        return stats
 
-        return list(doc_names)
+    @staticmethod
+    def projection(include: list[str], include_embeddings: bool) -> list[str]:
+        return include + ['embeddings'] if include_embeddings else include
 
     @staticmethod
     def map_get_result(res: GetResult) -> list[VectorChromaDocument]:
+        embeddings = res['embeddings'] if res['embeddings'] is not None else [None] * len(res['ids'])
+
         mapped_res: list[VectorChromaDocument] = []
         for id_, document, metadata, embedding in zip(
                 res['ids'],
                 res['documents'],
                 res['metadatas'],
-                res['embeddings'],
+                embeddings,
         ):
             mapped_res.append(
                 VectorChromaDocument(
@@ -242,12 +625,14 @@ class AsyncChromaDocumentRepository(AbstractAsyncDocumentRepository):
 
     @staticmethod
     def map_query_get_result(res: GetResult) -> list[VectorChromaDocument]:
+        embeddings = res['embeddings'] if res['embeddings'] is not None else [[None] * len(res['ids'][0])]
+
         mapped_res: list[VectorChromaDocument] = []
         for id_, document, metadata, embedding, distance in zip(
                 *res['ids'],
                 *res['documents'],
                 *res['metadatas'],
-                *res['embeddings'],
+                *embeddings,
                 *res['distances']  # type: ignore
         ):
             mapped_res.append(
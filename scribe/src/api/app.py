@@ -11,12 +11,13 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from src.adapters.collection_archive import CollectionArchiveError
 from src.adapters.repository import ItemNotFoundError
 from src.adapters.vector_collection_repository import (
     CollectionNameError,
     CollectionNotFoundError
 )
-from src.bootstrap import bootstrap, shutdown
+from src.bootstrap import bootstrap, async_bootstrap, shutdown
 from src.domain.services.load_document_service import (
     UnsupportedFileFormatError,
     UnsupportedSemanticFileFormatError
@@ -31,7 +32,8 @@ from .routers import (
     embedding_model,
     vector_collection,
     vector_document,
-    sem_doc_proc_cnf
+    sem_doc_proc_cnf,
+    ingestion_job
 )
 from src.handlers.base_chat import InvalidBaseChatObjectError
 
@@ -39,8 +41,9 @@ from src.handlers.base_chat import InvalidBaseChatObjectError
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     bootstrap()  # things to be completed before the app's start-up
+    await async_bootstrap()
     yield
-    shutdown()  # things to be completed on shutdown
+    await shutdown()  # things to be completed on shutdown
 
 
 app = FastAPI(lifespan=lifespan)
@@ -53,6 +56,7 @@ app.include_router(embedding_model.router)
 app.include_router(vector_collection.router)
 app.include_router(vector_document.router)
 app.include_router(sem_doc_proc_cnf.router)
+app.include_router(ingestion_job.router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -134,3 +138,11 @@ async def handle_collection_not_found_error(req, exc: CollectionNotFoundError):
         status_code=status.HTTP_404_NOT_FOUND,
         detail=exc.__str__()
     )
+
+
+@app.exception_handler(CollectionArchiveError)
+async def handle_collection_archive_error(req, exc: CollectionArchiveError):
+    raise HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=exc.__str__()
+    )
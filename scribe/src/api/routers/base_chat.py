@@ -13,6 +13,7 @@ from src.api.routers import (
     vector_collection
 )
 from src.di_container import Container
+from src.enums import RetrievalMode, StreamFormat
 from src.handlers.base_chat import (
     BaseChatAddCommand,
     BaseChatReadQuery,
@@ -39,6 +40,7 @@ class BaseChatResponseModel(BaseModel):
     system_prompt: system_prompt.SystemPromptResponseModel | None
     vec_col_id: int | None
     vec_col: vector_collection.VectorCollectionResponseModel | None
+    answer_cache: bool
     datetime: datetime
 
 
@@ -48,6 +50,7 @@ class BaseChatAddModel(BaseModel):
     chat_model_id: int
     system_prompt_id: Optional[int] = None
     vec_col_id: Optional[int] = None
+    answer_cache: bool = False
 
 
 class BaseChatPutModel(BaseModel):
@@ -56,6 +59,7 @@ class BaseChatPutModel(BaseModel):
     system_prompt_id: Optional[int] = None
     chat_model_id: Optional[int] = None
     vec_col_id: Optional[int] = None
+    answer_cache: Optional[bool] = None
 
 
 @router.post(
@@ -118,7 +122,9 @@ def update_base_chat(
         item: BaseChatPutModel,
         mediatr: Mediator = Depends(Provide[Container.mediatr])
 ):
-    command = BaseChatUpdateCommand(id_, **item.model_dump())
+    # answer cache is kept as is if not provided, clients not aware of it don't turn it off
+    exclude = {'answer_cache'} if item.answer_cache is None else None
+    command = BaseChatUpdateCommand(id_, **item.model_dump(exclude=exclude))
     return mediatr.send(command)
 
 
@@ -139,6 +145,9 @@ class BaseChatStreamModel(BaseModel):
     query_string: str
     doc_names: Optional[list[str]] = None
     n_results: Optional[int] = None
+    mode: RetrievalMode = RetrievalMode.DENSE
+    rerank: bool = False
+    stream_format: StreamFormat = StreamFormat.BASE64
 
 
 @router.post(
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Optional
+
+from dependency_injector.wiring import inject, Provide
+from fastapi import APIRouter, Depends
+from mediatr import Mediator
+from pydantic import BaseModel
+
+from src.di_container import Container
+from src.enums import DocProcType, JobStatus
+from src.handlers.ingestion_job import (
+    IngestionJobReadQuery,
+    IngestionJobReadAllQuery,
+    IngestionJobCancelCommand
+)
+
+router = APIRouter(
+    prefix='/ingestion-job',
+    tags=['Ingestion Job']
+)
+
+
+class IngestionJobResponseModel(BaseModel):
+    id: int
+    vec_col_id: int
+    cnf_type: DocProcType
+    doc_processing_cnf_id: int
+    urls: str | None
+    upsert: bool
+    status: JobStatus
+    chunks_parsed: int
+    chunks_embedded: int
+    chunks_stored: int
+    chunks_deleted: int
+    chunks_unchanged: int
+    error: str | None
+    datetime: datetime
+
+
+@router.get(
+    '/{id_}',
+    response_model=IngestionJobResponseModel
+)
+@inject
+def read_ingestion_job(
+        id_: int,
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    query = IngestionJobReadQuery(id_=id_)
+    return mediatr.send(query)
+
+
+@router.get(
+    '/',
+    response_model=list[IngestionJobResponseModel]
+)
+@inject
+def read_all_ingestion_job(
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        status: Optional[JobStatus] = None,
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    filters = {'status': status} if status is not None else {}
+    query = IngestionJobReadAllQuery(limit=limit, offset=offset, **filters)
+    return mediatr.send(query)
+
+
+@router.post(
+    '/{id_}/cancel',
+    response_model=IngestionJobResponseModel
+)
+@inject
+def cancel_ingestion_job(
+        id_: int,
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    command = IngestionJobCancelCommand(id_=id_)
+    return mediatr.send(command)
@@ -1,8 +1,13 @@
+import asyncio
+import os
+import shutil
+import tempfile
 from datetime import datetime
 from typing import Optional
 
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, UploadFile, Form, Query
+from fastapi.responses import StreamingResponse
 from mediatr import Mediator
 from pydantic import BaseModel
 
@@ -13,7 +18,9 @@ from src.handlers.vector_collection import (
     VecCollectionReadQuery,
     VecCollectionCountQuery,
     VecCollectionDeleteCommand,
-    VecCollectionReadAllQuery
+    VecCollectionReadAllQuery,
+    VecCollectionExportQuery,
+    VecCollectionImportCommand
 )
 from src.enums import DistanceFunction
 
@@ -51,6 +58,57 @@ async def create_vec_col(
     return await mediatr.send_async(command)
 
 
+@router.post(
+    '/import',
+    status_code=status.HTTP_201_CREATED,
+    response_model=VectorCollectionResponseModel
+)
+@inject
+async def import_vec_col(
+        file: UploadFile,
+        embedding_model_id: int = Form(...),
+        name: Optional[str] = Form(None),
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    """
+    Restores a collection from an archive of /vec-col/{id_}/export without embedding it again. The embedding model
+    should be the one the archive was embedded with. The collection keeps its archived name, if none is provided.
+    """
+    # the archive is memory-mapped, so it's copied into a file on disk, rather than read into memory
+    with tempfile.NamedTemporaryFile(suffix='.tar', delete=False) as archive:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, archive)
+
+    try:
+        command = VecCollectionImportCommand(path=archive.name, embedding_model_id=embedding_model_id, name=name)
+        return await mediatr.send_async(command)
+    finally:
+        os.unlink(archive.name)
+
+
+@router.get(
+    '/{id_}/export',
+    response_class=StreamingResponse
+)
+@inject
+async def export_vec_col(
+        id_: int,
+        page_size: int = Query(1000, ge=1),
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    """
+    Exports the collection as a tar of manifest.json (embedding model, distance function, count, dimensions),
+    embeddings.npy (float32 matrix) and documents.jsonl (id, document and metadata per embedding row).
+    """
+    query = VecCollectionExportQuery(id_=id_, page_size=page_size)
+    async_generator = await mediatr.send_async(query)
+
+    return StreamingResponse(
+        async_generator,  # type: ignore
+        media_type='application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename="vec-col-{id_}.tar"'}
+    )
+
+
 @router.delete(
     '/{id_}',
     status_code=status.HTTP_204_NO_CONTENT
@@ -1,19 +1,25 @@
 from dependency_injector.wiring import inject, Provide
-from fastapi import APIRouter, Depends, UploadFile, Form, status
+from fastapi import APIRouter, Depends, UploadFile, Form, Query, status
+from fastapi.responses import StreamingResponse
 from mediatr import Mediator
+from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
 
-from src.enums import DocProcType
+from src.enums import DocProcType, RetrievalMode
 from src.di_container import Container
+from src.api.routers.ingestion_job import IngestionJobResponseModel
 from src.handlers.vector_document import (
     DocAddCommand,
     DocReadAllQuery,
+    DocExportQuery,
     DocCountQuery,
     DocDeleteCommand,
     DocPeekQuery,
     DocQuery,
-    DocListDocsQuery
+    DocQueryWarmCommand,
+    DocListDocsQuery,
+    DocManifestQuery
 )
 
 router = APIRouter(
@@ -25,11 +31,19 @@ router = APIRouter(
 class VectorDocumentResponseModel(BaseModel):
     id_: str
     distance: float | None
-    embedding: str
+    embedding: str | None
     document: str
     metadata: dict
 
 
+class DocumentManifestResponseModel(BaseModel):
+    name: str
+    chunks: int
+    size: int
+    embedding_model: str
+    datetime: datetime
+
+
 class VectorDocumentDeleteModel(BaseModel):
     doc_name: str
 
@@ -38,12 +52,18 @@ class VectorQueryPostModel(BaseModel):
     query_string: str
     doc_names: Optional[list[str]] = None
     n_results: Optional[int] = None
+    include_embeddings: bool = False
+    mode: RetrievalMode = RetrievalMode.DENSE
+
+
+class VectorQueryWarmPostModel(BaseModel):
+    queries: list[str]
 
 
 @router.post(
     path='/{id_}',
-    status_code=status.HTTP_201_CREATED,
-    response_model=None
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=IngestionJobResponseModel
 )
 @inject
 async def create_doc(
@@ -52,8 +72,15 @@ async def create_doc(
         cnf_type: DocProcType = Form(...),
         urls: Optional[list[str]] = Form(None),
         files: Optional[list[UploadFile]] = None,
+        upsert: bool = Form(False),
         mediatr: Mediator = Depends(Provide[Container.mediatr])
-) -> None:
+):
+    """
+    Queues the documents for ingestion. Progress is available on /ingestion-job/{id_}.
+
+    With upsert, re-uploaded documents replace their stored versions: only changed chunks are embedded and stored,
+    stale chunks are deleted. The diff is reported in the job's chunks_stored, chunks_deleted and chunks_unchanged.
+    """
     # handle case when urls are provided from interactive docs page
     if urls is not None and len(urls) == 1:
         urls = urls[0].split(',')
@@ -66,7 +93,8 @@ async def create_doc(
         doc_processing_cnf_id=doc_processing_cnf_id,
         files=files,
         urls=urls,
-        cnf_type=cnf_type
+        cnf_type=cnf_type,
+        upsert=upsert
     )
 
     return await mediatr.send_async(command)  # type: ignore
@@ -81,17 +109,52 @@ async def read_all_doc(
         id_: int,
         limit: Optional[int] = None,
         offset: Optional[int] = None,
+        include_embeddings: bool = False,
         mediatr: Mediator = Depends(Provide[Container.mediatr])
 ):
     query = DocReadAllQuery(
         id_=id_,
         limit=limit,
-        offset=offset
+        offset=offset,
+        include_embeddings=include_embeddings
     )
 
     return await mediatr.send_async(query)
 
 
+@router.get(
+    path='/{id_}/export',
+    response_class=StreamingResponse
+)
+@inject
+async def export_doc(
+        id_: int,
+        offset: int = Query(0, ge=0),
+        limit: Optional[int] = Query(None, ge=1),
+        page_size: int = Query(1000, ge=1),
+        include_embeddings: bool = False,
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    """
+    Streams the documents as NDJSON, one {id, document, metadata, embedding} object per line. Embeddings are
+    base64 of little-endian float32, included only on request. An interrupted export is resumed with the offset
+    of the amount of the received lines.
+    """
+    query = DocExportQuery(
+        id_=id_,
+        offset=offset,
+        limit=limit,
+        page_size=page_size,
+        include_embeddings=include_embeddings
+    )
+    async_generator = await mediatr.send_async(query)
+
+    return StreamingResponse(
+        async_generator,  # type: ignore
+        media_type='application/x-ndjson'
+    )
+
+
 @router.get(
     path='/{id_}/count',
     response_model=int
@@ -112,9 +175,10 @@ async def count_doc(
 @inject
 async def peek_doc(
         id_: int,
+        include_embeddings: bool = False,
         mediatr: Mediator = Depends(Provide[Container.mediatr])
 ):
-    query = DocPeekQuery(id_=id_)
+    query = DocPeekQuery(id_=id_, include_embeddings=include_embeddings)
     return await mediatr.send_async(query)
 
 
@@ -150,6 +214,26 @@ async def query_doc(
     return await mediatr.send_async(query)
 
 
+@router.post(
+    path='/{id_}/query/warm',
+    response_model=int
+)
+@inject
+async def warm_query_doc(
+        id_: int,
+        item: VectorQueryWarmPostModel,
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    """
+    Embeds frequent questions ahead of time. Returns the amount of newly embedded questions.
+    """
+    command = DocQueryWarmCommand(
+        id_=id_,
+        **item.model_dump()
+    )
+    return await mediatr.send_async(command)
+
+
 @router.get(
     path='/{id_}/docs',
     response_model=list[str]
@@ -161,3 +245,19 @@ async def list_docs_doc(
 ):
     query = DocListDocsQuery(id_=id_)
     return await mediatr.send_async(query)
+
+
+@router.get(
+    path='/{id_}/manifest',
+    response_model=list[DocumentManifestResponseModel]
+)
+@inject
+async def manifest_doc(
+        id_: int,
+        mediatr: Mediator = Depends(Provide[Container.mediatr])
+):
+    """
+    Lists the documents of the collection with their chunk count, size in bytes, ingest time and embedding model.
+    """
+    query = DocManifestQuery(id_=id_)
+    return await mediatr.send_async(query)
@@ -4,18 +4,23 @@ from subprocess import Popen
 from typing import Optional
 from dotenv import load_dotenv
 
-from src.adapters.orm_models import map_sqlalchemy_models
+from src.adapters.orm_models import map_sqlalchemy_models, upgrade_sqlalchemy_schema
 from src.di_container import Container
 from src.handlers.scribe_dir_setup import ScribeDirSetupQuery
+from src.handlers.ingestion_job import IngestionJobResumeCommand
+from src.handlers.vector_document import DocIngestCommand
 
 CHROMA_PROCESS: Optional[Popen] = None
+CONTAINER: Optional[Container] = None
 
 
 def bootstrap():
     """
-    Sets up scribe directory, logs, key file, maps orm models.
+    Sets up scribe directory, logs, key file, maps orm models, starts ingestion workers.
     """
+    global CONTAINER
     container = Container()
+    CONTAINER = container
     container.mediatr().send(ScribeDirSetupQuery())
 
     # configure logging
@@ -23,10 +28,50 @@ def bootstrap():
     config.dictConfig(log_config)
     logging.info('Scribe bootstrap complete.')
 
-    # setting sqlalchemy mapping and creating tables
+    # ingestion spans are exported only if an exporter is configured
+    container.tracer_provider()
+
+    # setting sqlalchemy mapping, creating tables and adding the new columns to the existing ones
     map_sqlalchemy_models(container.registry())
     container.registry().metadata.create_all(container.engine())
+    upgrade_sqlalchemy_schema(container.engine())
+
+    # readers on the pooled async connections don't wait for the writers
+    with container.engine().connect() as connection:
+        connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+    # starting ingestion workers and resuming jobs left from the previous run,
+    # the workers close the chroma connections of their loops on stop
+    mediatr = container.mediatr()
+    container.ingestion_job_queue().start(
+        execute=lambda job_id: mediatr.send_async(DocIngestCommand(job_id=job_id)),
+        teardown=container.async_vector_db_client().close_pool
+    )
+    mediatr.send(IngestionJobResumeCommand())
+
+
+async def async_bootstrap():
+    """
+    Opens long-lived connections, should be called after the bootstrap. If ChromaDB is not reachable yet,
+    the connection is retried on the first request.
+    """
+    try:
+        await CONTAINER.async_vector_db_client().async_init()
+    except ValueError as e:
+        logging.warning(f'ChromaDB connection is postponed: {e}')
+
 
+async def shutdown():
+    """
+    Stops ingestion and parsing workers, closes long-lived connections.
+    """
+    if CONTAINER is not None:
+        CONTAINER.ingestion_job_queue().stop()
+        CONTAINER.parse_process_pool().shutdown(cancel_futures=True)
+        await CONTAINER.async_vector_db_client().aclose()
+        await CONTAINER.async_engine().dispose()
 
-def shutdown():
-    pass
+        # flushing the buffered spans
+        tracer_provider = CONTAINER.tracer_provider()
+        if tracer_provider is not None:
+            tracer_provider.shutdown()
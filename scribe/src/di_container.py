@@ -1,22 +1,32 @@
 import os
+import multiprocessing
 
-from chromadb import AsyncHttpClient
 from dependency_injector.containers import DeclarativeContainer, WiringConfiguration
 from dependency_injector.providers import Singleton, Callable, Factory, Object
 from langchain_unstructured.document_loaders import UnstructuredLoader
 from mediatr import Mediator
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import registry, Session
 from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
 
-from src.adapters.async_vector_client import ChromaAsyncVectorClient
+from src.adapters.async_vector_client import ChromaPooledAsyncVectorClient
+from src.adapters.answer_cache import SemanticAnswerCache
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
 from src.adapters.codecs import FernetCodec
+from src.adapters.embedding_cache import SqliteEmbeddingCache, QueryEmbeddingCache
+from src.adapters.embedding_model_registry import EmbeddingModelRegistry
+from src.adapters.job_queue import ThreadedAsyncJobQueue
+from src.adapters.lexical_index import SqliteBM25Index
+from src.adapters.reranker import CrossEncoderReranker
 from src.adapters.repository import (
     SqlAlchemyRepository,
-    SqlAlchemyRelationRepository
+    SqlAlchemyRelationRepository,
+    AsyncSqlAlchemyRepository,
+    AsyncSqlAlchemyRelationRepository
 )
-from src.adapters.uow import SqlAlchemyUoW
+from src.adapters.uow import SqlAlchemyUoW, AsyncSqlAlchemyUoW
 from src.adapters.vector_collection_repository import (
     AsyncChromaVectorCollectionRepository,
     AsyncChromaDocumentRepository
@@ -29,7 +39,9 @@ from src.domain.models import (
     ChatModel,
     EmbeddingModel,
     VectorCollection,
-    SemanticDocProcessingConfig
+    SemanticDocProcessingConfig,
+    IngestionJob,
+    DocumentManifest
 )
 from src.domain.services import (
     EncodeApiKeyCredentialService,
@@ -40,8 +52,12 @@ from src.domain.services.chat_model_builder import (
 from src.domain.services.chat_prompt_template_builder import ChatPromptTemplateBuilder
 from src.domain.services.embedding_model_builder import EmbeddingModelBuilder
 from src.domain.services.load_document_service import LoadDocumentService, SemanticLoadDocumentService
+from src.enums import Device, RerankerModelName, TraceExporter
 from src.system.dir import get_scribe_dir_path, read_scribe_key
 from src.system.logging import read_log_config
+from src.system.process_pool import KillableProcessPool
+from src.system.utils import temporary_db_path
+from src.system.tracing import setup_tracing
 
 
 class Container(DeclarativeContainer):
@@ -77,6 +93,13 @@ class Container(DeclarativeContainer):
         config_path='./log_config.yaml',
         log_file_name='scribe.log'
     )
+    # ingestion spans, appended to the logs dir or sent to an OTLP collector
+    tracer_provider = Singleton(
+        setup_tracing,
+        exporter=TraceExporter(os.getenv('SCRIBE_TRACE_EXPORTER', TraceExporter.NONE.value)),
+        file_path=Callable(os.path.join, log_dir, 'traces.jsonl'),
+        endpoint=os.getenv('SCRIBE_OTLP_ENDPOINT', 'http://localhost:4317')
+    )
 
     # scribe key related dependencies
     gen_key = Callable(
@@ -99,21 +122,23 @@ class Container(DeclarativeContainer):
     # determining sqlite db to use based on the environment
     load_dotenv()
     env_scribe_db = os.getenv('SCRIBE_DB')
-    # if the 'dev' type is provided => in-memory is passed
-    # if the 'prod' type is provided => in-file is passed
+    # if the 'dev' type is provided => a temporary in-file db is passed, removed on exit
+    # if the 'prod' type is provided => in-file is passed, SCRIBE_DB_PATH by default scribe.db in the working dir
+    # a shared-cache in-memory db isn't used for dev, its table locks fail right away instead of waiting
+    # for the busy timeout, when the sync and the async engines write concurrently
     match env_scribe_db:
         case 'dev':
-            db_url = 'sqlite:///:memory:'
+            db_name = Singleton(temporary_db_path)
         case 'prod':
-            db_url = 'sqlite:///scribe.db'
+            db_name = Object(os.getenv('SCRIBE_DB_PATH', 'scribe.db'))
         case _:
-            db_url = 'sqlite:///:memory:'
+            db_name = Singleton(temporary_db_path)
 
     # Use StaticPool to share a single connection across threads, enabling multithreaded access
-    # to a :memory: database in SQLAlchemy with check_same_thread=False.
+    # to the database in SQLAlchemy with check_same_thread=False.
     engine = Singleton(
         create_engine,
-        url=db_url,
+        url=Callable('sqlite:///{}'.format, db_name),
         echo=False,
         poolclass=StaticPool,
         connect_args={'check_same_thread': False}
@@ -127,11 +152,31 @@ class Container(DeclarativeContainer):
         expire_on_commit=False
     )
 
+    # async engine of the async handlers, the db is served by a pool of aiosqlite connections
+    async_engine = Singleton(
+        create_async_engine,
+        url=Callable('sqlite+aiosqlite:///{}'.format, db_name),
+        echo=False,
+        pool_size=int(os.getenv('SCRIBE_DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('SCRIBE_DB_MAX_OVERFLOW', 10)),
+        pool_pre_ping=True
+    )
+    async_session = Factory(
+        AsyncSession,
+        bind=async_engine,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
     # chroma vector store
-    async_vector_db_client = Factory(
-        ChromaAsyncVectorClient,
-        AsyncHttpClient,
-        port=8001
+    # a single long-lived client is shared across the requests, it's connected in the app's lifespan
+    async_vector_db_client = Singleton(
+        ChromaPooledAsyncVectorClient,
+        port=8001,
+        max_connections=int(os.getenv('SCRIBE_CHROMA_MAX_CONNECTIONS', 20)),
+        max_keepalive_connections=int(os.getenv('SCRIBE_CHROMA_MAX_KEEPALIVE_CONNECTIONS', 10)),
+        connect_timeout=float(os.getenv('SCRIBE_CHROMA_CONNECT_TIMEOUT', 5.0)),
+        timeout=float(os.getenv('SCRIBE_CHROMA_TIMEOUT', 60.0))
     )
     async_vector_collection_repository = Object(
         AsyncChromaVectorCollectionRepository
@@ -181,27 +226,138 @@ class Container(DeclarativeContainer):
         repository=SqlAlchemyRelationRepository[VectorCollection],
         session=session
     )
+    # files of a job are loaded only by the worker, so no joined loading here
+    ingestion_job_uow = Factory(
+        SqlAlchemyUoW,
+        repository=SqlAlchemyRepository[IngestionJob],
+        session=session
+    )
+    document_manifest_uow = Factory(
+        SqlAlchemyUoW,
+        repository=SqlAlchemyRepository[DocumentManifest],
+        session=session
+    )
+
+    # async uow's of the async handlers
+    async_base_chat_uow = Factory(
+        AsyncSqlAlchemyUoW,
+        repository=AsyncSqlAlchemyRelationRepository[BaseChat],
+        session=async_session
+    )
+    async_domain_vector_collection_uow = Factory(
+        AsyncSqlAlchemyUoW,
+        repository=AsyncSqlAlchemyRelationRepository[VectorCollection],
+        session=async_session
+    )
+    async_ingestion_job_uow = Factory(
+        AsyncSqlAlchemyUoW,
+        repository=AsyncSqlAlchemyRepository[IngestionJob],
+        session=async_session
+    )
+    async_embedding_model_uow = Factory(
+        AsyncSqlAlchemyUoW,
+        repository=AsyncSqlAlchemyRepository[EmbeddingModel],
+        session=async_session
+    )
+    async_document_manifest_uow = Factory(
+        AsyncSqlAlchemyUoW,
+        repository=AsyncSqlAlchemyRepository[DocumentManifest],
+        session=async_session
+    )
+
+    # background document ingestion
+    ingestion_job_queue = Singleton(
+        ThreadedAsyncJobQueue,
+        workers=int(os.getenv('SCRIBE_INGESTION_WORKERS', 2))
+    )
+
+    # documents are parsed in worker processes (spawned, since the app process runs threads),
+    # so the cpu-bound partitioning doesn't starve the event loop, workers hung past the timeout are killed
+    parse_workers = int(os.getenv('SCRIBE_PARSE_WORKERS', 2))
+    parse_process_pool = Singleton(
+        KillableProcessPool,
+        max_workers=parse_workers,
+        mp_context=Callable(multiprocessing.get_context, 'spawn')
+    )
 
     # services
     load_document_service = Singleton(
         LoadDocumentService,
-        doc_loader=UnstructuredLoader
+        doc_loader=UnstructuredLoader,
+        executor=parse_process_pool,
+        timeout=float(os.getenv('SCRIBE_PARSE_TIMEOUT', 300)),
+        prefetch=parse_workers
     )
     sem_load_document_service = Singleton(
-        SemanticLoadDocumentService
+        SemanticLoadDocumentService,
+        executor=parse_process_pool,
+        timeout=float(os.getenv('SCRIBE_PARSE_TIMEOUT', 300)),
+        prefetch=parse_workers,
+        pages_per_task=int(os.getenv('SCRIBE_PDF_PAGES_PER_TASK', 16)),
+        page_prefetch=parse_workers
     )
     encode_api_key_service = Factory(
         EncodeApiKeyCredentialService,
         codec=codec
     )
+    # streamed response chunks arriving within the window are sent as one event
     chat_model_builder_service = Factory(
         ChatModelBuilder,
-        codec
+        codec,
+        coalesce_window=float(os.getenv('SCRIBE_STREAM_COALESCE_MS', 20)) / 1000,
+        coalesce_chars=int(os.getenv('SCRIBE_STREAM_COALESCE_CHARS', 256))
     )
     chat_prompt_template_builder = Factory(
-        ChatPromptTemplateBuilder
+        ChatPromptTemplateBuilder,
+        token_budget=int(os.getenv('SCRIBE_CONTEXT_TOKEN_BUDGET', 4000))
+    )
+    # local embedding models are loaded once per process and evicted by LRU when over the memory budget
+    embedding_model_memory_budget = int(os.getenv('SCRIBE_EMBEDDING_MEMORY_BUDGET_MB', 2048)) * 1024 * 1024
+    embedding_model_registry = Singleton(
+        EmbeddingModelRegistry,
+        memory_budget=embedding_model_memory_budget
+    )
+    # document embeddings are cached by (model, content hash), in-memory for the dev environment
+    embedding_cache = Singleton(
+        SqliteEmbeddingCache,
+        path=Callable(os.path.join, scribe_dir, 'embedding_cache.db') if env_scribe_db == 'prod' else ':memory:',
+        max_bytes=int(os.getenv('SCRIBE_EMBEDDING_CACHE_MB', 512)) * 1024 * 1024
+    )
+    # repeated retrieval questions are embedded once per ttl
+    query_embedding_cache = Singleton(
+        QueryEmbeddingCache,
+        max_entries=int(os.getenv('SCRIBE_QUERY_CACHE_SIZE', 1024)),
+        ttl=float(os.getenv('SCRIBE_QUERY_CACHE_TTL', 3600))
+    )
+    # bm25 index of the collections' documents for lexical and hybrid retrieval, in-memory for the dev environment
+    lexical_index = Singleton(
+        SqliteBM25Index,
+        path=Callable(os.path.join, scribe_dir, 'lexical_index.db') if env_scribe_db == 'prod' else ':memory:'
+    )
+    # cross-encoder is loaded on the first reranked turn and shared by the process
+    reranker = Singleton(
+        CrossEncoderReranker,
+        name=RerankerModelName(os.getenv('SCRIBE_RERANKER_MODEL', RerankerModelName.MS_MARCO_MINILM_L6_V2.value)),
+        device=Device(os.getenv('SCRIBE_RERANKER_DEVICE', Device.CPU.value)),
+        candidates=int(os.getenv('SCRIBE_RERANK_CANDIDATES', 50)),
+        batch_size=int(os.getenv('SCRIBE_RERANKER_BATCH_SIZE', 32))
+    )
+    # resolved base chat pipelines, dropped when any object they are built from changes
+    chat_pipeline_cache = Singleton(
+        ChatPipelineCache,
+        max_entries=int(os.getenv('SCRIBE_CHAT_PIPELINE_CACHE_SIZE', 128))
+    )
+    # answers of the base chats with the answer cache enabled, one cache per resolved pipeline
+    answer_cache = Factory(
+        SemanticAnswerCache,
+        max_entries=int(os.getenv('SCRIBE_ANSWER_CACHE_SIZE', 256)),
+        ttl=float(os.getenv('SCRIBE_ANSWER_CACHE_TTL', 3600)),
+        thresh=float(os.getenv('SCRIBE_ANSWER_CACHE_THRESH', 0.95))
     )
     embedding_model_builder = Factory(
         EmbeddingModelBuilder,
-        codec
+        codec,
+        registry=embedding_model_registry,
+        cache=embedding_cache,
+        query_cache=query_embedding_cache
     )
@@ -1,5 +1,6 @@
 import json
 from hashlib import sha224
+from typing import Sequence
 
 from src.enums import (
     Postprocessor,
@@ -7,7 +8,9 @@ from src.enums import (
     ChatModelName,
     DistanceFunction,
     EmbeddingModelName,
-    Device
+    Device,
+    DocProcType,
+    JobStatus
 )
 
 
@@ -162,11 +165,18 @@ class VectorDocument:
     def __init__(
             self,
             page_content: str,
-            metadata: dict[str, list | str | int | float]
+            metadata: dict[str, list | str | int | float],
+            embedding: Sequence[float] | None = None,
+            id_: str | None = None
     ):
+        """
+        :param embedding: Precomputed embedding, documents with one aren't embedded by the repository.
+        :param id_: Id of a document restored from an archive, by default the id is the content hash.
+        """
         self.page_content = page_content
         self.metadata = self.normalize_metadata(metadata)
-        self.id_ = sha224(self.page_content.encode()).hexdigest()  # 28 byte hash id (sha224)
+        self.id_ = id_ or sha224(self.page_content.encode()).hexdigest()  # 28 byte hash id (sha224)
+        self.embedding = embedding
 
     @staticmethod
     def normalize_metadata(dict_: dict):
@@ -195,10 +205,94 @@ class BaseChat:
             desc: str,
             chat_model_id: int,
             system_prompt_id: int | None,
-            vec_col_id: int | None
+            vec_col_id: int | None,
+            answer_cache: bool = False
     ):
+        """
+        :param answer_cache: Replay the answers to the similar queries over the same retrieved chunks.
+        """
         self.name = name
         self.desc = desc
         self.system_prompt_id = system_prompt_id
         self.chat_model_id = chat_model_id
         self.vec_col_id = vec_col_id
+        self.answer_cache = answer_cache
+
+
+class IngestionJobFile:
+    def __init__(
+            self,
+            filename: str,
+            content: bytes
+    ):
+        self.filename = filename
+        self.content = content
+
+
+class IngestionJob:
+    """
+    Document ingestion (parsing, chunking, embedding, storing) into a vector collection, processed in the background.
+    """
+    files: list[IngestionJobFile]
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^ - populated by db
+
+    def __init__(
+            self,
+            vec_col_id: int,
+            cnf_type: DocProcType,
+            doc_processing_cnf_id: int,
+            urls: list[str] | None,
+            files: list[IngestionJobFile],
+            upsert: bool = False
+    ):
+        """
+        :param upsert: If set, the stored chunks of the documents are diffed with the new ones, instead of
+        being added to.
+        """
+        self.vec_col_id = vec_col_id
+        self.cnf_type = cnf_type
+        self.doc_processing_cnf_id = doc_processing_cnf_id
+        self.urls = json.dumps(urls) if urls is not None else None
+        self.files = files
+        self.upsert = upsert
+        self.status = JobStatus.PENDING
+        self.chunks_parsed = 0
+        self.chunks_embedded = 0
+        self.chunks_stored = 0
+        self.chunks_deleted = 0
+        self.chunks_unchanged = 0
+        self.error = None
+
+    @property
+    def deserialized_urls(self) -> list[str] | None:
+        return json.loads(self.urls) if self.urls is not None else None
+
+    @property
+    def files_dict(self) -> dict[str, bytes] | None:
+        return {file.filename: file.content for file in self.files} if self.files else None
+
+
+class DocumentManifest:
+    """
+    Entry of a vector collection's document manifest, so documents are listed without scanning the collection.
+    """
+
+    def __init__(
+            self,
+            vec_col_id: int,
+            name: str,
+            chunks: int,
+            size: int,
+            embedding_model: str
+    ):
+        """
+        :param name: Filename or url of the document.
+        :param chunks: Amount of the stored chunks.
+        :param size: Size of the stored chunks in bytes.
+        :param embedding_model: Name of the embedding model the chunks were embedded with.
+        """
+        self.vec_col_id = vec_col_id
+        self.name = name
+        self.chunks = chunks
+        self.size = size
+        self.embedding_model = embedding_model
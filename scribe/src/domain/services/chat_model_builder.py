@@ -1,3 +1,8 @@
+import logging
+import math
+from functools import lru_cache
+from typing import Callable
+
 from langchain_anthropic.chat_models import ChatAnthropic
 from langchain_cohere import ChatCohere
 from langchain_openai.chat_models.base import ChatOpenAI
@@ -8,9 +13,45 @@ from src.enums import ChatModelName, ModelProvider
 from src.adapters.codecs import AbstractCodec
 
 
+TokenCounter = Callable[[str], int]
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    :returns: int - Token count estimated as a token per 4 characters.
+    """
+    return math.ceil(len(text) / 4)
+
+
+@lru_cache
+def build_token_counter(name: ChatModelName) -> TokenCounter:
+    """
+    OpenAI models are counted with their tiktoken encoding, other providers don't ship a local tokenizer,
+    so their tokens are approximated.
+    """
+    if ChatModelBuilder.determine_model_provider(name) != ModelProvider.OPENAI:
+        return approximate_token_count
+
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(name.value)
+    except Exception as e:
+        # tiktoken downloads the encodings on the first use
+        logging.warning(f'Tokenizer of {name.value} is not available, tokens are approximated: {e}')
+        return approximate_token_count
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
 class ChatModelBuilder:
-    def __init__(self, codec: AbstractCodec):
+    def __init__(self, codec: AbstractCodec, coalesce_window: float = 0.0, coalesce_chars: int = 256):
+        """
+        :param coalesce_window: Seconds the streamed response chunks are joined for, see LangchainChatModel.
+        """
         self.codec = codec
+        self.coalesce_window = coalesce_window
+        self.coalesce_chars = coalesce_chars
 
     def build(
             self,
@@ -35,7 +76,11 @@ class ChatModelBuilder:
                     stop=chat_model.deserialized_stop_sequence,
                     api_key=api_key
                 )
-                return LangchainChatModel(model)
+                return LangchainChatModel(
+                    model,
+                    coalesce_window=self.coalesce_window,
+                    coalesce_chars=self.coalesce_chars
+                )
             case ModelProvider.COHERE:
                 model = ChatCohere(
                     model=chat_model.name.value,
@@ -47,7 +92,11 @@ class ChatModelBuilder:
                     stop=chat_model.deserialized_stop_sequence,
                     cohere_api_key=api_key
                 )
-                return LangchainChatModel(model)
+                return LangchainChatModel(
+                    model,
+                    coalesce_window=self.coalesce_window,
+                    coalesce_chars=self.coalesce_chars
+                )
             case ModelProvider.ANTHROPIC:
                 model = ChatAnthropic(
                     model=chat_model.name.value,
@@ -59,7 +108,11 @@ class ChatModelBuilder:
                     stop=chat_model.deserialized_stop_sequence,
                     api_key=api_key
                 )
-                return LangchainChatModel(model)
+                return LangchainChatModel(
+                    model,
+                    coalesce_window=self.coalesce_window,
+                    coalesce_chars=self.coalesce_chars
+                )
 
     @staticmethod
     def determine_model_provider(name: ChatModelName) -> ModelProvider:
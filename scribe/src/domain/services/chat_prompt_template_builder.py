@@ -1,9 +1,21 @@
+import copy
+import re
+from typing import Callable
+
 from langchain_core.prompts import ChatPromptTemplate
 
 from src.adapters.chroma_models import VectorChromaDocument
 
 
 class ChatPromptTemplateBuilder:
+    # chunks sharing this part of their words with a better ranked chunk are dropped
+    near_duplicate_thresh = 0.9
+
+    def __init__(self, token_budget: int | None = None):
+        """
+        :param token_budget: Maximum amount of context tokens, if not provided, the context is not limited.
+        """
+        self.token_budget = token_budget
 
     @staticmethod
     def build(
@@ -18,7 +30,7 @@ class ChatPromptTemplateBuilder:
             messages=[
                 ('system', 'You are a helpful AI-assistant.'),
                 ('system', f'Context: {context}'),
-                ('human', f'Preferences: {system_prompt}'),
+                ('human', f'Preferences: {ChatPromptTemplateBuilder.escape(str(system_prompt))}'),
                 ('human', '{input}')
             ]
         )
@@ -26,10 +38,92 @@ class ChatPromptTemplateBuilder:
     @staticmethod
     def format_context(docs: list[VectorChromaDocument]) -> str:
         """
-        Removes '{', '}' in documents, to not ruin LangChain prompt template formatting.
-        After that concatenates documents into one string separated with '\n'.
+        Concatenates documents into one string separated with '\n'. Braces are escaped, to not ruin LangChain
+        prompt template formatting, the documents are left intact.
         """
+        return ChatPromptTemplateBuilder.escape(ChatPromptTemplateBuilder.join(docs))
+
+    @staticmethod
+    def escape(text: str) -> str:
+        return text.replace('{', '{{').replace('}', '}}')
+
+    @staticmethod
+    def join(docs: list[VectorChromaDocument]) -> str:
+        return '\n'.join(doc.document for doc in docs)
+
+    def assemble_context(
+            self,
+            docs: list[VectorChromaDocument],
+            count_tokens: Callable[[str], int]
+    ) -> tuple[list[VectorChromaDocument], int]:
+        """
+        Selects the documents of the context by their rank: near-duplicates are dropped, documents are taken while
+        they fit into the token budget, and adjacent chunks of the same file are merged into one document.
+
+        :param docs: Retrieved documents, best first.
+        :param count_tokens: Token counter of the chat model.
+        :returns: tuple - Documents of the context and its token count.
+        """
+        selected: list[VectorChromaDocument] = []
+        selected_words: list[set[str]] = []
+        tokens = 0
+
         for doc in docs:
-            doc.document = doc.document.replace('{', '').replace('}', '')
+            words = set(re.findall(r'\w+', doc.document.lower()))
+            if any(self.similarity(words, other) >= self.near_duplicate_thresh for other in selected_words):
+                continue
+
+            # separator tokens are negligible next to the chunks
+            doc_tokens = count_tokens(doc.document)
+            if self.token_budget is not None and tokens + doc_tokens > self.token_budget:
+                continue
+
+            selected.append(doc)
+            selected_words.append(words)
+            tokens += doc_tokens
+
+        context_docs = self.merge_adjacent(selected)
+
+        return context_docs, count_tokens(self.join(context_docs)) if context_docs else 0
+
+    @staticmethod
+    def similarity(a: set[str], b: set[str]) -> float:
+        """
+        :returns: float - Jaccard similarity of the word sets.
+        """
+        if not a or not b:
+            return float(a == b)
+
+        return len(a & b) / len(a | b)
+
+    @staticmethod
+    def merge_adjacent(docs: list[VectorChromaDocument]) -> list[VectorChromaDocument]:
+        """
+        Merges chunks of the same file with consecutive chunk indexes into one document, in the reading order.
+        A merged document takes the place of its best ranked chunk. The documents are copied, not mutated.
+        """
+        def position(doc: VectorChromaDocument) -> tuple[str, int] | None:
+            name = doc.metadata.get('filename') or doc.metadata.get('url')
+            chunk_index = doc.metadata.get('chunk_index')
+            return (name, chunk_index) if name is not None and chunk_index is not None else None
+
+        runs: list[list[VectorChromaDocument]] = [[doc] for doc in docs if position(doc) is None]
+        for doc in sorted((doc for doc in docs if position(doc) is not None), key=position):
+            name, chunk_index = position(doc)
+            if runs and position(runs[-1][-1]) == (name, chunk_index - 1):
+                runs[-1].append(doc)
+            else:
+                runs.append([doc])
+
+        rank = {id(doc): i for i, doc in enumerate(docs)}
+        merged_docs = []
+        for run in runs:
+            merged = run[0]
+            if len(run) > 1:
+                merged = copy.copy(run[0])
+                merged.metadata = dict(run[0].metadata)
+                merged.document = ChatPromptTemplateBuilder.join(run)
+
+            merged_docs.append((min(rank[id(doc)] for doc in run), merged))
 
-        return '\n'.join(list(map(lambda d: d.document, docs)))
+        return [merged for _, merged in sorted(merged_docs, key=lambda item: item[0])]
@@ -1,9 +1,13 @@
-from typing import Literal
-
-import torch
 from chromadb.utils import embedding_functions
 
 from src.adapters.codecs import AbstractCodec
+from src.adapters.embedding_cache import (
+    AbstractEmbeddingCache,
+    CachedEmbeddingFunction,
+    QueryEmbeddingCache,
+    CachedQueryEmbeddingFunction
+)
+from src.adapters.embedding_model_registry import EmbeddingModelRegistry
 from src.domain.models import EmbeddingModel
 from src.enums import (
     EmbeddingModelName,
@@ -12,16 +16,35 @@ from src.enums import (
 
 
 class EmbeddingModelBuilder:
+    # maximum amount of inputs embedded with one call
+    batch_sizes = {
+        ModelProvider.OPENAI: 2048,
+        ModelProvider.COHERE: 96,
+        ModelProvider.LOCAL: 256
+    }
 
-    def __init__(self, codec: AbstractCodec):
+    def __init__(
+            self,
+            codec: AbstractCodec,
+            registry: EmbeddingModelRegistry,
+            cache: AbstractEmbeddingCache | None = None,
+            query_cache: QueryEmbeddingCache | None = None
+    ):
+        """
+        :param cache: Embedding cache of the functions formed by build_cached.
+        :param query_cache: Query embedding cache of the functions formed by build_query_cached.
+        """
         self.codec = codec
+        self.registry = registry
+        self.cache = cache
+        self.query_cache = query_cache
 
     def build(
             self,
             embedding_model: EmbeddingModel,
     ) -> embedding_functions.EmbeddingFunction:
         """
-        Decodes API-key and forms embedding function.
+        Decodes API-key and forms embedding function. Local models are shared through the registry.
         """
         provider = EmbeddingModelBuilder.determine_model_provider(embedding_model.name)
         if provider != ModelProvider.LOCAL:
@@ -40,11 +63,46 @@ class EmbeddingModelBuilder:
                     )
 
         else:
-            return embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name=embedding_model.name.value,
-                device=embedding_model.device.value
+            return self.registry.get(
+                name=embedding_model.name,
+                device=embedding_model.device
             )
 
+    def build_cached(
+            self,
+            embedding_model: EmbeddingModel,
+    ) -> embedding_functions.EmbeddingFunction:
+        """
+        Forms embedding function, that embeds only the documents missing from the embedding cache.
+        Meant for documents, since their embeddings are reused on re-ingestion.
+        """
+        embedding_function = self.build(embedding_model)
+        if self.cache is None:
+            return embedding_function
+
+        return CachedEmbeddingFunction(
+            embedding_function,
+            cache=self.cache,
+            model=embedding_model.name.value
+        )
+
+    def build_query_cached(
+            self,
+            embedding_model: EmbeddingModel,
+    ) -> embedding_functions.EmbeddingFunction:
+        """
+        Forms embedding function, that embeds only the queries missing from the query embedding cache.
+        """
+        embedding_function = self.build(embedding_model)
+        if self.query_cache is None:
+            return embedding_function
+
+        return CachedQueryEmbeddingFunction(
+            embedding_function,
+            cache=self.query_cache,
+            model=embedding_model.name.value
+        )
+
     @staticmethod
     def determine_model_provider(name: EmbeddingModelName) -> ModelProvider:
         if name in [
@@ -61,3 +119,8 @@ class EmbeddingModelBuilder:
             EmbeddingModelName.XLM_ROBERTA_UA_DISTILLED
         ]:
             return ModelProvider.LOCAL
+
+    @staticmethod
+    def determine_batch_size(name: EmbeddingModelName) -> int:
+        provider = EmbeddingModelBuilder.determine_model_provider(name)
+        return EmbeddingModelBuilder.batch_sizes[provider]
@@ -1,9 +1,17 @@
 import io
 import re
+import asyncio
+import atexit
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Type
+from collections import OrderedDict, deque
+from contextlib import aclosing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Type, NamedTuple, Optional, AsyncIterator, Awaitable, Iterator
 
+import numpy as np
 import pymupdf
 from langchain_unstructured.document_loaders import UnstructuredLoader
 from unstructured.cleaners.core import (
@@ -18,13 +26,16 @@ from unstructured.cleaners.core import (
     remove_punctuation,
     replace_unicode_quotes
 )
-from horchunk.chunkers import WindowChunker, Chunk
 from horchunk.splitters import SentenceSplitter
 from chromadb.utils import embedding_functions
 from langchain_core.documents.base import Document
 from unstructured.partition.common import UnsupportedFileFormatError as UnstructuredUnsupportedFileFormatError
 
+from src.domain.services.semantic_chunker import VectorizedSemanticChunker, SemanticChunk
 from src.enums import Postprocessor
+from src.system.metrics import INGESTION_BYTES_PARSED, INGESTION_CHUNKS, INGESTION_ELEMENTS
+from src.system.process_pool import KillableProcessPool
+from src.system.tracing import ingestion_stage, observe_embedding_batch
 from src.domain.models import (
     DocProcessingConfig,
     SemanticDocProcessingConfig,
@@ -41,6 +52,136 @@ class UnsupportedFileFormatError(RuntimeError):
         )
 
 
+class DocumentLoadTimeoutError(TimeoutError):
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"Document '{name}' was not parsed in {timeout} seconds.")
+
+
+# executors running the tasks in other processes, the files are passed to them in the shared memory
+PROCESS_EXECUTORS = (ProcessPoolExecutor, KillableProcessPool)
+
+
+class SharedFile(NamedTuple):
+    """Reference to file bytes placed in shared memory for a worker process."""
+    name: str
+    size: int
+
+
+def partition_document(
+        doc_loader: Type[UnstructuredLoader],
+        source: dict,
+        config: dict,
+        shared_file: SharedFile | None = None
+) -> list[Document]:
+    """
+    Partitions one document with the loader. Runs in a worker process, so the arguments should be picklable.
+
+    :param source: Loader arguments identifying the document (web_url or file and metadata_filename).
+    :param shared_file: If provided, the file is read from the shared memory instead of the source.
+    """
+    if shared_file is None:
+        return doc_loader(**source, **config).load()
+
+    shm = SharedMemory(name=shared_file.name)
+    try:
+        # the loaders need a file object, so the worker copies the file once into its own buffer
+        with shm.buf[:shared_file.size] as view:
+            file = io.BytesIO(view)
+
+        return doc_loader(file=file, **source, **config).load()
+    finally:
+        shm.close()
+
+
+def count_pdf_pages(ext: str, bytes_: bytes) -> int:
+    return pymupdf.open(filetype=ext, stream=bytes_).page_count
+
+
+# pdfs opened by the worker process by their shared memory names, so the page ranges of a file don't open it again
+_shared_pdfs: OrderedDict[str, tuple[SharedMemory, memoryview, pymupdf.Document]] = OrderedDict()
+max_shared_pdfs = 4
+
+
+def open_shared_pdf(source: SharedFile, ext: str) -> pymupdf.Document:
+    """
+    :returns: pymupdf.Document - The pdf read right from the shared memory, opened once per worker process.
+    The least recently used pdfs are closed, their memory is released once the parent unlinks it.
+    """
+    if source.name in _shared_pdfs:
+        _shared_pdfs.move_to_end(source.name)
+        return _shared_pdfs[source.name][2]
+
+    shm = SharedMemory(name=source.name)
+    view = shm.buf[:source.size]
+    doc = pymupdf.open(filetype=ext, stream=view)
+    _shared_pdfs[source.name] = (shm, view, doc)
+
+    while len(_shared_pdfs) > max_shared_pdfs:
+        close_shared_pdf(_shared_pdfs.popitem(last=False)[1])
+
+    return doc
+
+
+def close_shared_pdf(entry: tuple[SharedMemory, memoryview, pymupdf.Document]) -> None:
+    # the shared memory can't be closed while the document reads from its buffer
+    shm, view, doc = entry
+    doc.close()
+    view.release()
+    shm.close()
+
+
+@atexit.register
+def close_shared_pdfs() -> None:
+    while _shared_pdfs:
+        close_shared_pdf(_shared_pdfs.popitem()[1])
+
+
+def extract_pdf_pages(source: bytes | SharedFile, ext: str, start: int, stop: int) -> list[str]:
+    """
+    Extracts the text of the pages in [start, stop). Runs in a worker process, so the arguments should be picklable.
+
+    :param source: File bytes, or a reference to them in the shared memory.
+    """
+    if not isinstance(source, SharedFile):
+        doc = pymupdf.open(filetype=ext, stream=source)
+        return [doc.load_page(i).get_text() for i in range(start, stop)]
+
+    doc = open_shared_pdf(source, ext)
+    return [doc.load_page(i).get_text() for i in range(start, stop)]
+
+
+async def run_in_executor(executor: Optional[Executor], timeout: Optional[float], fn: Callable, *args) -> Any:
+    """
+    Runs the function in the executor. Tasks of a KillableProcessPool are killed on the timeout, with the other
+    executors only the waiting is stopped.
+
+    :raises asyncio.TimeoutError:
+    """
+    if isinstance(executor, KillableProcessPool):
+        return await executor.run(timeout, fn, *args)
+
+    future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    return await asyncio.wait_for(future, timeout=timeout)
+
+
+async def prefetched[T](tasks: Iterator[Awaitable[T]], prefetch: int) -> AsyncIterator[T]:
+    """
+    Runs up to prefetch awaitables ahead of the consumer, results are yielded in the order of the awaitables.
+    """
+    pending: deque[asyncio.Future] = deque()
+    try:
+        for task in tasks:
+            pending.append(asyncio.ensure_future(task))
+            if len(pending) >= prefetch:
+                yield await pending.popleft()
+
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
 class BaseLoadDocumentService(ABC):
 
     @abstractmethod
@@ -51,6 +192,14 @@ class BaseLoadDocumentService(ABC):
     ) -> list[VectorDocument]:
         pass
 
+    @abstractmethod
+    def stream_async(
+            self,
+            *args,
+            **kwargs
+    ) -> AsyncIterator[list[VectorDocument]]:
+        pass
+
 
 class LoadDocumentService(BaseLoadDocumentService):
     """
@@ -60,10 +209,25 @@ class LoadDocumentService(BaseLoadDocumentService):
         - langchain_unstructured.document_loaders.UnstructuredLoader;
     """
 
-    def __init__(self, doc_loader: Type[UnstructuredLoader]):
+    def __init__(
+            self,
+            doc_loader: Type[UnstructuredLoader],
+            executor: Optional[Executor] = None,
+            timeout: Optional[float] = None,
+            prefetch: int = 2
+    ):
+        """
+        :param executor: Executor to parse documents in, preferably a KillableProcessPool, since partitioning
+        is CPU-bound and hung parses are killed on the timeout. If not provided, the event loop's default executor
+        is used.
+        :param timeout: Per document parsing timeout in seconds.
+        :param prefetch: Amount of documents parsed ahead of the consumer of stream_async.
+        """
         self.doc_loader = doc_loader
+        self.executor = executor
+        self.timeout = timeout
+        self.prefetch = prefetch
 
-    # TODO make the loop truly documents
     async def load_async(
             self,
             files: dict[str, bytes] | None,
@@ -72,47 +236,92 @@ class LoadDocumentService(BaseLoadDocumentService):
     ) -> list[VectorDocument]:
         """
         Loads provided documents to list[VectorDocument] based on the provided DocProcessingConfig.
+        Results keep the order of urls, then files.
 
         :raises UnsupportedFileFormatError:
+        :raises DocumentLoadTimeoutError:
+        """
+        return [
+            doc
+            async for docs in self.stream_async(files=files, urls=urls, doc_proc_cnf=doc_proc_cnf)
+            for doc in docs
+        ]
+
+    async def stream_async(
+            self,
+            files: dict[str, bytes] | None,
+            urls: list[str] | None,
+            doc_proc_cnf: DocProcessingConfig
+    ) -> AsyncIterator[list[VectorDocument]]:
+        """
+        Yields the chunks of every document, as soon as it's parsed, in the order of urls, then files.
+        Documents are parsed in parallel in the executor, but no more than prefetch documents ahead of the consumer,
+        so only a few parsed documents are held in memory at once.
+
+        :raises UnsupportedFileFormatError:
+        :raises DocumentLoadTimeoutError:
         """
         config = self.build_config(doc_proc_cnf)
-        all_docs: list[VectorDocument] = []
-
-        # handling url
-        if urls is not None:
-            for url in urls:
-                document_loader = self.doc_loader(
-                    web_url=url,
-                    **config
-                )
 
-                docs = await document_loader.aload()
+        def tasks() -> Iterator[Awaitable[list[Document]]]:
+            for url in urls or []:
+                yield self.partition_url(url, config)
+            for filename, bytes_ in (files or {}).items():
+                yield self.partition_file(filename, bytes_, config)
 
-                all_docs.extend(
-                    list(map(lambda d: self.map_doc(d), docs))
-                )
+        async for docs in prefetched(tasks(), self.prefetch):
+            INGESTION_CHUNKS.labels('unstructured').inc(len(docs))
+            yield [self.map_doc(doc, chunk_index=i) for i, doc in enumerate(docs)]
 
-        # handling files
-        if files is not None:
-            for filename, bytes_ in files.items():
-                wrapped_bytes = io.BytesIO(bytes_)  # <-- BytesIO wrapping around bytes
-                document_loader = self.doc_loader(
-                    file=wrapped_bytes,
-                    metadata_filename=filename,
-                    **config
-                )
+    async def partition_url(self, url: str, config: dict) -> list[Document]:
+        return await self.run_partition(url, dict(web_url=url), config)
 
-                try:
-                    docs = await document_loader.aload()
-                except (ImportError, UnstructuredUnsupportedFileFormatError) as e:
-                    logging.log(logging.ERROR, str(e))
-                    raise UnsupportedFileFormatError
+    async def partition_file(self, filename: str, bytes_: bytes, config: dict) -> list[Document]:
+        source = dict(metadata_filename=filename)
+        INGESTION_BYTES_PARSED.labels('unstructured').inc(len(bytes_))
 
-                all_docs.extend(
-                    list(map(lambda d: self.map_doc(d), docs))
+        try:
+            # worker processes read the file from the shared memory, instead of receiving it pickled through the pool
+            if isinstance(self.executor, PROCESS_EXECUTORS):
+                shm = SharedMemory(create=True, size=max(len(bytes_), 1))
+                try:
+                    shm.buf[:len(bytes_)] = bytes_
+                    return await self.run_partition(filename, source, config, SharedFile(shm.name, len(bytes_)))
+                finally:
+                    shm.close()
+                    shm.unlink()
+
+            source['file'] = io.BytesIO(bytes_)  # <-- BytesIO wrapping around bytes
+            return await self.run_partition(filename, source, config)
+        except (ImportError, UnstructuredUnsupportedFileFormatError) as e:
+            logging.log(logging.ERROR, str(e))
+            raise UnsupportedFileFormatError
+
+    async def run_partition(
+            self,
+            name: str,
+            source: dict,
+            config: dict,
+            shared_file: SharedFile | None = None
+    ) -> list[Document]:
+        with ingestion_stage('unstructured', 'parse', document=name) as span:
+            try:
+                docs = await run_in_executor(
+                    self.executor,
+                    self.timeout,
+                    partition_document,
+                    self.doc_loader,
+                    source,
+                    config,
+                    shared_file
                 )
+            except asyncio.TimeoutError:
+                raise DocumentLoadTimeoutError(name, self.timeout)
+            span.set_attribute('elements', len(docs))
 
-        return all_docs
+        INGESTION_ELEMENTS.labels('unstructured').inc(len(docs))
+
+        return docs
 
     @staticmethod
     def build_config(doc_proc_cnf: DocProcessingConfig) -> dict:
@@ -155,10 +364,15 @@ class LoadDocumentService(BaseLoadDocumentService):
         return config
 
     @staticmethod
-    def map_doc(doc: Document) -> VectorDocument:
+    def map_doc(doc: Document, chunk_index: int | None = None) -> VectorDocument:
+        """
+        :param chunk_index: Position of the chunk in its document, lets adjacent chunks be merged in the context.
+        """
+        metadata = doc.metadata if chunk_index is None else {**doc.metadata, 'chunk_index': chunk_index}
+
         return VectorDocument(
             page_content=doc.page_content,
-            metadata=doc.metadata
+            metadata=metadata
         )
 
 
@@ -172,6 +386,34 @@ class UnsupportedSemanticFileFormatError(RuntimeError):
 
 
 class SemanticLoadDocumentService(BaseLoadDocumentService):
+    """
+    Extracts the text of pdf files in the executor, page ranges of a file and several files in parallel.
+    Pages are split into sentences and embedded as they arrive, the embedded sentences are chunked once
+    the whole file is extracted.
+    """
+
+    def __init__(
+            self,
+            executor: Optional[Executor] = None,
+            timeout: Optional[float] = None,
+            prefetch: int = 2,
+            pages_per_task: int = 16,
+            page_prefetch: int = 2
+    ):
+        """
+        :param executor: Executor to extract text in, preferably a ProcessPoolExecutor. If not provided,
+        the event loop's default executor is used.
+        :param timeout: Per page range extraction timeout in seconds, the extraction is killed on the timeout
+        if the executor is a KillableProcessPool.
+        :param prefetch: Amount of files processed concurrently ahead of the consumer of stream_async.
+        :param pages_per_task: Amount of pages extracted by one executor task.
+        :param page_prefetch: Amount of page ranges of a file extracted concurrently.
+        """
+        self.executor = executor
+        self.timeout = timeout
+        self.prefetch = prefetch
+        self.pages_per_task = pages_per_task
+        self.page_prefetch = page_prefetch
 
     async def load_async(
             self,
@@ -179,33 +421,145 @@ class SemanticLoadDocumentService(BaseLoadDocumentService):
             doc_proc_cnf: SemanticDocProcessingConfig,
             embedding_function: embedding_functions.EmbeddingFunction
     ) -> list[VectorDocument]:
+        return [
+            doc
+            async for docs in self.stream_async(
+                files=files,
+                doc_proc_cnf=doc_proc_cnf,
+                embedding_function=embedding_function
+            )
+            for doc in docs
+        ]
+
+    async def stream_async(
+            self,
+            files: dict[str, bytes],
+            doc_proc_cnf: SemanticDocProcessingConfig,
+            embedding_function: embedding_functions.EmbeddingFunction
+    ) -> AsyncIterator[list[VectorDocument]]:
+        """
+        Yields the chunks of every file in the order of files. Up to prefetch files are processed concurrently.
+        Chunks carry their embeddings, computed from the sentence embeddings.
 
-        chunker = WindowChunker(
+        :raises UnsupportedSemanticFileFormatError:
+        :raises DocumentLoadTimeoutError:
+        """
+        chunker = VectorizedSemanticChunker(
             embedding_function,
             thresh=doc_proc_cnf.thresh,
             max_chunk_size=doc_proc_cnf.max_chunk_size
         )
 
-        all_docs = []
-        for filename, bytes_ in files.items():
-            # checking extension
-            ext = filename.split('.')[-1]
-            self.check_file_ext(ext)
+        # unsupported files fail the ingestion before any file is processed
+        for filename in files:
+            self.check_file_ext(filename.split('.')[-1])
 
-            # extracting content
-            doc = pymupdf.open(filetype=ext, stream=bytes_)
-            full_text = " ".join(doc.load_page(i).get_text() for i in range(doc.page_count))
-            full_text = self.normalize_pdf(full_text)
+        tasks = (self.load_file_async(filename, bytes_, chunker) for filename, bytes_ in files.items())
+        async for docs in prefetched(tasks, self.prefetch):
+            yield docs
 
-            # chunking
-            splits = SentenceSplitter(full_text).__call__()
-            chunks = chunker(splits)
+    async def load_file_async(
+            self,
+            filename: str,
+            bytes_: bytes,
+            chunker: VectorizedSemanticChunker
+    ) -> list[VectorDocument]:
+        ext = filename.split('.')[-1]
+        self.check_file_ext(ext)
+        INGESTION_BYTES_PARSED.labels('semantic').inc(len(bytes_))
+
+        sentences: list[str] = []
+        embedded: list[asyncio.Future] = []
+        pending: list[str] = []
+        tail = ''
+
+        async def embed(batch: list[str]) -> np.ndarray:
+            start = time.perf_counter()
+            with ingestion_stage('semantic', 'embed', document=filename, sentences=len(batch)):
+                embeddings = await asyncio.to_thread(chunker.embed, batch)
+            observe_embedding_batch('semantic', len(batch), time.perf_counter() - start)
+
+            return embeddings
+
+        def flush(force: bool = False) -> None:
+            # sentences are embedded in a worker thread, while the next pages are extracted
+            nonlocal pending
+            while len(pending) >= chunker.batch_size or (force and pending):
+                batch, pending = pending[:chunker.batch_size], pending[chunker.batch_size:]
+                embedded.append(asyncio.ensure_future(embed(batch)))
+
+        try:
+            async with aclosing(self.extract_pages(filename, ext, bytes_)) as pages:
+                async for page in pages:
+                    # the last sentence of a page may continue on the next one
+                    page_sentences = SentenceSplitter(self.normalize_pdf(f'{tail} {page}')).__call__()
+                    tail = page_sentences.pop() if page_sentences else ''
+                    sentences.extend(page_sentences)
+                    pending.extend(page_sentences)
+                    flush()
+
+            if tail:
+                sentences.append(tail)
+                pending.append(tail)
+            flush(force=True)
+
+            embeddings = await asyncio.gather(*embedded)
+        finally:
+            for future in embedded:
+                future.cancel()
+
+        if not sentences:
+            return []
+
+        with ingestion_stage('semantic', 'chunk', document=filename, sentences=len(sentences)):
+            chunks = await asyncio.to_thread(chunker.chunk, sentences, np.concatenate(embeddings))
+        INGESTION_CHUNKS.labels('semantic').inc(len(chunks))
+
+        return self.map_chunks(chunks, filename)
+
+    async def extract_pages(self, filename: str, ext: str, bytes_: bytes) -> AsyncIterator[str]:
+        """
+        Yields the text of every page in order. Page ranges are extracted in the executor, up to page_prefetch
+        ranges ahead of the consumer.
 
-            # mapping chunks to VectorDocument
-            vector_docs = self.map_chunks(chunks, filename)
-            all_docs.extend(vector_docs)
+        :raises DocumentLoadTimeoutError:
+        """
+        page_count = await asyncio.to_thread(count_pdf_pages, ext, bytes_)
+
+        shm = None
+        source: bytes | SharedFile = bytes_
+        # worker processes read the file from the shared memory, instead of receiving a pickled copy per range,
+        # and open it once for all of its ranges
+        if isinstance(self.executor, PROCESS_EXECUTORS):
+            shm = SharedMemory(create=True, size=max(len(bytes_), 1))
+            shm.buf[:len(bytes_)] = bytes_
+            source = SharedFile(shm.name, len(bytes_))
+
+        async def extract(start: int, stop: int) -> list[str]:
+            with ingestion_stage('semantic', 'extract', document=filename, pages=stop - start):
+                try:
+                    pages = await run_in_executor(
+                        self.executor, self.timeout, extract_pdf_pages, source, ext, start, stop
+                    )
+                except asyncio.TimeoutError:
+                    raise DocumentLoadTimeoutError(f'{filename} pages {start + 1}-{stop}', self.timeout)
+            INGESTION_ELEMENTS.labels('semantic').inc(len(pages))
+
+            return pages
+
+        tasks = (
+            extract(start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        )
 
-        return all_docs
+        try:
+            async for pages in prefetched(tasks, self.page_prefetch):
+                for page in pages:
+                    yield page
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
 
     @staticmethod
     def check_file_ext(ext: str) -> None:
@@ -218,9 +572,9 @@ class SemanticLoadDocumentService(BaseLoadDocumentService):
 
 
     @staticmethod
-    def map_chunks(chunks: list[Chunk], filename: str) -> list[VectorDocument]:
+    def map_chunks(chunks: list[SemanticChunk], filename: str) -> list[VectorDocument]:
         documents = []
-        for chunk in chunks:
+        for i, chunk in enumerate(chunks):
             documents.append(VectorDocument(
                 page_content=chunk.join(),
                 metadata={
@@ -228,7 +582,9 @@ class SemanticLoadDocumentService(BaseLoadDocumentService):
                     'chars': chunk.chars,
                     'tokens': chunk.tokens,
                     'filename': filename,
-                }
+                    'chunk_index': i
+                },
+                embedding=chunk.embedding
             ))
 
         return documents
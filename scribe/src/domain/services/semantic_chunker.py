@@ -0,0 +1,133 @@
+"""
+Semantic chunking of sentences by the similarity of their embeddings, computed in batches with NumPy.
+"""
+from typing import Callable
+
+import numpy as np
+from chromadb.api.types import Documents, Embeddings
+
+
+class SemanticChunk:
+    def __init__(self, sentences: list[str], embedding: np.ndarray):
+        """
+        :param embedding: Mean of the sentence embeddings.
+        """
+        self.sentences = sentences
+        self.embedding = embedding
+
+    @property
+    def size(self) -> int:
+        return len(self.sentences)
+
+    @property
+    def chars(self) -> int:
+        return sum(len(sentence) for sentence in self.sentences)
+
+    @property
+    def tokens(self) -> int:
+        return sum(len(sentence.split()) for sentence in self.sentences)
+
+    def join(self) -> str:
+        return ' '.join(self.sentences)
+
+
+class VectorizedSemanticChunker:
+    """
+    Embeds all the sentences once, in batches. A chunk ends where the similarity of the windows of sentences before
+    and after a sentence boundary falls below thresh, or where the chunk reaches max_chunk_size sentences.
+    Chunk embeddings are the means of their sentence embeddings, so the model isn't called for the chunks.
+    """
+
+    def __init__(
+            self,
+            embedding_function: Callable[[Documents], Embeddings],
+            thresh: float,
+            max_chunk_size: int,
+            window_size: int = 1,
+            batch_size: int = 256
+    ):
+        """
+        :param thresh: Cosine similarity of the adjacent windows, below which a chunk ends.
+        :param max_chunk_size: Maximum amount of sentences per chunk.
+        :param window_size: Amount of sentences compared on every side of a boundary.
+        :param batch_size: Amount of sentences embedded with one call.
+        """
+        self.embedding_function = embedding_function
+        self.thresh = thresh
+        self.max_chunk_size = max(max_chunk_size, 1)
+        self.window_size = max(window_size, 1)
+        self.batch_size = batch_size
+
+    def __call__(self, sentences: list[str]) -> list[SemanticChunk]:
+        if not sentences:
+            return []
+
+        return self.chunk(sentences, self.embed(sentences))
+
+    def chunk(self, sentences: list[str], embeddings: np.ndarray) -> list[SemanticChunk]:
+        """
+        Chunks the sentences by their already computed embeddings.
+
+        :param embeddings: (sentences, dimensions) matrix of the sentence embeddings, in the order of sentences.
+        """
+        if not sentences:
+            return []
+
+        starts = self.breakpoints(self.window_similarities(embeddings))
+        ends = np.append(starts[1:], len(sentences))
+
+        # sums of the sentence embeddings of every chunk in one pass
+        chunk_embeddings = np.add.reduceat(embeddings, starts, axis=0) / (ends - starts)[:, None]
+
+        return [
+            SemanticChunk(sentences[start:end], chunk_embedding)
+            for start, end, chunk_embedding in zip(starts, ends, chunk_embeddings)
+        ]
+
+    def embed(self, sentences: list[str]) -> np.ndarray:
+        """
+        :returns: np.ndarray - (sentences, dimensions) float32 matrix of the sentence embeddings.
+        """
+        batches = [
+            np.asarray(self.embedding_function(sentences[i:i + self.batch_size]), dtype=np.float32)
+            for i in range(0, len(sentences), self.batch_size)
+        ]
+
+        return np.concatenate(batches)
+
+    def window_similarities(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        :returns: np.ndarray - Cosine similarity of the windows before and after every sentence boundary,
+        the i-th boundary lies between the sentences i and i + 1.
+        """
+        n = len(embeddings)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.where(norms == 0, 1, norms)
+
+        # window sums are differences of the cumulative sums
+        cumsum = np.vstack([np.zeros((1, unit.shape[1]), dtype=unit.dtype), np.cumsum(unit, axis=0)])
+        boundaries = np.arange(1, n)
+        before = cumsum[boundaries] - cumsum[np.maximum(boundaries - self.window_size, 0)]
+        after = cumsum[np.minimum(boundaries + self.window_size, n)] - cumsum[boundaries]
+
+        dots = np.einsum('ij,ij->i', before, after)
+        norms = np.linalg.norm(before, axis=1) * np.linalg.norm(after, axis=1)
+
+        return dots / np.where(norms == 0, 1, norms)
+
+    def breakpoints(self, similarities: np.ndarray) -> np.ndarray:
+        """
+        :returns: np.ndarray - Indexes of the first sentences of the chunks.
+        """
+        n = len(similarities) + 1
+        is_start = np.zeros(n, dtype=bool)
+        is_start[0] = True
+        is_start[1:] = similarities < self.thresh
+
+        # sentences past max_chunk_size in their semantic segment start new chunks
+        segment_starts = np.flatnonzero(is_start)
+        segment_ids = np.cumsum(is_start) - 1
+        offsets = np.arange(n) - segment_starts[segment_ids]
+        is_start |= offsets % self.max_chunk_size == 0
+
+        return np.flatnonzero(is_start)
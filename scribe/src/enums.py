@@ -49,6 +49,11 @@ class EmbeddingModelName(Enum):
     EMBED_MULTILINGUAL_LIGHT_V3_0 = 'embed-multilingual-light-v3.0'
 
 
+class RerankerModelName(Enum):
+    # local sentence transformers cross-encoders
+    MS_MARCO_MINILM_L6_V2 = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+
+
 class ModelProvider(Enum):
     OPENAI = 'openai'
     COHERE = 'cohere'
@@ -70,3 +75,28 @@ class Device(Enum):
 class DocProcType(Enum):
     SEMANTIC = 'semantic'
     BASE = 'base'
+
+
+class JobStatus(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class RetrievalMode(Enum):
+    DENSE = 'dense'
+    LEXICAL = 'lexical'
+    HYBRID = 'hybrid'
+
+
+class StreamFormat(Enum):
+    BASE64 = 'base64'
+    JSON = 'json'
+
+
+class TraceExporter(Enum):
+    NONE = 'none'
+    FILE = 'file'
+    OTLP = 'otlp'
@@ -3,6 +3,7 @@ from typing import Sequence
 from dependency_injector.wiring import inject, Provide
 from mediatr import Mediator, GenericQuery
 
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
 from src.adapters.uow import AbstractUoW
 from src.di_container import Container
 from src.domain.models import ApiKeyCredential
@@ -107,13 +108,16 @@ class ApiKeyUpdateHandler:
     def __init__(
             self,
             api_key_uow: AbstractUoW = Provide[Container.api_key_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.api_key_uow = api_key_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: ApiKeyUpdateCommand) -> ApiKeyCredential:
         with self.api_key_uow as uow:
             upd_item = uow.repository.update(**request.__dict__)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('api_key', request.id_)
 
             return upd_item
 
@@ -128,14 +132,17 @@ class ApiKeyDeleteHandler:
     @inject
     def __init__(
             self,
-            api_key_uow: AbstractUoW = Provide[Container.api_key_uow]
+            api_key_uow: AbstractUoW = Provide[Container.api_key_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.api_key_uow = api_key_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: ApiKeyDeleteCommand) -> None:
         with self.api_key_uow as uow:
             uow.repository.delete(request.id_)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('api_key', request.id_)
 
 
 class ApiKeyCountQuery(GenericQuery[int | None]):
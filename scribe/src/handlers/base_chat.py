@@ -1,20 +1,32 @@
-from typing import Sequence, Type
+import asyncio
+import logging
+import time
+from typing import Callable, Sequence, Type
 
+import orjson
 from dependency_injector.wiring import inject, Provide
 from mediatr import Mediator, GenericQuery
+from chromadb import AsyncClientAPI
 from pydantic import BaseModel
 
+from src.adapters.answer_cache import SemanticAnswerCache
 from src.adapters.async_vector_client import AbstractAsyncClient
+from src.adapters.chat_pipeline_cache import ChatPipelineCache, ChatPipeline
 from src.adapters.chat_model import AsyncStream
-from src.adapters.uow import AbstractUoW
+from src.adapters.chroma_models import VectorChromaDocument
+from src.adapters.lexical_index import AbstractLexicalIndex
+from src.adapters.reranker import AbstractReranker
+from src.adapters.uow import AbstractUoW, AsyncAbstractUoW
 from src.adapters.vector_collection_repository import (
     AbstractAsyncVectorCollectionRepository,
     AbstractAsyncDocumentRepository
 )
 from src.di_container import Container
 from src.domain.models import BaseChat
+from src.enums import RetrievalMode, StreamFormat
+from src.system.metrics import CHAT_STAGE_SECONDS, CHAT_TOKENS_PER_SECOND, RETRIEVAL_STAGE_SECONDS
 from src.domain.services.embedding_model_builder import EmbeddingModelBuilder
-from src.domain.services.chat_model_builder import ChatModelBuilder
+from src.domain.services.chat_model_builder import ChatModelBuilder, build_token_counter
 from src.domain.services.chat_prompt_template_builder import ChatPromptTemplateBuilder
 
 
@@ -24,6 +36,7 @@ class BaseChatAddCommand(BaseModel, GenericQuery[BaseChat]):
     chat_model_id: int
     system_prompt_id: int | None
     vec_col_id: int | None
+    answer_cache: bool = False
 
 
 @Mediator.handler
@@ -103,14 +116,17 @@ class BaseChatUpdateHandler:
     @inject
     def __init__(
             self,
-            base_chat_uow: AbstractUoW = Provide[Container.base_chat_uow]
+            base_chat_uow: AbstractUoW = Provide[Container.base_chat_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.base_chat_uow = base_chat_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: BaseChatUpdateCommand) -> BaseChat:
         with self.base_chat_uow as uow:
             upd_item = uow.repository.update(request.id_, **request.kwargs)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('base_chat', request.id_)
 
             return upd_item
 
@@ -124,14 +140,17 @@ class BaseChatDeleteHandler:
     @inject
     def __init__(
             self,
-            base_chat_uow: AbstractUoW = Provide[Container.base_chat_uow]
+            base_chat_uow: AbstractUoW = Provide[Container.base_chat_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.base_chat_uow = base_chat_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: BaseChatDeleteCommand) -> None:
         with self.base_chat_uow as uow:
             uow.repository.delete(request.id_)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('base_chat', request.id_)
 
 
 class BaseChatCountQuery(GenericQuery[int | None]):
@@ -157,6 +176,9 @@ class BaseChatStreamCommand(BaseModel, GenericQuery[AsyncStream]):
     query_string: str
     doc_names: list[str] | None
     n_results: int | None
+    mode: RetrievalMode = RetrievalMode.DENSE
+    rerank: bool = False
+    stream_format: StreamFormat = StreamFormat.BASE64
 
 
 class InvalidBaseChatObjectError(LookupError):
@@ -164,15 +186,26 @@ class InvalidBaseChatObjectError(LookupError):
         super().__init__(f"BaseChat: '{obj_name}' with the id '{id_}' was not found.")
 
 
-# TODO massive rework is needed here
 @Mediator.handler
 class BaseChatStreamHandler:
+    """
+    Resolved pipelines (chat model client, system prompt, embedding function, collection handle) are cached
+    between the turns, so a turn is left with retrieval and generation.
+
+    Base chats with the answer cache enabled replay the answer of a similar query over the same retrieved chunks
+    instead of generating it. The answers are dropped with the pipeline, when the chat's config or collection changes.
+
+    Durations of the turn stages are exported to prometheus and sent as the final stats event of the stream.
+    """
+
     @inject
     def __init__(
             self,
-            base_chat_uow: AbstractUoW = Provide[Container.base_chat_uow],
+            async_base_chat_uow: AsyncAbstractUoW = Provide[Container.async_base_chat_uow],
             chat_model_builder_service: ChatModelBuilder = Provide[Container.chat_model_builder_service],
             chat_prompt_template_builder: ChatPromptTemplateBuilder = Provide[Container.chat_prompt_template_builder],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache],
+            answer_cache: Callable[[], SemanticAnswerCache] = Provide[Container.answer_cache.provider],
 
             # vector store dependencies
             async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
@@ -180,20 +213,152 @@ class BaseChatStreamHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder]
+            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder],
+            lexical_index: AbstractLexicalIndex = Provide[Container.lexical_index],
+            reranker: AbstractReranker = Provide[Container.reranker]
     ):
-        self.base_chat_uow = base_chat_uow
+        self.async_base_chat_uow = async_base_chat_uow
         self.chat_model_builder_service = chat_model_builder_service
         self.chat_prompt_template_builder = chat_prompt_template_builder
+        self.chat_pipeline_cache = chat_pipeline_cache
+        self.answer_cache = answer_cache
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
         self.embedding_model_builder_service = embedding_model_builder_service
+        self.lexical_index = lexical_index
+        self.reranker = reranker
 
     async def handle(self, request: BaseChatStreamCommand) -> AsyncStream:
+        start = time.perf_counter()
+        timings = {}
+
+        pipeline = self.chat_pipeline_cache.get(request.id_)
+        if pipeline is None:
+            pipeline = await self.resolve_pipeline(request.id_, timings)
+        elif pipeline.collection is not None:
+            await self.refresh_collection(pipeline, timings)
+
+        # the query is embedded up front, so retrieval hits the query embedding cache and times the chroma query only
+        query_embedding = None
+        if pipeline.collection is not None and (
+                request.mode != RetrievalMode.LEXICAL or pipeline.answer_cache is not None
+        ):
+            stage_start = time.perf_counter()
+            query_embedding = (await asyncio.to_thread(pipeline.embedding_function, [request.query_string]))[0]
+            timings['query_embedding'] = time.perf_counter() - stage_start
+
+        # retrieving documents from vector collection
+        context_docs = None
+        context_tokens = None
+        retrieved_docs = []
+        if pipeline.collection is not None:
+            retrieved_docs = await self.retrieve(pipeline, request, timings)
+
+        # replaying the answer to a similar query grounded in the same chunks
+        # cached events are already encoded, so the answers are kept per stream format as well
+        answer_key = [request.stream_format.value] + [doc.id_ for doc in retrieved_docs]
+        if pipeline.answer_cache is not None:
+            events = pipeline.answer_cache.get(query_embedding, answer_key)
+            if events is not None:
+                logging.debug(f'BaseChat {request.id_} answer cache hit')
+                return instrument_stream(pipeline.answer_cache.replay(events), pipeline, timings, start)
+
+        stage_start = time.perf_counter()
+        if pipeline.collection is not None:
+            context_docs, context_tokens = self.chat_prompt_template_builder.assemble_context(
+                retrieved_docs,
+                count_tokens=pipeline.count_tokens
+            )
+
+        # setting prompt template
+        prompt = self.chat_prompt_template_builder.build(
+            system_prompt=pipeline.system_prompt,
+            docs=context_docs
+        )
+        timings['prompt_build'] = time.perf_counter() - stage_start
+
+        answer = []
+        stream = pipeline.chat_model.async_stream(
+            prompt,
+            input=request.query_string,
+            docs_context=context_docs,
+            context_tokens=context_tokens,
+            stream_format=request.stream_format,
+            on_chunk=answer.append
+        )
+
+        if pipeline.answer_cache is not None:
+            stream = pipeline.answer_cache.record(stream, query_embedding, answer_key)
+
+        return instrument_stream(stream, pipeline, timings, start, answer)
+
+    async def retrieve(
+            self,
+            pipeline: ChatPipeline,
+            request: BaseChatStreamCommand,
+            timings: dict[str, float]
+    ) -> list[VectorChromaDocument]:
+        """
+        Queries the collection, reranked turns over-fetch the reranker's candidates and keep the best n_results.
+
+        :param timings: Durations of the turn stages, the retrieval stages are added to.
+        """
+        n_results = request.n_results or 1
+
+        async_doc_repo = self.async_document_repository(
+            pipeline.collection,
+            embedding_function=pipeline.embedding_function,
+            lexical_index=self.lexical_index
+        )  # type: ignore
+
+        # querying the collection
+        # embeddings aren't needed for the prompt, so they are never fetched here
+        start = time.perf_counter()
+        retrieved_docs = await async_doc_repo.query(
+            query_string=request.query_string,
+            doc_names=request.doc_names,
+            n_results=max(self.reranker.candidates, n_results) if request.rerank else n_results,
+            include_embeddings=False,
+            mode=request.mode
+        )
+        timings['retrieve'] = time.perf_counter() - start
+
+        if request.rerank:
+            start = time.perf_counter()
+            retrieved_docs = await asyncio.to_thread(
+                self.reranker.rerank,
+                request.query_string,
+                retrieved_docs,
+                n_results
+            )
+            timings['rerank'] = time.perf_counter() - start
+
+        retrieval_timings = {stage: timings[stage] for stage in ['retrieve', 'rerank'] if stage in timings}
+        for stage, seconds in retrieval_timings.items():
+            RETRIEVAL_STAGE_SECONDS.labels(stage).observe(seconds)
+        logging.debug(
+            f'BaseChat {request.id_} retrieval: '
+            + ', '.join(f'{stage} {seconds * 1000:.1f}ms' for stage, seconds in retrieval_timings.items())
+        )
+
+        return retrieved_docs
+
+    async def resolve_pipeline(self, id_: int, timings: dict[str, float] | None = None) -> ChatPipeline:
+        """
+        Loads the base chat, builds its chat model, embedding function and collection handle, and caches them.
+
+        :param timings: Durations of the turn stages, the load stages are added to.
+        :raises InvalidBaseChatObjectError:
+        """
+        version = self.chat_pipeline_cache.version
+        timings = timings if timings is not None else {}
+
         # retrieving base chat
-        with self.base_chat_uow as uow:
-            base_chat: BaseChat = uow.repository.read(request.id_)
+        start = time.perf_counter()
+        async with self.async_base_chat_uow as uow:
+            base_chat: BaseChat = await uow.repository.read(id_)
+        timings['load'] = time.perf_counter() - start
 
         # handling empty values
         if base_chat.chat_model is None:
@@ -201,35 +366,113 @@ class BaseChatStreamHandler:
         elif base_chat.chat_model.api_key_credential is None:
             raise InvalidBaseChatObjectError('ChatModel.ApiKeyCredential', base_chat.chat_model.api_key_credential_id)
 
-        # retrieving documents from vector collection
-        retrieved_docs = None
+        pipeline = ChatPipeline(
+            base_chat=base_chat,
+            chat_model=self.chat_model_builder_service.build(chat_model=base_chat.chat_model),
+            system_prompt=base_chat.system_prompt.content if base_chat.system_prompt is not None else None,
+            count_tokens=build_token_counter(base_chat.chat_model.name),
+            dependencies=ChatPipeline.resolve_dependencies(base_chat)
+        )
+
         if base_chat.vec_col:
             async_vec_db_client = await self.async_vector_db_client.async_init()
 
-            vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
-            ef = self.embedding_model_builder_service.build(base_chat.vec_col.embedding_model)
-            collection = await vector_collection_repo.read(base_chat.vec_col.name, embedding_function=ef)
+            start = time.perf_counter()
+            pipeline.embedding_function = self.embedding_model_builder_service.build_query_cached(
+                base_chat.vec_col.embedding_model
+            )
+            timings['embedding_function_build'] = time.perf_counter() - start
 
-            async_doc_repo = self.async_document_repository(collection)  # type: ignore
+            await self.load_collection(pipeline, async_vec_db_client, timings)
 
-            # querying the collection
-            retrieved_docs = await async_doc_repo.query(
-                query_string=request.query_string,
-                doc_names=request.doc_names,
-                n_results=request.n_results
-            )
+            # answers are keyed by the query embedding, so chats without a collection aren't cached
+            if base_chat.answer_cache:
+                pipeline.answer_cache = self.answer_cache()
 
-        # setting chat model and prompt template
-        built_chat_model = self.chat_model_builder_service.build(
-            chat_model=base_chat.chat_model,
-        )
-        prompt = self.chat_prompt_template_builder.build(
-            system_prompt=base_chat.system_prompt.content if base_chat.system_prompt is not None else None,
-            docs=retrieved_docs
-        )
+        self.chat_pipeline_cache.put(id_, version, pipeline)
 
-        return built_chat_model.async_stream(
-            prompt,
-            input=request.query_string,
-            docs_context=retrieved_docs
+        return pipeline
+
+    async def refresh_collection(self, pipeline: ChatPipeline, timings: dict[str, float]) -> None:
+        """
+        Health checks the vector db client on a turn of a cached pipeline. The collection handle is bound
+        to the client it was loaded through, so it's reloaded if the client has reconnected.
+
+        :param timings: Durations of the turn stages, the load stage is added to.
+        """
+        async_vec_db_client = await self.async_vector_db_client.async_init()
+        if async_vec_db_client is not pipeline.vector_db_client:
+            await self.load_collection(pipeline, async_vec_db_client, timings)
+
+    async def load_collection(
+            self,
+            pipeline: ChatPipeline,
+            async_vec_db_client: AsyncClientAPI,
+            timings: dict[str, float]
+    ) -> None:
+        """
+        Loads the collection handle of the pipeline's base chat through the client.
+
+        :param timings: Durations of the turn stages, the load stage is added to.
+        """
+        vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
+
+        start = time.perf_counter()
+        pipeline.collection = await vector_collection_repo.read(
+            pipeline.base_chat.vec_col.name,
+            embedding_function=pipeline.embedding_function
         )
+        pipeline.vector_db_client = async_vec_db_client
+        timings['collection_load'] = time.perf_counter() - start
+
+
+async def instrument_stream(
+        stream: AsyncStream,
+        pipeline: ChatPipeline,
+        timings: dict[str, float],
+        start: float,
+        answer: list[str] | None = None
+) -> AsyncStream:
+    """
+    Passes the events through, observes the turn stages and closes the stream with the stats event.
+    Interrupted streams aren't observed.
+
+    :param timings: Durations of the stages before the stream.
+    :param start: perf_counter at the start of the turn.
+    :param answer: Generated chunks, filled while streaming. None for the replayed answers.
+    """
+    stream_start = time.perf_counter()
+    first_token = None
+    async for event in stream:
+        if first_token is None and event.startswith('event: response'):
+            first_token = time.perf_counter()
+            timings['first_token'] = first_token - start
+        yield event
+
+    end = time.perf_counter()
+    timings['stream'] = end - stream_start
+
+    tokens = None
+    tokens_per_second = None
+    if answer and pipeline.count_tokens is not None:
+        tokens = pipeline.count_tokens(''.join(answer))
+        if first_token is not None and end > first_token:
+            tokens_per_second = tokens / (end - first_token)
+
+    base_chat = pipeline.base_chat
+    labels = (
+        base_chat.chat_model.name.value,
+        base_chat.vec_col.embedding_model.name.value if base_chat.vec_col is not None else 'none'
+    )
+    for stage, seconds in timings.items():
+        CHAT_STAGE_SECONDS.labels(stage, *labels).observe(seconds)
+    if tokens_per_second is not None:
+        CHAT_TOKENS_PER_SECOND.labels(*labels).observe(tokens_per_second)
+
+    stats = {
+        'stages': {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        'tokens': tokens,
+        'tokens_per_second': round(tokens_per_second, 1) if tokens_per_second is not None else None,
+        'answer_cache': answer is None
+    }
+    yield f'event: stats\ndata: {orjson.dumps(stats).decode()}\n\n'
@@ -7,6 +7,7 @@ from dependency_injector.wiring import inject, Provide
 from src.di_container import Container
 from src.enums import ChatModelName
 from src.domain.models import ChatModel
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
 from src.adapters.uow import AbstractUoW
 
 
@@ -98,14 +99,17 @@ class ChatModelUpdateHandler:
     @inject
     def __init__(
             self,
-            chat_model_uow: AbstractUoW = Provide[Container.chat_model_uow]
+            chat_model_uow: AbstractUoW = Provide[Container.chat_model_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.chat_model_uow = chat_model_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: ChatModelUpdateCommand) -> ChatModel:
         with self.chat_model_uow as uow:
             upd_chat_model = uow.repository.update(request.id_, **request.kwargs)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('chat_model', request.id_)
 
             return upd_chat_model
 
@@ -119,14 +123,17 @@ class ChatModelDeleteHandler:
     @inject
     def __init__(
             self,
-            chat_model_uow: AbstractUoW = Provide[Container.chat_model_uow]
+            chat_model_uow: AbstractUoW = Provide[Container.chat_model_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.chat_model_uow = chat_model_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: ChatModelDeleteCommand) -> None:
         with self.chat_model_uow as uow:
             uow.repository.delete(request.id_)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('chat_model', request.id_)
 
 
 class ChatModelCountQuery(GenericQuery[int | None]):
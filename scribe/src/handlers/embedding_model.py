@@ -7,6 +7,7 @@ from dependency_injector.wiring import inject, Provide
 from src.di_container import Container
 from src.domain.models import EmbeddingModel
 from src.enums import EmbeddingModelName, Device
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
 from src.adapters.uow import AbstractUoW
 
 
@@ -89,14 +90,17 @@ class EmbeddingModelUpdateHandler:
     @inject
     def __init__(
             self,
-            embedding_model_uow: AbstractUoW = Provide[Container.embedding_model_uow]
+            embedding_model_uow: AbstractUoW = Provide[Container.embedding_model_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.embedding_model_uow = embedding_model_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: EmbeddingModelUpdateCommand) -> EmbeddingModel:
         with self.embedding_model_uow as uow:
             upd_item = uow.repository.update(**request.model_dump())
             uow.commit()
+            self.chat_pipeline_cache.invalidate('embedding_model', request.id_)
 
             return upd_item
 
@@ -110,14 +114,17 @@ class EmbeddingModelDeleteHandler:
     @inject
     def __init__(
             self,
-            embedding_model_uow: AbstractUoW = Provide[Container.embedding_model_uow]
+            embedding_model_uow: AbstractUoW = Provide[Container.embedding_model_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.embedding_model_uow = embedding_model_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: EmbeddingModelDeleteCommand) -> None:
         with self.embedding_model_uow as uow:
             uow.repository.delete(request.id_)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('embedding_model', request.id_)
 
 
 class EmbeddingModelCountQuery(BaseModel, GenericQuery[int | None]):
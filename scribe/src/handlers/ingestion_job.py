@@ -0,0 +1,126 @@
+from typing import Sequence
+
+from dependency_injector.wiring import inject, Provide
+from mediatr import Mediator, GenericQuery
+from pydantic import BaseModel
+
+from src.adapters.job_queue import AbstractJobQueue
+from src.adapters.uow import AbstractUoW
+from src.di_container import Container
+from src.domain.models import IngestionJob
+from src.enums import JobStatus
+
+
+class IngestionJobReadQuery(BaseModel, GenericQuery[IngestionJob]):
+    id_: int
+
+
+@Mediator.handler
+class IngestionJobReadHandler:
+    @inject
+    def __init__(
+            self,
+            ingestion_job_uow: AbstractUoW = Provide[Container.ingestion_job_uow]
+    ):
+        self.ingestion_job_uow = ingestion_job_uow
+
+    def handle(self, request: IngestionJobReadQuery) -> IngestionJob:
+        with self.ingestion_job_uow as uow:
+            return uow.repository.read(request.id_)
+
+
+class IngestionJobReadAllQuery(GenericQuery[Sequence[IngestionJob]]):
+    def __init__(
+            self,
+            limit: int | None,
+            offset: int | None,
+            **kwargs
+    ):
+        self.limit = limit
+        self.offset = offset
+        self.kwargs = kwargs
+
+
+@Mediator.handler
+class IngestionJobReadAllHandler:
+    @inject
+    def __init__(
+            self,
+            ingestion_job_uow: AbstractUoW = Provide[Container.ingestion_job_uow]
+    ):
+        self.ingestion_job_uow = ingestion_job_uow
+
+    def handle(self, request: IngestionJobReadAllQuery) -> Sequence[IngestionJob]:
+        with self.ingestion_job_uow as uow:
+            return uow.repository.read_all(
+                offset=request.offset,
+                limit=request.limit,
+                **request.kwargs
+            )
+
+
+class IngestionJobCancelCommand(BaseModel, GenericQuery[IngestionJob]):
+    id_: int
+
+
+@Mediator.handler
+class IngestionJobCancelHandler:
+    @inject
+    def __init__(
+            self,
+            ingestion_job_uow: AbstractUoW = Provide[Container.ingestion_job_uow],
+            ingestion_job_queue: AbstractJobQueue = Provide[Container.ingestion_job_queue]
+    ):
+        self.ingestion_job_uow = ingestion_job_uow
+        self.ingestion_job_queue = ingestion_job_queue
+
+    def handle(self, request: IngestionJobCancelCommand) -> IngestionJob:
+        """
+        Pending jobs are cancelled right away and skipped by the workers. Running jobs are interrupted
+        and get cancelled status once the worker stops them.
+        """
+        with self.ingestion_job_uow as uow:
+            # the status is checked by the update itself, a worker may start the job in between
+            cancelled = uow.repository.update_where(
+                request.id_,
+                {'status': JobStatus.PENDING},
+                status=JobStatus.CANCELLED
+            )
+            job: IngestionJob = uow.repository.read(request.id_)
+
+            if cancelled:
+                job.files.clear()
+                uow.commit()
+            elif job.status == JobStatus.RUNNING:
+                self.ingestion_job_queue.cancel(request.id_)
+
+            return job
+
+
+class IngestionJobResumeCommand(GenericQuery[None]):
+    pass
+
+
+@Mediator.handler
+class IngestionJobResumeHandler:
+    @inject
+    def __init__(
+            self,
+            ingestion_job_uow: AbstractUoW = Provide[Container.ingestion_job_uow],
+            ingestion_job_queue: AbstractJobQueue = Provide[Container.ingestion_job_queue]
+    ):
+        self.ingestion_job_uow = ingestion_job_uow
+        self.ingestion_job_queue = ingestion_job_queue
+
+    def handle(self, request: IngestionJobResumeCommand) -> None:
+        """
+        Puts the jobs left unfinished by a previous run back on the queue.
+        """
+        with self.ingestion_job_uow as uow:
+            # interrupted jobs are started over
+            for job in uow.repository.read_all(status=JobStatus.RUNNING):
+                uow.repository.update(job.id, status=JobStatus.PENDING)
+            uow.commit()
+
+            for job in uow.repository.read_all(status=JobStatus.PENDING):
+                self.ingestion_job_queue.put(job.id)
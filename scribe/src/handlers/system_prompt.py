@@ -3,6 +3,7 @@ from typing import Sequence
 from mediatr import Mediator, GenericQuery
 from dependency_injector.wiring import inject, Provide
 
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
 from src.adapters.uow import AbstractUoW
 from src.domain.models import SystemPrompt
 from src.di_container import Container
@@ -87,14 +88,17 @@ class SystemPromptUpdateHandler:
     @inject
     def __init__(
             self,
-            system_prompt_uow: AbstractUoW = Provide[Container.system_prompt_uow]
+            system_prompt_uow: AbstractUoW = Provide[Container.system_prompt_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.system_prompt_uow = system_prompt_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: SystemPromptUpdateCommand) -> SystemPrompt:
         with self.system_prompt_uow as uow:
             upd_item = uow.repository.update(request.id_, **request.kwargs)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('system_prompt', request.id_)
 
             return upd_item
 
@@ -109,14 +113,17 @@ class SystemPromptDeleteHandler:
     @inject
     def __init__(
             self,
-            system_prompt_uow: AbstractUoW = Provide[Container.system_prompt_uow]
+            system_prompt_uow: AbstractUoW = Provide[Container.system_prompt_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.system_prompt_uow = system_prompt_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     def handle(self, request: SystemPromptDeleteCommand) -> None:
         with self.system_prompt_uow as uow:
             uow.repository.delete(request.id_)
             uow.commit()
+            self.chat_pipeline_cache.invalidate('system_prompt', request.id_)
 
 
 class SystemPromptCountQuery(GenericQuery[int | None]):
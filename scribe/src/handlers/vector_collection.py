@@ -1,14 +1,21 @@
-from typing import Type, Sequence
+import asyncio
+from typing import Type, Sequence, AsyncIterator
 
 from dependency_injector.wiring import inject, Provide
 from mediatr import Mediator, GenericQuery
 from pydantic import BaseModel
 
 from src.adapters.async_vector_client import AbstractAsyncClient
-from src.adapters.uow import AbstractUoW
-from src.adapters.vector_collection_repository import AbstractAsyncVectorCollectionRepository
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
+from src.adapters.collection_archive import CollectionArchiveError, CollectionArchiveReader, stream_archive
+from src.adapters.lexical_index import AbstractLexicalIndex
+from src.adapters.uow import AbstractUoW, AsyncAbstractUoW
+from src.adapters.vector_collection_repository import (
+    AbstractAsyncVectorCollectionRepository,
+    AbstractAsyncDocumentRepository
+)
 from src.di_container import Container
-from src.domain.models import VectorCollection
+from src.domain.models import EmbeddingModel, VectorCollection, VectorDocument
 from src.enums import DistanceFunction
 
 
@@ -26,18 +33,18 @@ class VecCollectionAddHandler:
             async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
                 Container.async_vector_collection_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow]
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
 
     async def handle(self, request: VecCollectionAddCommand) -> VectorCollection:
         # to rollback domain db changes if vector db fails
-        with self.domain_vector_collection_uow as uow:
+        async with self.async_domain_vector_collection_uow as uow:
             # storing vector col in domain db
             vec_col_obj = VectorCollection(**request.model_dump())  # type: ignore
-            uow.repository.add(vec_col_obj)
+            await uow.repository.add(vec_col_obj)
 
             # initializing vector db collection and repo
             async_vec_db_client = await self.async_vector_db_client.async_init()
@@ -49,7 +56,7 @@ class VecCollectionAddHandler:
                 }
             )
 
-            uow.commit()
+            await uow.commit()
 
             return vec_col_obj
 
@@ -66,25 +73,38 @@ class VecCollectionDeleteHandler:
             async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
                 Container.async_vector_collection_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow]
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache],
+            lexical_index: AbstractLexicalIndex = Provide[Container.lexical_index],
+            async_document_manifest_uow: AsyncAbstractUoW = Provide[Container.async_document_manifest_uow]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
+        self.lexical_index = lexical_index
+        self.async_document_manifest_uow = async_document_manifest_uow
 
     async def handle(self, request: VecCollectionDeleteCommand) -> None:
         # to rollback domain db changes if vector db fails
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             # delete from vector db
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
             await vector_collection_repo.delete(vec_col_obj.name)
+            await asyncio.to_thread(self.lexical_index.drop, vec_col_obj.name)
 
             # delete from domain db
-            uow.repository.delete(request.id_)
-            uow.commit()
+            await uow.repository.delete(request.id_)
+            await uow.commit()
+            self.chat_pipeline_cache.invalidate('vec_col', request.id_)
+
+        async with self.async_document_manifest_uow as uow:
+            for entry in await uow.repository.read_all(vec_col_id=request.id_):
+                await uow.repository.delete(entry.id)
+            await uow.commit()
 
 
 class VecCollectionReadQuery(BaseModel, GenericQuery[VectorCollection]):
@@ -140,3 +160,136 @@ class VecCollectionCountHandler:
     def handle(self, request: VecCollectionCountQuery) -> int | None:
         with self.domain_vector_collection_uow as uow:
             return uow.repository.count()
+
+
+class VecCollectionExportQuery(BaseModel, GenericQuery[AsyncIterator[bytes]]):
+    id_: int
+    page_size: int = 1000
+
+
+@Mediator.handler
+class VecCollectionExportHandler:
+    """
+    Streams the archive of the collection with its embeddings, embedding model and distance function,
+    see collection_archive. The archive is streamed as the pages are fetched, documents added meanwhile are left out.
+    """
+
+    @inject
+    def __init__(
+            self,
+            async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
+                Container.async_vector_collection_repository],
+            async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
+                Container.async_vector_document_repository],
+            async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow]
+    ):
+        self.async_vector_collection_repository = async_vector_collection_repository
+        self.async_document_repository = async_vector_document_repository
+        self.async_vector_db_client = async_vector_db_client
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+
+    async def handle(self, request: VecCollectionExportQuery) -> AsyncIterator[bytes]:
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj: VectorCollection = await uow.repository.read(request.id_)
+
+            async_vec_db_client = await self.async_vector_db_client.async_init()
+            vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
+            collection = await vector_collection_repo.read(vec_col_obj.name)
+
+        async_doc_repo = self.async_document_repository(collection)  # type: ignore
+        count = await async_doc_repo.count()
+
+        return stream_archive(
+            async_doc_repo.read_pages(page_size=request.page_size, limit=count, include_embeddings=True),
+            count,
+            name=vec_col_obj.name,
+            embedding_model=vec_col_obj.embedding_model.name.value,
+            distance_func=vec_col_obj.distance_func.value
+        )
+
+
+class VecCollectionImportCommand(BaseModel, GenericQuery[VectorCollection]):
+    path: str
+    embedding_model_id: int
+    name: str | None = None
+
+
+@Mediator.handler
+class VecCollectionImportHandler:
+    """
+    Restores a collection from an archive. Stored embeddings are memory-mapped from the archive and inserted in
+    batches, so nothing is embedded again.
+    """
+
+    @inject
+    def __init__(
+            self,
+            async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
+                Container.async_vector_collection_repository],
+            async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
+                Container.async_vector_document_repository],
+            async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            async_embedding_model_uow: AsyncAbstractUoW = Provide[Container.async_embedding_model_uow],
+            lexical_index: AbstractLexicalIndex = Provide[Container.lexical_index]
+    ):
+        self.async_vector_collection_repository = async_vector_collection_repository
+        self.async_document_repository = async_vector_document_repository
+        self.async_vector_db_client = async_vector_db_client
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.async_embedding_model_uow = async_embedding_model_uow
+        self.lexical_index = lexical_index
+
+    async def handle(self, request: VecCollectionImportCommand) -> VectorCollection:
+        """
+        :raises CollectionArchiveError: if the archive is malformed, or the embedding model doesn't match it.
+        """
+        with await asyncio.to_thread(CollectionArchiveReader, request.path) as reader:
+            manifest = reader.manifest
+
+            async with self.async_embedding_model_uow as uow:
+                embedding_model: EmbeddingModel = await uow.repository.read(request.embedding_model_id)
+            if embedding_model.name.value != manifest.embedding_model:
+                raise CollectionArchiveError(
+                    f"embedded with '{manifest.embedding_model}', not with '{embedding_model.name.value}'"
+                )
+
+            try:
+                distance_func = DistanceFunction(manifest.distance_func)
+            except ValueError:
+                raise CollectionArchiveError(f"unknown distance function '{manifest.distance_func}'")
+
+            name = request.name or manifest.name
+            async_vec_db_client = await self.async_vector_db_client.async_init()
+            vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
+            collection = await vector_collection_repo.add(
+                name=name,
+                metadata={
+                    'hnsw:space': distance_func.value
+                }
+            )
+
+            # the domain db transaction isn't held open during the insert, the vector db collection
+            # is dropped instead, if the restore fails
+            try:
+                docs = (
+                    VectorDocument(record.document, record.metadata, embedding=record.embedding, id_=record.id_)
+                    for record in reader.records()
+                )
+                async_doc_repo = self.async_document_repository(collection, lexical_index=self.lexical_index)  # type: ignore
+                await async_doc_repo.add(docs, batch_size=await async_vec_db_client.get_max_batch_size())
+
+                async with self.async_domain_vector_collection_uow as uow:
+                    vec_col_obj = await uow.repository.add(VectorCollection(
+                        name=name,
+                        embedding_model_id=request.embedding_model_id,
+                        distance_func=distance_func
+                    ))  # type: ignore
+                    await uow.commit()
+
+                    return vec_col_obj
+            except BaseException:
+                await vector_collection_repo.delete(name)
+                await asyncio.to_thread(self.lexical_index.drop, name)
+                raise
@@ -1,24 +1,30 @@
-from typing import Type
+import asyncio
+from typing import Type, Callable, AsyncIterator, Sequence
 
 from dependency_injector.wiring import inject, Provide
 from mediatr import Mediator, GenericQuery
 from pydantic import BaseModel
 
 from src.adapters.async_vector_client import AbstractAsyncClient
-from src.adapters.uow import AbstractUoW
+from src.adapters.chat_pipeline_cache import ChatPipelineCache
+from src.adapters.embedding_cache import QueryEmbeddingCache
+from src.adapters.job_queue import AbstractJobQueue
+from src.adapters.lexical_index import AbstractLexicalIndex, doc_name
+from src.adapters.uow import AbstractUoW, AsyncAbstractUoW
 from src.adapters.vector_collection_repository import (
     AbstractAsyncVectorCollectionRepository,
     AbstractAsyncDocumentRepository
 )
-from src.enums import DocProcType
+from src.enums import DocProcType, JobStatus, RetrievalMode
 from src.di_container import Container
 from src.domain.services.load_document_service import (
     BaseLoadDocumentService,
     LoadDocumentService,
 )
-from src.adapters.chroma_models import VectorChromaDocument
+from src.adapters.chroma_models import VectorChromaDocument, get_result_to_ndjson
 from src.domain.services.embedding_model_builder import EmbeddingModelBuilder
-from src.domain.models import VectorCollection
+from src.domain.models import VectorCollection, IngestionJob, IngestionJobFile, VectorDocument, DocumentManifest
+from src.system.tracing import tracer
 
 
 class UnsupportedSemanticChunkingFormat(RuntimeError):
@@ -26,19 +32,118 @@ class UnsupportedSemanticChunkingFormat(RuntimeError):
         super().__init__(f'Semantic chunking supports only files in pdf format for processing.')
 
 
-class DocAddCommand(BaseModel, GenericQuery[None]):
+async def read_manifest(
+        uow: AsyncAbstractUoW,
+        vec_col_obj: VectorCollection,
+        async_doc_repo: AbstractAsyncDocumentRepository,
+        job_uow: AsyncAbstractUoW
+) -> Sequence[DocumentManifest]:
+    """
+    Reads the document manifest of the vector collection. If its chunk total doesn't match the collection's count,
+    e.g. the collection was populated before the manifest existed, the manifest is rebuilt with a collection scan.
+    While ingestion jobs of the collection are running, the mismatch is expected (the jobs update the manifest once
+    they finish), so the manifest is returned as is.
+    """
+    async with uow:
+        entries = await uow.repository.read_all(vec_col_id=vec_col_obj.id)
+        if sum(entry.chunks for entry in entries) == await async_doc_repo.count():
+            return entries
+
+        async with job_uow:
+            if await job_uow.repository.read_all(limit=1, vec_col_id=vec_col_obj.id, status=JobStatus.RUNNING):
+                return entries
+
+        stats = await async_doc_repo.scan_documents()
+        for entry in entries:
+            if entry.name not in stats:
+                await uow.repository.delete(entry.id)
+            else:
+                chunks, size = stats.pop(entry.name)
+                await uow.repository.update(entry.id, chunks=chunks, size=size)
+
+        for name, (chunks, size) in stats.items():
+            await uow.repository.add(DocumentManifest(
+                vec_col_id=vec_col_obj.id,
+                name=name,
+                chunks=chunks,
+                size=size,
+                embedding_model=vec_col_obj.embedding_model.name.value
+            ))
+        await uow.commit()
+
+        return await uow.repository.read_all(vec_col_id=vec_col_obj.id)
+
+
+class DocAddCommand(BaseModel, GenericQuery[IngestionJob]):
     id_: int
     cnf_type: DocProcType
     doc_processing_cnf_id: int
     files: dict[str, bytes] | None
     urls: list[str] | None
+    upsert: bool = False
 
 
 @Mediator.handler
 class DocAddHandler:
+    """
+    Stores the documents as an IngestionJob and puts it on the ingestion job queue.
+    """
+
+    @inject
+    def __init__(
+            self,
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            async_ingestion_job_uow: AsyncAbstractUoW = Provide[Container.async_ingestion_job_uow],
+            ingestion_job_queue: AbstractJobQueue = Provide[Container.ingestion_job_queue]
+    ):
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.async_ingestion_job_uow = async_ingestion_job_uow
+        self.ingestion_job_queue = ingestion_job_queue
+
+    async def handle(self, request: DocAddCommand) -> IngestionJob:
+        # semantic chunking does not process urls
+        if request.cnf_type == DocProcType.SEMANTIC and request.urls:
+            raise UnsupportedSemanticChunkingFormat()
+
+        # vector collection should exist before the job is queued
+        async with self.async_domain_vector_collection_uow as uow:
+            await uow.repository.read(request.id_)
+
+        async with self.async_ingestion_job_uow as uow:
+            job = IngestionJob(
+                vec_col_id=request.id_,
+                cnf_type=request.cnf_type,
+                doc_processing_cnf_id=request.doc_processing_cnf_id,
+                urls=request.urls,
+                files=[
+                    IngestionJobFile(filename=filename, content=content)
+                    for filename, content in (request.files or {}).items()
+                ],
+                upsert=request.upsert
+            )
+            await uow.repository.add(job)
+            await uow.commit()
+
+        self.ingestion_job_queue.put(job.id)
+
+        return job
+
+
+class DocIngestCommand(BaseModel, GenericQuery[None]):
+    job_id: int
+
+
+@Mediator.handler
+class DocIngestHandler:
+    """
+    Processes a queued IngestionJob: parses and chunks the documents, embeds and stores them in the vector collection.
+    Progress and the final status are persisted in the job.
+    """
+
     @inject
     def __init__(
             self,
+            ingestion_job_uow: AbstractUoW = Provide[Container.ingestion_job_uow],
             doc_proc_cnf_uow: AbstractUoW = Provide[Container.doc_proc_cnf_uow],
             sem_doc_proc_cnf_uow: AbstractUoW = Provide[Container.sem_doc_proc_cnf_uow],
             load_document_service: BaseLoadDocumentService = Provide[Container.load_document_service],
@@ -49,8 +154,13 @@ class DocAddHandler:
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
             domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow],
-            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder]
+            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder],
+            lexical_index: AbstractLexicalIndex = Provide[Container.lexical_index],
+            document_manifest_uow: AbstractUoW = Provide[Container.document_manifest_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache],
+            ingestion_job_queue: AbstractJobQueue = Provide[Container.ingestion_job_queue]
     ):
+        self.ingestion_job_uow = ingestion_job_uow
         self.doc_proc_cnf_uow = doc_proc_cnf_uow
         self.sem_doc_proc_cnf_uow = sem_doc_proc_cnf_uow
         self.load_document_service = load_document_service
@@ -60,51 +170,175 @@ class DocAddHandler:
         self.async_vector_db_client = async_vector_db_client
         self.domain_vector_collection_uow = domain_vector_collection_uow
         self.embedding_model_builder_service = embedding_model_builder_service
-
-    async def handle(self, request: DocAddCommand) -> None:
+        self.lexical_index = lexical_index
+        self.document_manifest_uow = document_manifest_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
+        self.ingestion_job_queue = ingestion_job_queue
+
+    async def handle(self, request: DocIngestCommand) -> None:
+        with self.ingestion_job_uow as uow:
+            job: IngestionJob = uow.repository.read(request.job_id)
+
+            # the job was cancelled or already processed, the status is checked by the update itself
+            if not uow.repository.update_where(job.id, {'status': JobStatus.PENDING}, status=JobStatus.RUNNING):
+                return None
+
+            files = job.files_dict
+            urls = job.deserialized_urls
+            uow.commit()
+
+        try:
+            with tracer.start_as_current_span('ingest', attributes={'job_id': job.id, 'vec_col_id': job.vec_col_id}):
+                await self.ingest(job, files, urls)
+        except asyncio.CancelledError:
+            # interrupted by the shutdown, the job is left running with its files to be resumed on the next start
+            if not self.ingestion_job_queue.stopping:
+                self.finish_job(job.id, JobStatus.CANCELLED)
+            raise
+        except Exception as e:
+            self.finish_job(job.id, JobStatus.FAILED, error=str(e))
+            raise
+
+        self.finish_job(job.id, JobStatus.COMPLETED)
+
+    async def ingest(
+            self,
+            job: IngestionJob,
+            files: dict[str, bytes] | None,
+            urls: list[str] | None
+    ) -> None:
         with self.domain_vector_collection_uow as uow:
             # retrieve domain vec col
-            vec_col_obj: VectorCollection = uow.repository.read(id_=request.id_)
+            vec_col_obj: VectorCollection = uow.repository.read(id_=job.vec_col_id)
 
             # retrieve vec col from vector db
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
-            ef = self.embedding_model_builder_service.build(vec_col_obj.embedding_model)
+            # chunks of re-ingested documents aren't embedded again
+            ef = self.embedding_model_builder_service.build_cached(vec_col_obj.embedding_model)
             collection = await vector_collection_repo.read(vec_col_obj.name, embedding_function=ef)
 
         # basic chunking with unstructured
-        if request.cnf_type == DocProcType.BASE:
+        if job.cnf_type == DocProcType.BASE:
             with self.doc_proc_cnf_uow as uow:
-                doc_proc_cnf = uow.repository.read(request.doc_processing_cnf_id)
+                doc_proc_cnf = uow.repository.read(job.doc_processing_cnf_id)
 
-            loaded_docs = await self.load_document_service.load_async(
-                files=request.files,
-                urls=request.urls,
+            parsed_docs = self.load_document_service.stream_async(
+                files=files,
+                urls=urls,
                 doc_proc_cnf=doc_proc_cnf
             )
         # semantic chunking with horchunk
         else:
-            # semantic chunking does not process urls
-            if request.urls:
-                raise UnsupportedSemanticChunkingFormat()
-
             with self.sem_doc_proc_cnf_uow as uow:
-                sem_doc_proc_cnf = uow.repository.read(request.doc_processing_cnf_id)
+                sem_doc_proc_cnf = uow.repository.read(job.doc_processing_cnf_id)
 
-            loaded_docs = await self.sem_load_document_service.load_async(
-                files=request.files,
+            parsed_docs = self.sem_load_document_service.stream_async(
+                files=files,
                 doc_proc_cnf=sem_doc_proc_cnf,
                 embedding_function=ef
             )
 
-        async_doc_repo = self.async_document_repository(collection)  # type: ignore
-        return await async_doc_repo.add(loaded_docs)
+        # batches are limited both by the embedding provider and by chroma
+        batch_size = min(
+            self.embedding_model_builder_service.determine_batch_size(vec_col_obj.embedding_model.name),
+            await async_vec_db_client.get_max_batch_size()
+        )
+
+        progress = {'chunks_parsed': 0, 'chunks_embedded': 0, 'chunks_stored': 0}
+
+        def track(field: str) -> Callable[[int], None]:
+            def callback(amount: int) -> None:
+                progress[field] += amount
+                self.update_job(job.id, **{field: progress[field]})
+
+            return callback
+
+        on_parsed = track('chunks_parsed')
+        doc_names = set()
+
+        # chunks are stored while the next documents are still being parsed
+        async def chunks() -> AsyncIterator[VectorDocument]:
+            async for docs in parsed_docs:
+                on_parsed(len(docs))
+                for doc in docs:
+                    doc_names.add(doc_name(doc.metadata))
+                    yield doc
+
+        async_doc_repo = self.async_document_repository(
+            collection,
+            embedding_function=ef,
+            lexical_index=self.lexical_index
+        )  # type: ignore
+        try:
+            if not job.upsert:
+                await async_doc_repo.add(
+                    chunks(),
+                    batch_size=batch_size,
+                    on_embedded=track('chunks_embedded'),
+                    on_stored=track('chunks_stored')
+                )
+            else:
+                diff = await async_doc_repo.upsert(
+                    chunks(),
+                    batch_size=batch_size,
+                    on_embedded=track('chunks_embedded'),
+                    on_stored=track('chunks_stored')
+                )
+                self.update_job(job.id, chunks_deleted=diff.deleted, chunks_unchanged=diff.unchanged)
+        finally:
+            # cached answers of the base chats over the collection are stale, even if the job failed halfway
+            self.chat_pipeline_cache.invalidate('vec_col', vec_col_obj.id)
+
+        doc_names.discard(None)
+        stats = {name: await async_doc_repo.document_stats(name) for name in doc_names}
+        self.update_manifest(vec_col_obj, stats)
+
+    def update_manifest(self, vec_col_obj: VectorCollection, stats: dict[str, tuple[int, int]]) -> None:
+        """
+        :param stats: Amount of the stored chunks and their size in bytes by the ingested document names.
+        """
+        with self.document_manifest_uow as uow:
+            for name, (chunks, size) in stats.items():
+                entries = uow.repository.read_all(vec_col_id=vec_col_obj.id, name=name)
+                if entries:
+                    uow.repository.update(
+                        entries[0].id,
+                        chunks=chunks,
+                        size=size,
+                        embedding_model=vec_col_obj.embedding_model.name.value
+                    )
+                else:
+                    uow.repository.add(DocumentManifest(
+                        vec_col_id=vec_col_obj.id,
+                        name=name,
+                        chunks=chunks,
+                        size=size,
+                        embedding_model=vec_col_obj.embedding_model.name.value
+                    ))
+            uow.commit()
+
+    def update_job(self, id_: int, **kwargs) -> None:
+        with self.ingestion_job_uow as uow:
+            uow.repository.update(id_, **kwargs)
+            uow.commit()
+
+    def finish_job(self, id_: int, status: JobStatus, error: str | None = None) -> None:
+        """
+        Sets the final status of the job and drops its uploaded files.
+        """
+        with self.ingestion_job_uow as uow:
+            job: IngestionJob = uow.repository.read(id_)
+            job.files.clear()
+            uow.repository.update(id_, status=status, error=error)
+            uow.commit()
 
 
 class DocReadAllQuery(BaseModel, GenericQuery[list[VectorChromaDocument]]):
     id_: int
     limit: int | None
     offset: int | None
+    include_embeddings: bool = False
 
 
 @Mediator.handler
@@ -117,16 +351,16 @@ class DocReadAllHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow],
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
 
     async def handle(self, request: DocReadAllQuery) -> list[VectorChromaDocument]:
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
@@ -135,9 +369,65 @@ class DocReadAllHandler:
         async_doc_repo = self.async_document_repository(collection)  # type: ignore
         return await async_doc_repo.read_all(
             limit=request.limit,
-            offset=request.offset
+            offset=request.offset,
+            include_embeddings=request.include_embeddings
+        )
+
+
+class DocExportQuery(BaseModel, GenericQuery[AsyncIterator[bytes]]):
+    id_: int
+    offset: int = 0
+    limit: int | None = None
+    page_size: int = 1000
+    include_embeddings: bool = False
+
+
+@Mediator.handler
+class DocExportHandler:
+    """
+    Streams the documents of the collection as NDJSON, page by page, so collections of any size are exported
+    with constant memory.
+    """
+
+    @inject
+    def __init__(
+            self,
+            async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
+                Container.async_vector_collection_repository],
+            async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
+                Container.async_vector_document_repository],
+            async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+    ):
+        self.async_vector_collection_repository = async_vector_collection_repository
+        self.async_document_repository = async_vector_document_repository
+        self.async_vector_db_client = async_vector_db_client
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+
+    async def handle(self, request: DocExportQuery) -> AsyncIterator[bytes]:
+        # the collection is resolved before streaming, so lookup errors are still returned as error responses
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
+
+            async_vec_db_client = await self.async_vector_db_client.async_init()
+            vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
+            collection = await vector_collection_repo.read(vec_col_obj.name)
+
+        async_doc_repo = self.async_document_repository(collection)  # type: ignore
+        pages = async_doc_repo.read_pages(
+            page_size=request.page_size,
+            offset=request.offset,
+            limit=request.limit,
+            include_embeddings=request.include_embeddings
         )
 
+        return self.stream(pages)
+
+    @staticmethod
+    async def stream(pages: AsyncIterator) -> AsyncIterator[bytes]:
+        async for res in pages:
+            yield get_result_to_ndjson(res)
+
 
 class DocCountQuery(BaseModel, GenericQuery[int]):
     id_: int
@@ -153,16 +443,16 @@ class DocCountHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow]
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
 
     async def handle(self, request: DocCountQuery) -> int:
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
@@ -174,6 +464,7 @@ class DocCountHandler:
 
 class DocPeekQuery(BaseModel, GenericQuery[list[VectorChromaDocument]]):
     id_: int
+    include_embeddings: bool = False
 
 
 @Mediator.handler
@@ -186,23 +477,23 @@ class DocPeekHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow]
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
 
     async def handle(self, request: DocPeekQuery) -> list[VectorChromaDocument]:
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
             collection = await vector_collection_repo.read(vec_col_obj.name)
 
         async_doc_repo = self.async_document_repository(collection)  # type: ignore
-        return await async_doc_repo.peek()
+        return await async_doc_repo.peek(include_embeddings=request.include_embeddings)
 
 
 class DocDeleteCommand(BaseModel, GenericQuery[None]):
@@ -220,23 +511,35 @@ class DocDeleteHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow]
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            lexical_index: AbstractLexicalIndex = Provide[Container.lexical_index],
+            async_document_manifest_uow: AsyncAbstractUoW = Provide[Container.async_document_manifest_uow],
+            chat_pipeline_cache: ChatPipelineCache = Provide[Container.chat_pipeline_cache]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.lexical_index = lexical_index
+        self.async_document_manifest_uow = async_document_manifest_uow
+        self.chat_pipeline_cache = chat_pipeline_cache
 
     async def handle(self, request: DocDeleteCommand) -> None:
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
             collection = await vector_collection_repo.read(vec_col_obj.name)
 
-        async_doc_repo = self.async_document_repository(collection)  # type: ignore
-        return await async_doc_repo.delete(request.doc_name)
+        async_doc_repo = self.async_document_repository(collection, lexical_index=self.lexical_index)  # type: ignore
+        await async_doc_repo.delete(request.doc_name)
+        self.chat_pipeline_cache.invalidate('vec_col', vec_col_obj.id)
+
+        async with self.async_document_manifest_uow as uow:
+            for entry in await uow.repository.read_all(vec_col_id=vec_col_obj.id, name=request.doc_name):
+                await uow.repository.delete(entry.id)
+            await uow.commit()
 
 
 class DocQuery(BaseModel, GenericQuery[list[VectorChromaDocument]]):
@@ -244,6 +547,8 @@ class DocQuery(BaseModel, GenericQuery[list[VectorChromaDocument]]):
     query_string: str
     doc_names: list[str] | None
     n_results: int | None
+    include_embeddings: bool = False
+    mode: RetrievalMode = RetrievalMode.DENSE
 
 
 @Mediator.handler
@@ -256,29 +561,76 @@ class DocQueryHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow],
-            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder]
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder],
+            lexical_index: AbstractLexicalIndex = Provide[Container.lexical_index]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
         self.embedding_model_builder_service = embedding_model_builder_service
+        self.lexical_index = lexical_index
 
     async def handle(self, request: DocQuery) -> list[VectorChromaDocument]:
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
-            ef = self.embedding_model_builder_service.build(vec_col_obj.embedding_model)
+            ef = self.embedding_model_builder_service.build_query_cached(vec_col_obj.embedding_model)
             collection = await vector_collection_repo.read(name=vec_col_obj.name, embedding_function=ef)
 
-        async_doc_repo = self.async_document_repository(collection)  # type: ignore
+        async_doc_repo = self.async_document_repository(
+            collection,
+            embedding_function=ef,
+            lexical_index=self.lexical_index
+        )  # type: ignore
         return await async_doc_repo.query(
             query_string=request.query_string,
             doc_names=request.doc_names,
-            n_results=request.n_results
+            n_results=request.n_results,
+            include_embeddings=request.include_embeddings,
+            mode=request.mode
+        )
+
+
+class DocQueryWarmCommand(BaseModel, GenericQuery[int]):
+    id_: int
+    queries: list[str]
+
+
+@Mediator.handler
+class DocQueryWarmHandler:
+    """
+    Embeds frequent questions into the query embedding cache ahead of the queries.
+    """
+
+    @inject
+    def __init__(
+            self,
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            embedding_model_builder_service: EmbeddingModelBuilder = Provide[Container.embedding_model_builder],
+            query_embedding_cache: QueryEmbeddingCache = Provide[Container.query_embedding_cache]
+    ):
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.embedding_model_builder_service = embedding_model_builder_service
+        self.query_embedding_cache = query_embedding_cache
+
+    async def handle(self, request: DocQueryWarmCommand) -> int:
+        """
+        :returns: int - Amount of embedded queries, queries already in the cache are skipped.
+        """
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj: VectorCollection = await uow.repository.read(request.id_)
+            embedding_model = vec_col_obj.embedding_model
+
+        ef = self.embedding_model_builder_service.build(embedding_model)
+        return await asyncio.to_thread(
+            self.query_embedding_cache.warm,
+            embedding_model.name.value,
+            request.queries,
+            ef
         )
 
 
@@ -296,20 +648,73 @@ class DocListDocsHandler:
             async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
                 Container.async_vector_document_repository],
             async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
-            domain_vector_collection_uow: AbstractUoW = Provide[Container.domain_vector_collection_uow],
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            async_document_manifest_uow: AsyncAbstractUoW = Provide[Container.async_document_manifest_uow],
+            async_ingestion_job_uow: AsyncAbstractUoW = Provide[Container.async_ingestion_job_uow]
     ):
         self.async_vector_collection_repository = async_vector_collection_repository
         self.async_document_repository = async_vector_document_repository
         self.async_vector_db_client = async_vector_db_client
-        self.domain_vector_collection_uow = domain_vector_collection_uow
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.async_document_manifest_uow = async_document_manifest_uow
+        self.async_ingestion_job_uow = async_ingestion_job_uow
 
     async def handle(self, request: DocListDocsQuery) -> list[str]:
-        with self.domain_vector_collection_uow as uow:
-            vec_col_obj = uow.repository.read(request.id_)
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
 
             async_vec_db_client = await self.async_vector_db_client.async_init()
             vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
             collection = await vector_collection_repo.read(vec_col_obj.name)
 
         async_doc_repo = self.async_document_repository(collection)  # type: ignore
-        return await async_doc_repo.list_documents()
+        entries = await read_manifest(
+            self.async_document_manifest_uow,
+            vec_col_obj,
+            async_doc_repo,
+            self.async_ingestion_job_uow
+        )
+
+        return [entry.name for entry in entries]
+
+
+class DocManifestQuery(BaseModel, GenericQuery[Sequence[DocumentManifest]]):
+    id_: int
+
+
+@Mediator.handler
+class DocManifestHandler:
+    @inject
+    def __init__(
+            self,
+            async_vector_collection_repository: Type[AbstractAsyncVectorCollectionRepository] = Provide[
+                Container.async_vector_collection_repository],
+            async_vector_document_repository: Type[AbstractAsyncDocumentRepository] = Provide[
+                Container.async_vector_document_repository],
+            async_vector_db_client: AbstractAsyncClient = Provide[Container.async_vector_db_client],
+            async_domain_vector_collection_uow: AsyncAbstractUoW = Provide[Container.async_domain_vector_collection_uow],
+            async_document_manifest_uow: AsyncAbstractUoW = Provide[Container.async_document_manifest_uow],
+            async_ingestion_job_uow: AsyncAbstractUoW = Provide[Container.async_ingestion_job_uow]
+    ):
+        self.async_vector_collection_repository = async_vector_collection_repository
+        self.async_document_repository = async_vector_document_repository
+        self.async_vector_db_client = async_vector_db_client
+        self.async_domain_vector_collection_uow = async_domain_vector_collection_uow
+        self.async_document_manifest_uow = async_document_manifest_uow
+        self.async_ingestion_job_uow = async_ingestion_job_uow
+
+    async def handle(self, request: DocManifestQuery) -> Sequence[DocumentManifest]:
+        async with self.async_domain_vector_collection_uow as uow:
+            vec_col_obj = await uow.repository.read(request.id_)
+
+            async_vec_db_client = await self.async_vector_db_client.async_init()
+            vector_collection_repo = self.async_vector_collection_repository(async_vec_db_client)  # type: ignore
+            collection = await vector_collection_repo.read(vec_col_obj.name)
+
+        async_doc_repo = self.async_document_repository(collection)  # type: ignore
+        return await read_manifest(
+            self.async_document_manifest_uow,
+            vec_col_obj,
+            async_doc_repo,
+            self.async_ingestion_job_uow
+        )
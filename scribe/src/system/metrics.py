@@ -0,0 +1,117 @@
+"""
+Prometheus metrics of the scribe internals. Metrics are registered in the default prometheus_client registry,
+so they are exposed on /metrics alongside the HTTP metrics of the prometheus_fastapi_instrumentator.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# embedding model registry
+EMBEDDING_MODEL_LOADS = Counter(
+    'scribe_embedding_model_loads',
+    'Local embedding models loaded into memory.',
+    ['model', 'device']
+)
+EMBEDDING_MODEL_EVICTIONS = Counter(
+    'scribe_embedding_model_evictions',
+    'Local embedding models evicted from memory.',
+    ['model', 'device']
+)
+EMBEDDING_MODEL_HITS = Counter(
+    'scribe_embedding_model_hits',
+    'Requests served by an already loaded local embedding model.',
+    ['model', 'device']
+)
+EMBEDDING_MODEL_MEMORY = Gauge(
+    'scribe_embedding_model_memory_bytes',
+    'Estimated memory occupied by the loaded local embedding models.'
+)
+
+# embedding cache
+EMBEDDING_CACHE_HITS = Counter(
+    'scribe_embedding_cache_hits',
+    'Document embeddings served from the embedding cache.',
+    ['model']
+)
+EMBEDDING_CACHE_MISSES = Counter(
+    'scribe_embedding_cache_misses',
+    'Document embeddings missing from the embedding cache.',
+    ['model']
+)
+EMBEDDING_CACHE_EVICTIONS = Counter(
+    'scribe_embedding_cache_evictions',
+    'Document embeddings evicted from the embedding cache.',
+    ['model']
+)
+EMBEDDING_CACHE_SIZE = Gauge(
+    'scribe_embedding_cache_size_bytes',
+    'Size of the embeddings stored in the embedding cache.'
+)
+QUERY_EMBEDDING_CACHE_HITS = Counter(
+    'scribe_query_embedding_cache_hits',
+    'Query embeddings served from the query embedding cache.',
+    ['model']
+)
+QUERY_EMBEDDING_CACHE_MISSES = Counter(
+    'scribe_query_embedding_cache_misses',
+    'Query embeddings missing from the query embedding cache.',
+    ['model']
+)
+
+# retrieval
+RETRIEVAL_STAGE_SECONDS = Histogram(
+    'scribe_retrieval_stage_seconds',
+    'Duration of the chat retrieval stages.',
+    ['stage']
+)
+
+# base chat turns
+CHAT_STAGE_SECONDS = Histogram(
+    'scribe_chat_stage_seconds',
+    'Duration of the base chat turn stages, first_token is counted from the start of the turn.',
+    ['stage', 'chat_model', 'embedding_model'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+CHAT_TOKENS_PER_SECOND = Histogram(
+    'scribe_chat_tokens_per_second',
+    'Generation rate of the base chat answers after the first token.',
+    ['chat_model', 'embedding_model'],
+    buckets=(5, 10, 20, 40, 60, 80, 120, 160, 240, 320)
+)
+
+# ingestion
+INGESTION_BYTES_PARSED = Counter(
+    'scribe_ingestion_bytes_parsed',
+    'Bytes of the files parsed by the load services.',
+    ['service']
+)
+INGESTION_ELEMENTS = Counter(
+    'scribe_ingestion_elements',
+    'Elements parsed by the load services, unstructured elements (chunks with a chunking strategy) or pdf pages.',
+    ['service']
+)
+INGESTION_CHUNKS = Counter(
+    'scribe_ingestion_chunks',
+    'Chunks produced by the load services.',
+    ['service']
+)
+INGESTION_STAGE_SECONDS = Histogram(
+    'scribe_ingestion_stage_seconds',
+    'Duration of the ingestion stages per document, page range or batch, insert is the chroma add request.',
+    ['service', 'stage'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+INGESTION_EMBEDDING_BATCHES = Counter(
+    'scribe_ingestion_embedding_batches',
+    'Batches embedded during the ingestion.',
+    ['service']
+)
+INGESTION_VECTORS_EMBEDDED = Counter(
+    'scribe_ingestion_vectors_embedded',
+    'Vectors embedded during the ingestion.',
+    ['service']
+)
+INGESTION_VECTORS_PER_SECOND = Histogram(
+    'scribe_ingestion_vectors_per_second',
+    'Embedding throughput of the ingestion batches.',
+    ['service'],
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
@@ -0,0 +1,109 @@
+"""
+Async pipelines of stages connected by bounded queues.
+"""
+import asyncio
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+Stage = Callable[[Any], Awaitable[Any]]
+
+_DONE = object()
+
+
+async def aiter_items[T](items: Iterable[T] | AsyncIterable[T]) -> AsyncIterator[T]:
+    """
+    :returns: AsyncIterator - Items of either a sync or an async iterable.
+    """
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def abatched[T](items: AsyncIterable[T], size: int) -> AsyncIterator[list[T]]:
+    """
+    Groups items into lists of the size, the last one may be shorter.
+    """
+    batch: list[T] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+class AsyncPipeline:
+    """
+    Passes items of the source through a chain of stages. Every stage runs in its own workers and is connected
+    to the next one by a bounded queue, so a stage waits while the next one is behind. The amount of items in
+    flight is bounded by the queue sizes and the workers, instead of the size of the source.
+
+    The first failed stage stops the whole pipeline and its exception is raised from run().
+    """
+
+    def __init__(self, source: AsyncIterable, maxsize: int = 2):
+        """
+        :param maxsize: Size of the queue in front of every stage.
+        """
+        self.source = source
+        self.maxsize = maxsize
+        self.stages: list[tuple[Stage, int]] = []
+
+    def pipe(self, stage: Stage, workers: int = 1) -> 'AsyncPipeline':
+        """
+        :param stage: Receives an item of the previous stage, the result is passed to the next one.
+        :param workers: Amount of items the stage processes concurrently.
+        """
+        self.stages.append((stage, workers))
+        return self
+
+    async def run(self) -> None:
+        if not self.stages:
+            async for _ in self.source:
+                pass
+            return None
+
+        queues = [asyncio.Queue(self.maxsize) for _ in self.stages]
+
+        async def feed() -> None:
+            async for item in self.source:
+                await queues[0].put(item)
+
+            for _ in range(self.stages[0][1]):
+                await queues[0].put(_DONE)
+
+        async def work(stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue | None) -> None:
+            while (item := await inbox.get()) is not _DONE:
+                result = await stage(item)
+                if outbox is not None:
+                    await outbox.put(result)
+
+        async def close(i: int, stage_tasks: list[asyncio.Task]) -> None:
+            await asyncio.gather(*stage_tasks)
+
+            if i + 1 < len(queues):
+                for _ in range(self.stages[i + 1][1]):
+                    await queues[i + 1].put(_DONE)
+
+        tasks = [asyncio.create_task(feed())]
+        for i, (stage, workers) in enumerate(self.stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            stage_tasks = [asyncio.create_task(work(stage, queues[i], outbox)) for _ in range(workers)]
+            tasks.extend(stage_tasks)
+            tasks.append(asyncio.create_task(close(i, stage_tasks)))
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return None
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+
+class KillableProcessPool(Executor):
+    """
+    Process pool whose hung tasks can be stopped. A ProcessPoolExecutor can't cancel a running task, so waiting
+    for it with a timeout only stops the waiting, and the worker stays busy with the task. On a timeout the workers
+    are terminated and the pool is replaced, tasks of the other callers broken by the restart are resubmitted
+    to the new pool.
+
+    Relies on ProcessPoolExecutor._processes to terminate the workers.
+    """
+
+    def __init__(self, max_workers: int, mp_context: Any = None):
+        self.max_workers = max_workers
+        self.mp_context = mp_context
+
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._lock:
+            return self._pool.submit(fn, *args, **kwargs)
+
+    async def run(self, timeout: Optional[float], fn: Callable, *args) -> Any:
+        """
+        Runs the function in a worker, the worker is killed if it isn't done in timeout seconds.
+
+        :raises asyncio.TimeoutError:
+        """
+        while True:
+            try:
+                # the pool is swapped under the lock before it's shut down, so the current one accepts the task
+                with self._lock:
+                    pool = self._pool
+                    future = pool.submit(fn, *args)
+
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                self.restart(pool)
+                raise
+            except BrokenProcessPool:
+                # a crashed worker breaks the current pool, the task is resubmitted if the pool was restarted
+                # for a task of another caller
+                if self.restart(pool):
+                    raise
+
+    def restart(self, pool: ProcessPoolExecutor) -> bool:
+        """
+        Terminates the workers of the pool and replaces it, if it's still the current one.
+
+        :returns: bool - True if the pool was restarted by this call.
+        """
+        with self._lock:
+            if pool is not self._pool:
+                return False
+            self._pool = self._new_pool()
+
+        logging.warning('Terminating the parsing workers, a task has timed out or a worker has crashed.')
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        return True
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            pool = self._pool
+        pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.mp_context)
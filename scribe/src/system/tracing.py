@@ -0,0 +1,73 @@
+"""
+Ingestion stage instrumentation. Stages are timed into the prometheus metrics and, if an exporter is configured,
+traced as OpenTelemetry spans. Without a configured exporter the tracer is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+from src.enums import TraceExporter
+from src.system.metrics import (
+    INGESTION_STAGE_SECONDS,
+    INGESTION_EMBEDDING_BATCHES,
+    INGESTION_VECTORS_EMBEDDED,
+    INGESTION_VECTORS_PER_SECOND
+)
+
+tracer = trace.get_tracer('scribe')
+
+
+def setup_tracing(
+        exporter: TraceExporter,
+        file_path: Optional[str] = None,
+        endpoint: Optional[str] = None
+) -> TracerProvider | None:
+    """
+    Sets the global tracer provider.
+
+    :param file_path: File the spans are appended to as json lines, for the file exporter.
+    :param endpoint: OTLP gRPC endpoint of the collector, for the otlp exporter.
+    :returns: TracerProvider - to be shut down on exit, None if tracing is disabled.
+    """
+    match exporter:
+        case TraceExporter.NONE:
+            return None
+        case TraceExporter.FILE:
+            span_exporter = ConsoleSpanExporter(
+                out=open(file_path, 'a'),
+                formatter=lambda span: span.to_json(indent=None) + '\n'
+            )
+        case TraceExporter.OTLP:
+            # grpc exporter is shipped with chromadb's telemetry
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            span_exporter = OTLPSpanExporter(endpoint=endpoint)
+
+    provider = TracerProvider(resource=Resource.create({'service.name': 'scribe'}))
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+
+    return provider
+
+
+@contextmanager
+def ingestion_stage(service: str, stage: str, **attributes) -> Iterator[trace.Span]:
+    """
+    Times the stage into the scribe_ingestion_stage_seconds within a '{service}.{stage}' span.
+    Failed stages are recorded on the span only.
+    """
+    start = time.perf_counter()
+    with tracer.start_as_current_span(f'{service}.{stage}', attributes=attributes) as span:
+        yield span
+    INGESTION_STAGE_SECONDS.labels(service, stage).observe(time.perf_counter() - start)
+
+
+def observe_embedding_batch(service: str, vectors: int, seconds: float) -> None:
+    INGESTION_EMBEDDING_BATCHES.labels(service).inc()
+    INGESTION_VECTORS_EMBEDDED.labels(service).inc(vectors)
+    if seconds > 0:
+        INGESTION_VECTORS_PER_SECOND.labels(service).observe(vectors / seconds)
@@ -1,4 +1,8 @@
+import atexit
 import json
+import os
+import shutil
+import tempfile
 from enum import Enum
 
 
@@ -12,3 +16,13 @@ def JsonEnum(name: str, path: str):
 
     return Enum(name, json_.get(name))
 
+
+def temporary_db_path() -> str:
+    """
+    :returns: str - Path of a new sqlite database in a temporary directory, the directory with the database
+    and its WAL files is removed on the process exit.
+    """
+    dir_ = tempfile.mkdtemp(prefix='scribe-')
+    atexit.register(shutil.rmtree, dir_, ignore_errors=True)
+
+    return os.path.join(dir_, 'scribe.db')
@@ -62,6 +62,31 @@ def test_base_chat_updates(client):
     assert res.status_code == 200
 
 
+def test_base_chat_update_keeps_answer_cache_if_not_provided(client):
+    client.put(
+        '/base-chat/1',
+        json={
+            "name": "string",
+            "desc": "stringer",
+            "chat_model_id": 1,
+            "answer_cache": True
+        }
+    )
+
+    res = client.put(
+        '/base-chat/1',
+        json={
+            "name": "string",
+            "desc": "string",
+            "chat_model_id": 1
+        }
+    )
+
+    assert res.json()['answer_cache'] is True
+    assert res.json()['desc'] == 'string'
+    assert res.status_code == 200
+
+
 def test_base_chat_deletes(client):
     res = client.delete(
         '/base-chat/1'
@@ -0,0 +1,55 @@
+import os
+import sqlite3
+
+import pytest
+from dependency_injector.providers import Object
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import clear_mappers
+
+
+@pytest.fixture(scope='module')
+def baseline_client(tmp_path_factory):
+    os.environ['SCRIBE_DB'] = 'dev'
+
+    # importing here to rewrite env
+    from src.api.app import app
+    from src.bootstrap import bootstrap
+    from src.di_container import Container
+
+    # base_chat table created before the answer_cache column
+    db_path = str(tmp_path_factory.mktemp('baseline') / 'scribe.db')
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(
+            'CREATE TABLE base_chat (id INTEGER NOT NULL, name VARCHAR NOT NULL, "desc" VARCHAR NOT NULL, '
+            'chat_model_id INTEGER NOT NULL, system_prompt_id INTEGER, vec_col_id INTEGER, datetime DATETIME, '
+            'PRIMARY KEY (id))'
+        )
+        connection.execute(
+            "INSERT INTO base_chat (name, \"desc\", chat_model_id, datetime) "
+            "VALUES ('baseline', 'baseline', 1, '2024-01-01 00:00:00')"
+        )
+
+    clear_mappers()
+    with Container.db_name.override(Object(db_path)):
+        client = TestClient(app)
+        bootstrap()
+        yield client
+
+    clear_mappers()
+
+
+def test_app_adds_answer_cache_column_to_baseline_base_chat_table(baseline_client):
+    res = baseline_client.get('/base-chat/1')
+
+    assert res.status_code == 200
+    assert res.json()['answer_cache'] is False
+
+
+def test_app_updates_answer_cache_of_baseline_base_chat(baseline_client):
+    res = baseline_client.put(
+        '/base-chat/1',
+        json={'name': 'baseline', 'desc': 'baseline', 'chat_model_id': 1, 'answer_cache': True}
+    )
+
+    assert res.status_code == 200
+    assert res.json()['answer_cache'] is True
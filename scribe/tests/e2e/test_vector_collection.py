@@ -40,6 +40,42 @@ def test_vec_col_read_all(client, fake_chdb):
     assert res.status_code == 200
 
 
+def test_vec_col_exports_and_imports(client, fake_chdb):
+    # archives carry the embedding model
+    client.post(
+        url='/embed-model/',
+        json={
+            "name": "all-MiniLM-L6-v2",
+            "device": "cpu",
+            "api_key_credential_id": 0
+        }
+    )
+    archive = client.get('/vec-col/1/export')
+
+    assert archive.status_code == 200
+    assert archive.headers['content-type'] == 'application/x-tar'
+
+    res = client.post(
+        '/vec-col/import',
+        data={'embedding_model_id': 1, 'name': 'imported'},
+        files={'file': ('vec-col-1.tar', archive.content)}
+    )
+
+    assert res.status_code == 201
+    assert res.json()['name'] == 'imported'
+    assert client.delete(f"/vec-col/{res.json()['id']}").status_code == 204
+
+
+def test_vec_col_import_rejects_malformed_archive(client, fake_chdb):
+    res = client.post(
+        '/vec-col/import',
+        data={'embedding_model_id': 1},
+        files={'file': ('fake.tar', b'not an archive')}
+    )
+
+    assert res.status_code == 422
+
+
 def test_vec_col_deletes(client, fake_chdb):
     res = client.delete(
         '/vec-col/1'
@@ -1,7 +1,21 @@
+import json
+import time
 from io import BytesIO
 from .conftest import client, fake_chdb
 
 
+def wait_for_job(client, job_id: int, timeout: float = 120) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(url=f'/ingestion-job/{job_id}').json()
+        if job['status'] not in ['pending', 'running']:
+            return job
+
+        time.sleep(0.5)
+
+    raise TimeoutError(f'Ingestion job {job_id} is not finished in {timeout} seconds.')
+
+
 def test_vec_doc_add(client, fake_chdb):
     # vec-doc depends on embed-model, doc-proc-cnf and vec-col
     client.post(
@@ -38,7 +52,42 @@ def test_vec_doc_add(client, fake_chdb):
         files=dict()
     )
 
-    assert res.status_code == 201
+    assert res.status_code == 202
+    assert res.json()['status'] == 'pending'
+
+    # the documents are ingested in the background
+    job = wait_for_job(client, res.json()['id'])
+
+    assert job['status'] == 'completed'
+    assert job['chunks_parsed'] > 0
+    assert job['chunks_parsed'] == job['chunks_embedded'] == job['chunks_stored']
+
+
+def test_ingestion_job_read_all(client, fake_chdb):
+    res = client.get(
+        url='/ingestion-job/',
+        params={'status': 'completed'}
+    )
+
+    assert res.status_code == 200
+    assert len(res.json()) == 1
+
+
+def test_ingestion_job_cancel_finished_job_does_not_change_it(client, fake_chdb):
+    res = client.post(
+        url='/ingestion-job/1/cancel'
+    )
+
+    assert res.status_code == 200
+    assert res.json()['status'] == 'completed'
+
+
+def test_ingestion_job_read_nonexistent(client, fake_chdb):
+    res = client.get(
+        url='/ingestion-job/1000'
+    )
+
+    assert res.status_code == 404
 
 
 def test_vec_doc_list_docs(client, fake_chdb):
@@ -50,6 +99,16 @@ def test_vec_doc_list_docs(client, fake_chdb):
     assert 'https://en.wikipedia.org/wiki/Assembly' == res.json()[0]
 
 
+def test_vec_doc_manifest(client, fake_chdb):
+    res = client.get(
+        url='/vec-doc/1/manifest'
+    )
+
+    assert res.status_code == 200
+    assert res.json()[0]['name'] == 'https://en.wikipedia.org/wiki/Assembly'
+    assert res.json()[0]['chunks'] == client.get(url='/vec-doc/1/count').json()
+
+
 def test_vec_doc_read_all(client, fake_chdb):
     res = client.get(
         url='/vec-doc/1'
@@ -59,6 +118,18 @@ def test_vec_doc_read_all(client, fake_chdb):
     assert len(res.json()) > 0
 
 
+def test_vec_doc_export(client, fake_chdb):
+    res = client.get(
+        url='/vec-doc/1/export',
+        params={'page_size': 2, 'include_embeddings': True}
+    )
+
+    assert res.status_code == 200
+    lines = res.text.splitlines()
+    assert len(lines) == client.get(url='/vec-doc/1/count').json()
+    assert {'id', 'document', 'metadata', 'embedding'} == json.loads(lines[0]).keys()
+
+
 def test_vec_doc_peek(client, fake_chdb):
     res = client.get(
         url='/vec-doc/1/peek'
@@ -66,6 +137,17 @@ def test_vec_doc_peek(client, fake_chdb):
 
     assert res.status_code == 200
     assert len(res.json()) == 3
+    assert all(doc['embedding'] is None for doc in res.json())
+
+
+def test_vec_doc_peek_includes_embeddings_on_request(client, fake_chdb):
+    res = client.get(
+        url='/vec-doc/1/peek',
+        params={'include_embeddings': True}
+    )
+
+    assert res.status_code == 200
+    assert all(doc['embedding'] is not None for doc in res.json())
 
 
 def test_vec_doc_query(client, fake_chdb):
@@ -82,6 +164,19 @@ def test_vec_doc_query(client, fake_chdb):
     assert len(res.json()) == 1
 
 
+def test_vec_doc_query_warm(client, fake_chdb):
+    res = client.post(
+        url='/vec-doc/1/query/warm',
+        json={
+            'queries': ['string', 'another string', '  another   string ']
+        }
+    )
+
+    # 'string' is already cached by the query above
+    assert res.status_code == 200
+    assert res.json() == 1
+
+
 def test_vec_doc_delete(client, fake_chdb):
     res = client.request(
         method='DELETE',
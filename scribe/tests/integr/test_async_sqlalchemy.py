@@ -0,0 +1,167 @@
+"""
+Async repository and UoW on top of the AsyncSession, sharing the dev db with the sync engine.
+"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from faker import Faker
+from sqlalchemy.orm import clear_mappers
+
+from src.adapters.orm_models import map_sqlalchemy_models
+from src.adapters.repository import AsyncSqlAlchemyRepository, ItemNotFoundError, SqlAlchemyRepository
+from src.adapters.uow import AsyncSqlAlchemyUoW, SqlAlchemyUoW
+from src.domain.models import FakeModel, DocumentManifest, IngestionJob
+from src.enums import DocProcType, JobStatus
+from src.handlers.vector_document import read_manifest
+
+
+@pytest.fixture(scope='module')
+def container():
+    os.environ['SCRIBE_DB'] = 'dev'
+
+    from src.di_container import Container  # importing container here to rewrite envs
+    container = Container()
+    clear_mappers()
+    map_sqlalchemy_models(container.registry())
+    container.registry().metadata.create_all(container.engine())
+
+    yield container
+
+    clear_mappers()
+
+
+@pytest.fixture
+def faker():
+    return Faker()
+
+
+@pytest.mark.asyncio
+async def test_async_uow_commit_is_visible_to_the_sync_session(container, faker):
+    uow = AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[FakeModel], container.async_session())
+
+    async with uow:
+        fake = await uow.repository.add(FakeModel(True, faker.military_ship()))
+        await uow.commit()
+
+    with container.session() as session:
+        assert session.get(FakeModel, fake.id).spaceship == fake.spaceship
+
+
+@pytest.mark.asyncio
+async def test_async_uow_exit_discards_not_committed_changes(container, faker):
+    async with AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[FakeModel], container.async_session()) as uow:
+        count = await uow.repository.count()
+        await uow.repository.add(FakeModel(True, faker.military_ship()))
+
+    async with AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[FakeModel], container.async_session()) as uow:
+        assert await uow.repository.count() == count
+
+
+@pytest.mark.asyncio
+async def test_async_repo_updates_only_existing_attributes(container, faker):
+    async with AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[FakeModel], container.async_session()) as uow:
+        fake = await uow.repository.add(FakeModel(False, faker.military_ship()))
+        upd_fake = await uow.repository.update(fake.id, age=0, spaceship='jhon-11')
+
+        assert upd_fake is fake
+        assert fake.spaceship == 'jhon-11'
+        with pytest.raises(AttributeError):
+            fake.age
+
+
+@pytest.mark.asyncio
+async def test_async_uow_write_waits_for_the_sync_session_write(container, faker):
+    async def add() -> FakeModel:
+        async with AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[FakeModel], container.async_session()) as uow:
+            fake = await uow.repository.add(FakeModel(True, faker.military_ship()))
+            await uow.commit()
+
+        return fake
+
+    with SqlAlchemyUoW(SqlAlchemyRepository[FakeModel], container.session()) as uow:
+        uow.repository.add(FakeModel(True, faker.military_ship()))
+        # the sync write transaction holds the db lock, the async write is started meanwhile
+        task = asyncio.create_task(add())
+        await asyncio.sleep(0.2)
+        uow.commit()
+
+    fake = await task
+    with container.session() as session:
+        assert session.get(FakeModel, fake.id) is not None
+
+
+@pytest.mark.asyncio
+async def test_async_repo_read_raises_exception_if_a_nonexistent_id_is_provided(container):
+    async with AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[FakeModel], container.async_session()) as uow:
+        with pytest.raises(ItemNotFoundError):
+            await uow.repository.read(-1)
+
+
+class FakeDocumentRepository:
+    def __init__(self, stats: dict[str, tuple[int, int]]):
+        self.stats = stats
+        self.scans = 0
+
+    async def count(self) -> int:
+        return sum(chunks for chunks, _ in self.stats.values())
+
+    async def scan_documents(self) -> dict[str, tuple[int, int]]:
+        self.scans += 1
+        return dict(self.stats)
+
+
+@pytest.mark.asyncio
+async def test_read_manifest_rebuilds_only_stale_manifest(container):
+    vec_col = SimpleNamespace(id=1, embedding_model=SimpleNamespace(name=SimpleNamespace(value='fake')))
+    repo = FakeDocumentRepository({'a.pdf': (2, 20), 'https://fake.com': (1, 5)})
+
+    def uow():
+        return AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[DocumentManifest], container.async_session())
+
+    def job_uow():
+        return AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[IngestionJob], container.async_session())
+
+    entries = await read_manifest(uow(), vec_col, repo, job_uow())  # type: ignore
+    assert {(entry.name, entry.chunks, entry.size) for entry in entries} == {('a.pdf', 2, 20), ('https://fake.com', 1, 5)}
+
+    await read_manifest(uow(), vec_col, repo, job_uow())  # type: ignore
+    assert repo.scans == 1
+
+    repo.stats = {'a.pdf': (4, 30)}
+    entries = await read_manifest(uow(), vec_col, repo, job_uow())  # type: ignore
+    assert [(entry.name, entry.chunks, entry.size) for entry in entries] == [('a.pdf', 4, 30)]
+
+
+@pytest.mark.asyncio
+async def test_read_manifest_is_not_rebuilt_while_collection_is_ingested(container):
+    vec_col = SimpleNamespace(id=2, embedding_model=SimpleNamespace(name=SimpleNamespace(value='fake')))
+    repo = FakeDocumentRepository({'a.pdf': (2, 20)})
+
+    def uow():
+        return AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[DocumentManifest], container.async_session())
+
+    def job_uow():
+        return AsyncSqlAlchemyUoW(AsyncSqlAlchemyRepository[IngestionJob], container.async_session())
+
+    await read_manifest(uow(), vec_col, repo, job_uow())  # type: ignore
+
+    async with job_uow() as jobs:
+        job = await jobs.repository.add(IngestionJob(2, DocProcType.BASE, 1, None, []))
+        await jobs.repository.update(job.id, status=JobStatus.RUNNING)
+        await jobs.commit()
+
+    # chunks stored by the running job are not in the manifest yet
+    repo.stats['b.pdf'] = (3, 30)
+    entries = await read_manifest(uow(), vec_col, repo, job_uow())  # type: ignore
+    assert [entry.name for entry in entries] == ['a.pdf']
+    assert repo.scans == 1
+
+    async with job_uow() as jobs:
+        await jobs.repository.update(job.id, status=JobStatus.COMPLETED)
+        await jobs.commit()
+
+    entries = await read_manifest(uow(), vec_col, repo, job_uow())  # type: ignore
+    assert {entry.name for entry in entries} == {'a.pdf', 'b.pdf'}
+    assert repo.scans == 2
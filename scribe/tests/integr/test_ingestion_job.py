@@ -0,0 +1,74 @@
+"""
+Ingestion job lifecycle over the job queue and the in-memory db, the ingestion itself is faked.
+"""
+import asyncio
+import os
+import threading
+
+import pytest
+from sqlalchemy.orm import clear_mappers
+
+from src.adapters.job_queue import ThreadedAsyncJobQueue
+from src.adapters.orm_models import map_sqlalchemy_models
+from src.adapters.repository import SqlAlchemyRepository
+from src.adapters.uow import SqlAlchemyUoW
+from src.domain.models import IngestionJob, IngestionJobFile
+from src.enums import DocProcType, JobStatus
+from src.handlers.ingestion_job import IngestionJobResumeCommand, IngestionJobResumeHandler
+from src.handlers.vector_document import DocIngestCommand, DocIngestHandler
+
+
+@pytest.fixture(scope='module')
+def container():
+    os.environ['SCRIBE_DB'] = 'dev'
+
+    from src.di_container import Container  # importing container here to rewrite envs
+    container = Container()
+    clear_mappers()
+    map_sqlalchemy_models(container.registry())
+    container.registry().metadata.create_all(container.engine())
+
+    yield container
+
+    clear_mappers()
+
+
+def test_job_interrupted_by_shutdown_is_resumed(container):
+    def job_uow():
+        return SqlAlchemyUoW(SqlAlchemyRepository[IngestionJob], container.session())
+
+    with job_uow() as uow:
+        job = uow.repository.add(IngestionJob(1, DocProcType.BASE, 1, None, [IngestionJobFile('a.txt', b'a')]))
+        uow.commit()
+
+    started = threading.Event()
+
+    class SlowDocIngestHandler(DocIngestHandler):
+        async def ingest(self, *args):
+            started.set()
+            await asyncio.sleep(10)
+
+    queue = ThreadedAsyncJobQueue(workers=1)
+    handler = SlowDocIngestHandler(ingestion_job_uow=job_uow(), ingestion_job_queue=queue)
+    queue.start(lambda job_id: handler.handle(DocIngestCommand(job_id=job_id)))
+    queue.put(job.id)
+
+    assert started.wait(timeout=5)
+    queue.stop()
+
+    # the job keeps its files and is put back on the queue by the next start
+    with job_uow() as uow:
+        stopped_job = uow.repository.read(job.id)
+        assert stopped_job.status == JobStatus.RUNNING
+        assert len(stopped_job.files) == 1
+
+    resumed = []
+    next_queue = ThreadedAsyncJobQueue(workers=1)
+    next_queue.put = resumed.append
+    IngestionJobResumeHandler(ingestion_job_uow=job_uow(), ingestion_job_queue=next_queue).handle(
+        IngestionJobResumeCommand()
+    )
+
+    assert resumed == [job.id]
+    with job_uow() as uow:
+        assert uow.repository.read(job.id).status == JobStatus.PENDING
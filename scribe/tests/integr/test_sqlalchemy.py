@@ -195,6 +195,27 @@ def test_update_sqlalchemy_repo_does_not_updates_not_existing_attributes(fake_se
             fake.age
 
 
+def test_update_where_sqlalchemy_repo_method_updates_only_matching_records(fake_session, faker):
+    with fake_session as session:
+        fake = FakeModel(
+            False,
+            faker.military_ship()
+        )
+
+        session.add(fake)
+        session.flush()
+
+        repo = SqlAlchemyRepository[FakeModel](session)
+
+        # the record doesn't match, so it is not updated
+        assert repo.update_where(fake.id, {'portal_gun': True}, spaceship='alex-12') is False
+        assert repo.update_where(fake.id, {'portal_gun': False}, portal_gun=True) is True
+        assert repo.update_where(fake.id, {'portal_gun': False}, portal_gun=False) is False
+
+        assert fake.portal_gun is True
+        assert fake.spaceship != 'alex-12'
+
+
 def test_delete_sqlalchemy_repo_method(fake_session, faker):
     with fake_session as session:
         fake = FakeModel(
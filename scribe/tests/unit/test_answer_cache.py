@@ -0,0 +1,46 @@
+import pytest
+
+from src.adapters.answer_cache import SemanticAnswerCache
+
+
+async def fake_stream(events: list[str]):
+    for event in events:
+        yield event
+
+
+def test_answer_cache_matches_similar_queries_over_the_same_chunks():
+    cache = SemanticAnswerCache(thresh=0.95)
+    cache.put([1.0, 0.0], ['a', 'b'], ['event: response\ndata: aGk=\n\n'])
+
+    assert cache.get([0.99, 0.05], ['a', 'b']) == ['event: response\ndata: aGk=\n\n']
+    assert cache.get([0.5, 0.5], ['a', 'b']) is None  # dissimilar query
+    assert cache.get([1.0, 0.0], ['b', 'a']) is None  # other context
+
+
+def test_answer_cache_evicts_expired_and_least_recently_used_answers():
+    cache = SemanticAnswerCache(max_entries=2, ttl=3600)
+    cache.put([1.0, 0.0], ['a'], ['a'])
+    cache.put([0.0, 1.0], ['b'], ['b'])
+    cache.get([1.0, 0.0], ['a'])
+    cache.put([1.0, 1.0], ['c'], ['c'])
+
+    assert len(cache) == 2
+    assert cache.get([0.0, 1.0], ['b']) is None
+
+    cache.ttl = -1
+    assert cache.get([1.0, 0.0], ['a']) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_records_only_complete_streams():
+    cache = SemanticAnswerCache()
+
+    stream = cache.record(fake_stream(['docs', 'response']), [1.0], ['a'])
+    await anext(stream)
+    await stream.aclose()
+    assert len(cache) == 0
+
+    assert [event async for event in cache.record(fake_stream(['docs', 'response']), [1.0], ['a'])] \
+           == ['docs', 'response']
+    assert [event async for event in cache.replay(cache.get([1.0], ['a']))] == ['docs', 'response']
@@ -0,0 +1,27 @@
+import chromadb
+import pytest
+from chromadb.api.async_fastapi import AsyncFastAPI
+
+from src.adapters.async_vector_client import ChromaPooledAsyncVectorClient
+
+
+def test_pooled_client_relies_on_chromadb_0_5_internals():
+    # the pools are registered in AsyncFastAPI's private per event loop clients
+    assert chromadb.__version__.startswith('0.5.')
+    assert isinstance(AsyncFastAPI._clients, dict)
+
+
+@pytest.mark.asyncio
+async def test_pooled_client_pool_is_used_by_chroma_with_server_headers():
+    client = ChromaPooledAsyncVectorClient(headers={'X-Chroma-Token': 'fake'}, ssl_verify=False, max_connections=3)
+    client._register_pool()
+
+    # AsyncFastAPI picks the client of the running loop, it doesn't depend on the instance
+    http_client = AsyncFastAPI.__new__(AsyncFastAPI)._get_client()
+
+    assert http_client.headers['X-Chroma-Token'] == 'fake'
+    assert http_client.headers['Content-Type'] == 'application/json'
+    assert http_client._transport._pool._max_connections == 3
+
+    await client.close_pool()
+    assert http_client.is_closed
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.adapters.async_vector_client import AbstractAsyncClient
+from src.handlers.base_chat import BaseChatStreamHandler
+
+
+class FakeVectorClient(AbstractAsyncClient):
+    def __init__(self):
+        self.client = object()
+        self.inits = 0
+
+    async def async_init(self):
+        self.inits += 1
+        return self.client
+
+
+class FakeCollectionRepository:
+    def __init__(self, client):
+        self.client = client
+
+    async def read(self, name: str, embedding_function=None):
+        return SimpleNamespace(name=name, client=self.client)
+
+
+def fake_handler(vector_client: FakeVectorClient) -> BaseChatStreamHandler:
+    return BaseChatStreamHandler(
+        async_base_chat_uow=None,
+        chat_model_builder_service=None,
+        chat_prompt_template_builder=None,
+        chat_pipeline_cache=None,
+        answer_cache=None,
+        async_vector_collection_repository=FakeCollectionRepository,
+        async_vector_document_repository=None,
+        async_vector_db_client=vector_client,
+        embedding_model_builder_service=None,
+        lexical_index=None,
+        reranker=None
+    )  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_refresh_collection_reloads_collection_of_reconnected_client():
+    vector_client = FakeVectorClient()
+    handler = fake_handler(vector_client)
+    pipeline = SimpleNamespace(base_chat=SimpleNamespace(vec_col=SimpleNamespace(name='fake')), embedding_function=None)
+    await handler.load_collection(pipeline, vector_client.client, {})  # type: ignore
+    collection = pipeline.collection
+
+    timings = {}
+    await handler.refresh_collection(pipeline, timings)  # type: ignore
+
+    assert vector_client.inits == 1
+    assert pipeline.collection is collection
+    assert timings == {}
+
+    vector_client.client = object()
+    await handler.refresh_collection(pipeline, timings)  # type: ignore
+
+    assert vector_client.inits == 2
+    assert pipeline.collection is not collection
+    assert pipeline.collection.client is vector_client.client
+    assert 'collection_load' in timings
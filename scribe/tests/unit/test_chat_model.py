@@ -0,0 +1,58 @@
+import asyncio
+import json
+from base64 import b64decode
+
+import pytest
+
+from src.adapters.chat_model import LangchainChatModel, coalesce
+from src.enums import StreamFormat
+
+
+async def fake_chunks(chunks: list[str], delay: float = 0.0):
+    for chunk in chunks:
+        await asyncio.sleep(delay)
+        yield chunk
+
+
+def response_data(events: list[str]) -> list[str]:
+    return [event.split('data: ', 1)[1][:-2] for event in events if event.startswith('event: response')]
+
+
+@pytest.mark.asyncio
+async def test_langchain_async_generator_wrapper_encodes_negotiated_format():
+    chunks = ['line\n', 'café "quoted"']
+
+    events = [event async for event in LangchainChatModel.langchain_async_generator_wrapper(
+        fake_chunks(chunks), None, 7, StreamFormat.JSON
+    )]
+    assert events[0] == 'event: context\ndata: {"tokens":7}\n\n'
+    assert [json.loads(data) for data in response_data(events)] == chunks
+
+    events = [event async for event in LangchainChatModel.langchain_async_generator_wrapper(
+        fake_chunks(chunks), None
+    )]
+    assert [b64decode(data).decode() for data in response_data(events)] == chunks
+
+
+@pytest.mark.asyncio
+async def test_coalesce_joins_chunks_within_window_and_size():
+    joined = [chunk async for chunk in coalesce(fake_chunks(['a'] * 10), window=1, max_chars=4)]
+    assert joined == ['aaaa', 'aaaa', 'aa']
+
+    # a slow chunk doesn't hold the buffered ones back
+    joined = [chunk async for chunk in coalesce(fake_chunks(['a', 'b'], delay=0.05), window=0.01, max_chars=64)]
+    assert joined == ['a', 'b']
+
+
+@pytest.mark.asyncio
+async def test_coalesce_flushes_buffered_chunks_before_raising():
+    async def failing_chunks():
+        yield 'a'
+        raise ValueError
+
+    joined = []
+    with pytest.raises(ValueError):
+        async for chunk in coalesce(failing_chunks(), window=1, max_chars=64):
+            joined.append(chunk)
+
+    assert joined == ['a']
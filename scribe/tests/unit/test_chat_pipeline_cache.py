@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from src.adapters.chat_pipeline_cache import ChatPipeline, ChatPipelineCache
+
+
+def fake_pipeline(base_chat_id: int, system_prompt_id: int | None = None, vec_col_id: int | None = None) -> ChatPipeline:
+    base_chat = SimpleNamespace(
+        id=base_chat_id,
+        chat_model=SimpleNamespace(id=1, api_key_credential_id=1),
+        system_prompt=SimpleNamespace(id=system_prompt_id) if system_prompt_id else None,
+        vec_col=SimpleNamespace(
+            id=vec_col_id,
+            embedding_model=SimpleNamespace(id=1, api_key_credential_id=2)
+        ) if vec_col_id else None
+    )
+
+    return ChatPipeline(
+        base_chat=base_chat,  # type: ignore
+        chat_model=None,  # type: ignore
+        system_prompt=None,
+        dependencies=ChatPipeline.resolve_dependencies(base_chat)  # type: ignore
+    )
+
+
+def test_chat_pipeline_cache_invalidates_dependent_pipelines_only():
+    cache = ChatPipelineCache()
+    cache.put(1, cache.version, fake_pipeline(1, system_prompt_id=1))
+    cache.put(2, cache.version, fake_pipeline(2, vec_col_id=1))
+
+    cache.invalidate('system_prompt', 1)
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
+
+    cache.invalidate('api_key', 2)  # embedding model's api key
+    assert cache.get(2) is None
+
+
+def test_chat_pipeline_cache_skips_pipelines_resolved_from_stale_config():
+    cache = ChatPipelineCache()
+    version = cache.version
+
+    cache.invalidate('base_chat', 1)
+
+    assert not cache.put(1, version, fake_pipeline(1))
+    assert cache.get(1) is None
+
+
+def test_chat_pipeline_cache_evicts_least_recently_used():
+    cache = ChatPipelineCache(max_entries=2)
+    cache.put(1, cache.version, fake_pipeline(1))
+    cache.put(2, cache.version, fake_pipeline(2))
+
+    cache.get(1)
+    cache.put(3, cache.version, fake_pipeline(3))
+
+    assert len(cache) == 2
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
@@ -0,0 +1,51 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.enums import ChatModelName, EmbeddingModelName
+from src.handlers.base_chat import instrument_stream
+
+
+async def fake_stream(events: list[str]):
+    for event in events:
+        yield event
+
+
+def fake_pipeline() -> SimpleNamespace:
+    return SimpleNamespace(
+        base_chat=SimpleNamespace(
+            chat_model=SimpleNamespace(name=ChatModelName.GPT_4O_MINI),
+            vec_col=SimpleNamespace(embedding_model=SimpleNamespace(name=EmbeddingModelName.ALL_MINILM_L6_V2))
+        ),
+        count_tokens=lambda text: len(text.split())
+    )
+
+
+def stage_seconds(stage: str) -> float:
+    labels = dict(stage=stage, chat_model='gpt-4o-mini', embedding_model='all-MiniLM-L6-v2')
+    return REGISTRY.get_sample_value('scribe_chat_stage_seconds_sum', labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_instrument_stream_closes_stream_with_stats_event():
+    answer = ['one two ', 'three']
+    stream = instrument_stream(
+        fake_stream(['event: docs\ndata: []\n\n', 'event: response\ndata: b25l\n\n']),
+        fake_pipeline(),  # type: ignore
+        {'retrieve': 0.5},
+        start=0.0,
+        answer=answer
+    )
+    before = stage_seconds('retrieve')
+
+    events = [event async for event in stream]
+
+    assert len(events) == 3
+    assert events[-1].startswith('event: stats\ndata: ')
+    stats = json.loads(events[-1].split('data: ', 1)[1])
+    assert set(stats['stages']) == {'retrieve', 'first_token', 'stream'}
+    assert stats['tokens'] == 3
+    assert stats['answer_cache'] is False
+    assert stage_seconds('retrieve') == before + 0.5
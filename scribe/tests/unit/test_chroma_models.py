@@ -41,3 +41,9 @@ def test_vector_chroma_document_filters_metadata_fields(fake_doc):
 
 def test_rounds_chroma_document_distance_if_not_none(fake_doc):
     assert fake_doc.distance == 0.2334
+
+
+def test_vector_chroma_document_without_embedding():
+    doc = VectorChromaDocument('fake-id', 'fake-doc', metadata={})
+
+    assert doc.embedding is None
@@ -0,0 +1,95 @@
+import io
+import tarfile
+
+import numpy as np
+import pytest
+
+from src.adapters.collection_archive import CollectionArchiveError, CollectionArchiveReader, stream_archive
+
+
+async def fake_pages(sizes: list[int], dimensions: int = 3):
+    offset = 0
+    for size in sizes:
+        ids = [f'id-{i}' for i in range(offset, offset + size)]
+        yield {
+            'ids': ids,
+            'documents': [f'doc {id_}' for id_ in ids],
+            'metadatas': [{'filename': 'fake.txt', 'chunk_index': i} for i in range(offset, offset + size)],
+            'embeddings': [np.full(dimensions, i, dtype=np.float32) for i in range(offset, offset + size)]
+        }
+        offset += size
+
+
+async def write_archive(sizes: list[int], count: int, file) -> None:
+    async for chunk in stream_archive(fake_pages(sizes), count, 'fake', 'all-MiniLM-L6-v2', 'cosine'):
+        file.write(chunk)
+
+
+@pytest.mark.asyncio
+async def test_collection_archive_round_trip_maps_embeddings(tmp_path):
+    path = tmp_path / 'fake.tar'
+    with open(path, 'wb') as file:
+        await write_archive([4, 4, 1], 9, file)
+
+    with CollectionArchiveReader(str(path)) as reader:
+        assert (reader.manifest.count, reader.manifest.dimensions) == (9, 3)
+        assert isinstance(reader.embeddings, np.memmap)
+
+        records = list(reader.records())
+        assert [record.id_ for record in records] == [f'id-{i}' for i in range(9)]
+        assert records[5].metadata == {'filename': 'fake.txt', 'chunk_index': 5}
+        np.testing.assert_array_equal(records[5].embedding, [5, 5, 5])
+
+
+@pytest.mark.asyncio
+async def test_collection_archive_rejects_mismatched_members(tmp_path):
+    archive = io.BytesIO()
+    await write_archive([2], 2, archive)
+
+    # dropping the documents
+    archive.seek(0)
+    path = tmp_path / 'broken.tar'
+    with tarfile.open(fileobj=archive) as src, tarfile.open(path, 'w') as dst:
+        for member in src.getmembers():
+            if member.name != 'documents.jsonl':
+                dst.addfile(member, src.extractfile(member))
+
+    with pytest.raises(CollectionArchiveError):
+        CollectionArchiveReader(str(path))
+
+
+@pytest.mark.asyncio
+async def test_collection_archive_streams_embeddings_before_the_last_page():
+    pages = []
+
+    async def tracked_pages():
+        async for res in fake_pages([2, 2]):
+            pages.append(res)
+            yield res
+
+    stream = stream_archive(tracked_pages(), 4, 'fake', 'all-MiniLM-L6-v2', 'cosine')
+    chunks = [await anext(stream) for _ in range(3)]
+
+    # manifest, embeddings header and the rows of the first page
+    assert len(pages) == 1
+    assert chunks[2] == np.asarray(pages[0]['embeddings'], dtype='<f4').tobytes()
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_collection_archive_leaves_out_documents_past_the_count(tmp_path):
+    path = tmp_path / 'fake.tar'
+    with open(path, 'wb') as file:
+        await write_archive([2, 2], 3, file)
+
+    with tarfile.open(path) as tar:
+        assert [member.name for member in tar.getmembers()] == ['manifest.json', 'embeddings.npy', 'documents.jsonl']
+
+    with CollectionArchiveReader(str(path)) as reader:
+        assert [record.id_ for record in reader.records()] == ['id-0', 'id-1', 'id-2']
+
+
+@pytest.mark.asyncio
+async def test_collection_archive_raises_if_documents_are_missing():
+    with pytest.raises(CollectionArchiveError):
+        await write_archive([2], 3, io.BytesIO())
@@ -1,6 +1,8 @@
 from copy import copy
+from multiprocessing.shared_memory import SharedMemory
 
 import numpy
+import pymupdf
 from chromadb.utils.embedding_functions import EmbeddingFunction
 from langchain_unstructured.document_loaders import UnstructuredLoader
 from langchain_core.documents.base import Document
@@ -9,14 +11,22 @@ from langchain_core.prompts import ChatPromptTemplate
 from src.enums import Device
 from src.adapters.chat_model import LangchainChatModel
 from src.adapters.codecs import FakeCodec
+from src.adapters.embedding_model_registry import EmbeddingModelRegistry
 from src.domain.models import (
     ApiKeyCredential,
     DocProcessingConfig,
     ChatModel,
     EmbeddingModel,
+    SemanticDocProcessingConfig,
     VectorDocument
 )
-from src.domain.services.load_document_service import LoadDocumentService
+from src.domain.services import load_document_service
+from src.domain.services.load_document_service import (
+    LoadDocumentService,
+    SemanticLoadDocumentService,
+    SharedFile,
+    extract_pdf_pages
+)
 from src.domain.services import EncodeApiKeyCredentialService
 from src.domain.services.chat_model_builder import ChatModelBuilder
 from src.domain.services.chat_prompt_template_builder import ChatPromptTemplateBuilder
@@ -210,7 +220,9 @@ def test_embedding_model_builder_builds_models():
         device=Device.CPU
     )
 
-    assert isinstance(EmbeddingModelBuilder(FakeCodec('fake-key')).build(model), EmbeddingFunction)
+    registry = EmbeddingModelRegistry(memory_budget=2 ** 32)
+
+    assert isinstance(EmbeddingModelBuilder(FakeCodec('fake-key'), registry).build(model), EmbeddingFunction)
 
 
 def test_load_document_service_builds_config():
@@ -294,7 +306,41 @@ def test_chat_prompt_template_builder_formats_context():
 
     res = ChatPromptTemplateBuilder.format_context(vector_docs)
 
-    assert res == 'Hello\nworld!'
+    assert res == '{{Hello}}\nworld!'
+    assert vector_docs[0].document == '{Hello}'
+
+
+def test_chat_prompt_template_builder_keeps_braces_of_context():
+    vector_docs = [VectorChromaDocument('fake', '{Hello}', metadata={})]
+
+    prompt = ChatPromptTemplateBuilder.build('{fake}', vector_docs)
+    messages = prompt.format_messages(input='hey')
+
+    assert messages[1].content == 'Context: {Hello}'
+    assert messages[2].content == 'Preferences: {fake}'
+
+
+def test_chat_prompt_template_builder_assembles_context_within_budget():
+    def doc(text: str, chunk_index: int, filename: str = 'fake.pdf') -> VectorChromaDocument:
+        return VectorChromaDocument('fake', text, metadata={'filename': filename, 'chunk_index': chunk_index})
+
+    docs = [
+        doc('second part of the text', 1),
+        doc('Second part of the text!', 5),  # near-duplicate
+        doc('first part of the text', 0),
+        doc('text of an other file', 2, filename='other.pdf'),
+        doc('a very long chunk ' * 100, 3),  # over the budget
+    ]
+    builder = ChatPromptTemplateBuilder(token_budget=100)
+
+    context_docs, tokens = builder.assemble_context(docs, count_tokens=lambda text: len(text.split()))
+
+    assert [d.document for d in context_docs] == [
+        'first part of the text\nsecond part of the text',
+        'text of an other file'
+    ]
+    assert tokens == 15
+    assert docs[0].document == 'second part of the text'
 
 
 def test_chat_prompt_template_builder_builds_prompt():
@@ -319,3 +365,59 @@ def test_chat_prompt_template_builder_builds_prompt():
     )
 
     assert isinstance(res, ChatPromptTemplate)
+
+
+def fake_pdf(pages: list[str]) -> bytes:
+    doc = pymupdf.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+
+    return doc.tobytes()
+
+
+def test_extract_pdf_pages_opens_shared_pdf_once_and_closes_least_recently_used(monkeypatch):
+    monkeypatch.setattr(load_document_service, 'max_shared_pdfs', 1)
+    bytes_ = fake_pdf(['one', 'two', 'three'])
+    shms = [SharedMemory(create=True, size=len(bytes_)) for _ in range(2)]
+    try:
+        for shm in shms:
+            shm.buf[:len(bytes_)] = bytes_
+        first, second = (SharedFile(shm.name, len(bytes_)) for shm in shms)
+
+        assert extract_pdf_pages(first, 'pdf', 0, 1) == ['one\n']
+        doc = load_document_service._shared_pdfs[first.name][2]
+        assert extract_pdf_pages(first, 'pdf', 1, 3) == ['two\n', 'three\n']
+        assert load_document_service._shared_pdfs[first.name][2] is doc
+
+        extract_pdf_pages(second, 'pdf', 0, 1)
+        assert list(load_document_service._shared_pdfs) == [second.name]
+        assert doc.is_closed
+    finally:
+        load_document_service.close_shared_pdfs()
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+
+async def test_semantic_load_document_service_extracts_pages_in_parallel_and_joins_sentences_across_pages():
+    def fake_ef(input):
+        return [numpy.array([1.0, 0.0] if 'cat' in sentence else [0.0, 1.0]) for sentence in input]
+
+    service = SemanticLoadDocumentService(pages_per_task=1, page_prefetch=2)
+    files = {
+        'cats.pdf': fake_pdf(['The cat sat.', 'The cat', 'purred. A car drove.']),
+        'cars.pdf': fake_pdf(['The car stopped.'])
+    }
+
+    docs = await service.load_async(
+        files=files,
+        doc_proc_cnf=SemanticDocProcessingConfig(name='fake', thresh=0.5, max_chunk_size=10),
+        embedding_function=fake_ef
+    )
+
+    assert [(doc.metadata['filename'], doc.page_content) for doc in docs] == [
+        ('cats.pdf', 'The cat sat. The cat purred.'),
+        ('cats.pdf', 'A car drove.'),
+        ('cars.pdf', 'The car stopped.')
+    ]
+    assert all(doc.embedding is not None for doc in docs)
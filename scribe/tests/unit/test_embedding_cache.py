@@ -0,0 +1,101 @@
+import numpy as np
+
+from src.adapters.embedding_cache import (
+    SqliteEmbeddingCache,
+    CachedEmbeddingFunction,
+    QueryEmbeddingCache,
+    CachedQueryEmbeddingFunction
+)
+
+
+def fake_ef_with_calls():
+    calls = []
+
+    def fake_ef(input):
+        calls.append(list(input))
+        return [np.array([len(text), 1.0], dtype=np.float32) for text in input]
+
+    return fake_ef, calls
+
+
+def test_cached_embedding_function_embeds_only_missing_documents():
+    fake_ef, calls = fake_ef_with_calls()
+    ef = CachedEmbeddingFunction(fake_ef, cache=SqliteEmbeddingCache(':memory:', max_bytes=2 ** 20), model='fake')
+
+    ef(['a', 'bb'])
+    embeddings = ef(['bb', 'ccc', 'a'])
+
+    assert calls == [['a', 'bb'], ['ccc']]
+    assert [e[0] for e in embeddings] == [2, 3, 1]
+
+
+def test_embedding_cache_separates_models():
+    cache = SqliteEmbeddingCache(':memory:', max_bytes=2 ** 20)
+    cache.put_many('model-a', {'hash': np.ones(2)})
+
+    assert cache.get_many('model-b', ['hash']) == {}
+    assert 'hash' in cache.get_many('model-a', ['hash'])
+
+
+def test_embedding_cache_evicts_least_recently_used():
+    # every embedding takes 8 bytes (2 x float32)
+    cache = SqliteEmbeddingCache(':memory:', max_bytes=16)
+    cache.put_many('fake', {'first': np.ones(2)})
+    cache.put_many('fake', {'second': np.ones(2)})
+    cache.get_many('fake', ['first'])
+    cache.put_many('fake', {'third': np.ones(2)})
+
+    assert set(cache.get_many('fake', ['first', 'second', 'third'])) == {'first', 'third'}
+    assert cache.size == 16
+
+
+def test_embedding_cache_persists_embeddings(tmp_path):
+    path = str(tmp_path / 'embedding_cache.db')
+    cache = SqliteEmbeddingCache(path, max_bytes=2 ** 20)
+    cache.put_many('fake', {'hash': np.array([0.5, 0.25])})
+    cache.close()
+
+    cache = SqliteEmbeddingCache(path, max_bytes=2 ** 20)
+
+    assert cache.get_many('fake', ['hash'])['hash'].tolist() == [0.5, 0.25]
+    assert cache.size == 8
+
+
+def test_query_embedding_cache_normalizes_queries():
+    fake_ef, calls = fake_ef_with_calls()
+    ef = CachedQueryEmbeddingFunction(fake_ef, cache=QueryEmbeddingCache(max_entries=10), model='fake')
+
+    ef(['what is  scribe?'])
+    ef([' what is scribe? '])
+
+    assert len(calls) == 1
+
+
+def test_query_embedding_cache_expires_entries():
+    now = [0.0]
+    cache = QueryEmbeddingCache(max_entries=10, ttl=60, clock=lambda: now[0])
+    cache.put('fake', 'query', np.ones(2))
+
+    now[0] = 61.0
+
+    assert cache.get('fake', 'query') is None
+
+
+def test_query_embedding_cache_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put('fake', 'first', np.ones(2))
+    cache.put('fake', 'second', np.ones(2))
+    cache.get('fake', 'first')
+    cache.put('fake', 'third', np.ones(2))
+
+    assert cache.get('fake', 'second') is None
+    assert cache.get('fake', 'first') is not None
+
+
+def test_query_embedding_cache_warms_missing_queries_with_one_call():
+    fake_ef, calls = fake_ef_with_calls()
+    cache = QueryEmbeddingCache(max_entries=10)
+    cache.put('fake', 'cached', np.ones(2))
+
+    assert cache.warm('fake', ['cached', 'first', 'second', 'first'], fake_ef) == 2
+    assert calls == [['first', 'second']]
@@ -0,0 +1,45 @@
+import pytest
+
+from src.adapters.embedding_model_registry import EmbeddingModelRegistry, LocalEmbeddingFunction
+from src.enums import EmbeddingModelName, Device
+
+
+class FakeModel:
+    def __init__(self, name: EmbeddingModelName, device: Device):
+        self.name = name
+        self.device = device
+
+
+@pytest.fixture
+def registry():
+    return EmbeddingModelRegistry(
+        memory_budget=100,
+        loader=lambda name, device: FakeModel(name, device),
+        sizer=lambda model: 60
+    )
+
+
+def test_registry_loads_model_once(registry):
+    ef_1 = registry.get(EmbeddingModelName.ALL_MINILM_L6_V2, Device.CPU)
+    ef_2 = registry.get(EmbeddingModelName.ALL_MINILM_L6_V2, Device.CPU)
+
+    assert isinstance(ef_1, LocalEmbeddingFunction)
+    assert ef_1.model is ef_2.model
+    assert registry.loads == 1
+    assert registry.hits == 1
+
+
+def test_registry_keys_models_by_device(registry):
+    ef_cpu = registry.get(EmbeddingModelName.ALL_MINILM_L6_V2, Device.CPU)
+    ef_cuda = registry.get(EmbeddingModelName.ALL_MINILM_L6_V2, Device.CUDA)
+
+    assert ef_cpu.model is not ef_cuda.model
+
+
+def test_registry_evicts_least_recently_used_model_over_budget(registry):
+    registry.get(EmbeddingModelName.ALL_MINILM_L6_V2, Device.CPU)
+    registry.get(EmbeddingModelName.XLM_ROBERTA_UA_DISTILLED, Device.CPU)
+
+    assert registry.evictions == 1
+    assert registry.memory_usage == 60
+    assert registry.stats()['models'] == [f'{EmbeddingModelName.XLM_ROBERTA_UA_DISTILLED.value}:cpu']
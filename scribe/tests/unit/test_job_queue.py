@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+from src.adapters.job_queue import ThreadedAsyncJobQueue
+
+
+def test_job_queue_executes_put_jobs():
+    done = []
+    finished = threading.Event()
+
+    async def execute(job_id: int):
+        done.append(job_id)
+        if len(done) == 3:
+            finished.set()
+
+    queue = ThreadedAsyncJobQueue(workers=2)
+    queue.start(execute)
+    for job_id in [1, 2, 3]:
+        queue.put(job_id)
+
+    assert finished.wait(timeout=5)
+    queue.stop()
+
+    assert sorted(done) == [1, 2, 3]
+
+
+def test_job_queue_cancels_running_job():
+    started = threading.Event()
+    cancelled = threading.Event()
+
+    async def execute(job_id: int):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    queue = ThreadedAsyncJobQueue(workers=1)
+    queue.start(execute)
+    queue.put(1)
+
+    assert started.wait(timeout=5)
+    assert queue.cancel(1)
+    assert cancelled.wait(timeout=5)
+    assert not queue.cancel(2)  # not running jobs are not cancelled by the queue
+    queue.stop()
+
+
+def test_job_queue_tears_down_worker_loops_on_stop():
+    loops = []
+
+    async def teardown():
+        loops.append(asyncio.get_running_loop())
+
+    queue = ThreadedAsyncJobQueue(workers=2)
+    queue.start(lambda job_id: asyncio.sleep(0), teardown=teardown)
+    queue.stop()
+
+    assert len(set(loops)) == 2
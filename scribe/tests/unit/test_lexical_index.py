@@ -0,0 +1,117 @@
+import pytest
+
+from src.adapters.lexical_index import SqliteBM25Index, reciprocal_rank_fusion, tokenize
+from src.adapters.vector_collection_repository import AsyncChromaDocumentRepository
+from src.domain.models import VectorDocument
+from src.enums import RetrievalMode
+
+
+@pytest.fixture
+def index():
+    index = SqliteBM25Index(':memory:')
+    index.add(
+        'fake',
+        ids=['a', 'b', 'c'],
+        documents=[
+            'The server returned ERR_4031 after the upgrade.',
+            'Upgrade guide for the server.',
+            'Nothing related here.'
+        ],
+        metadatas=[{'filename': 'errors.txt'}, {'filename': 'guide.txt'}, {'url': 'https://fake.com'}]
+    )
+    return index
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert tokenize('Got ERR_4031, see E1234.') == ['got', 'err_4031', 'see', 'e1234']
+
+
+def test_bm25_index_ranks_exact_terms_first(index):
+    assert [id_ for id_, _ in index.search('fake', 'err_4031 server', n_results=3)] == ['a', 'b']
+    assert index.search('other', 'err_4031', n_results=3) == []
+
+
+def test_bm25_index_filters_and_deletes_by_doc_name(index):
+    assert [id_ for id_, _ in index.search('fake', 'server', 3, doc_names=['guide.txt'])] == ['b']
+
+    index.delete('fake', 'errors.txt')
+    assert index.count('fake') == 2
+    assert index.search('fake', 'err_4031', n_results=3) == []
+
+    index.drop('fake')
+    assert index.count('fake') == 0
+
+
+def test_bm25_index_deletes_by_ids(index):
+    index.delete_ids('fake', ['a', 'c'])
+
+    assert index.count('fake') == 1
+    assert [id_ for id_, _ in index.search('fake', 'server', n_results=3)] == ['b']
+
+
+def test_reciprocal_rank_fusion_prefers_ids_ranked_by_both():
+    assert reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'd']])[0] == 'b'
+
+
+@pytest.mark.asyncio
+async def test_document_repository_hybrid_query_fuses_lexical_only_documents(index):
+    class FakeCollection:
+        name = 'fake'
+
+        async def count(self):
+            return 3
+
+        async def query(self, **kwargs):
+            return {'ids': [['c']], 'documents': [['Nothing related here.']], 'metadatas': [[{}]],
+                    'embeddings': None, 'distances': [[0.5]]}
+
+        async def get(self, ids, include):
+            self.get_ids = ids
+            return {'ids': ids, 'documents': ['fake'] * len(ids), 'metadatas': [{}] * len(ids), 'embeddings': None}
+
+    collection = FakeCollection()
+    index.mark_backfilled('fake')
+    repo = AsyncChromaDocumentRepository(collection, lexical_index=index)  # type: ignore
+
+    docs = await repo.query('err_4031', n_results=2, mode=RetrievalMode.HYBRID)
+
+    assert collection.get_ids == ['a']
+    assert [doc.distance for doc in docs] == [0.5, None]
+
+
+@pytest.mark.asyncio
+async def test_document_repository_backfills_collection_populated_before_index_once_added_to():
+    class FakeCollection:
+        name = 'old'
+
+        def __init__(self):
+            self.docs = {'old-1': ('Legacy ERR_4031 report.', {'filename': 'old.txt'})}
+
+        async def count(self):
+            return len(self.docs)
+
+        async def add(self, ids, metadatas, documents, embeddings=None):
+            self.docs.update(zip(ids, zip(documents, metadatas)))
+
+        async def get(self, include, ids=None, limit=None, offset=None):
+            ids = ids if ids is not None else list(self.docs)[offset:offset + limit]
+            return {
+                'ids': ids,
+                'documents': [self.docs[id_][0] for id_ in ids],
+                'metadatas': [self.docs[id_][1] for id_ in ids],
+                'embeddings': None
+            }
+
+    index = SqliteBM25Index(':memory:')
+    collection = FakeCollection()
+    repo = AsyncChromaDocumentRepository(collection, lexical_index=index)  # type: ignore
+
+    # the new chunk is indexed on add, the old one only by the backfill
+    await repo.add([VectorDocument('New upgrade notes.', {'filename': 'new.txt'})])
+    assert index.count('old') == 1
+
+    docs = await repo.query('err_4031', n_results=2, mode=RetrievalMode.LEXICAL)
+
+    assert [doc.document for doc in docs] == ['Legacy ERR_4031 report.']
+    assert index.count('old') == 2
+    assert index.is_backfilled('old')
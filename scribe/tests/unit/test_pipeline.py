@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from src.system.pipeline import AsyncPipeline, abatched, aiter_items
+
+
+@pytest.mark.asyncio
+async def test_pipeline_passes_items_through_stages():
+    results = []
+
+    async def double(x):
+        return x * 2
+
+    async def collect(x):
+        results.append(x)
+
+    await AsyncPipeline(aiter_items(range(10))).pipe(double, workers=3).pipe(collect).run()
+
+    assert sorted(results) == [x * 2 for x in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_bounds_items_in_flight():
+    produced = 0
+
+    async def source():
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield i
+
+    async def slow(x):
+        await asyncio.sleep(0.01)
+
+    pipeline = asyncio.create_task(AsyncPipeline(source(), maxsize=2).pipe(slow).run())
+    await asyncio.sleep(0.025)
+
+    # consumed items + queued items + one item waiting to be put
+    assert produced <= 3 + 2 + 1
+
+    pipeline.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await pipeline
+
+
+@pytest.mark.asyncio
+async def test_pipeline_raises_stage_error():
+    async def fail(x):
+        if x == 3:
+            raise ValueError('fake error')
+
+    with pytest.raises(ValueError):
+        await AsyncPipeline(aiter_items(range(10))).pipe(fail, workers=2).run()
+
+
+@pytest.mark.asyncio
+async def test_abatched_groups_items():
+    batches = [batch async for batch in abatched(aiter_items(range(5)), 2)]
+
+    assert batches == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,31 @@
+import asyncio
+import multiprocessing
+import time
+
+import pytest
+
+from src.system.process_pool import KillableProcessPool
+
+
+@pytest.mark.asyncio
+async def test_killable_process_pool_kills_timed_out_task_and_resubmits_the_others():
+    pool = KillableProcessPool(max_workers=2, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        assert await pool.run(30, pow, 2, 3) == 8  # workers are spawned
+
+        killed_pool = pool._pool
+        processes = list(killed_pool._processes.values())
+        # the other task is running in the killed pool, it's resubmitted to the new one
+        other = asyncio.ensure_future(pool.run(30, time.sleep, 1))
+        await asyncio.sleep(0.2)
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(0.5, time.sleep, 60)
+
+        assert pool._pool is not killed_pool
+        for process in processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+        assert await other is None
+        assert await pool.run(30, pow, 2, 4) == 16
+    finally:
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,36 @@
+from src.adapters.chroma_models import VectorChromaDocument
+from src.adapters.reranker import CrossEncoderReranker
+from src.enums import RerankerModelName, Device
+
+
+class FakeCrossEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.calls.append((pairs, batch_size))
+        # longer documents are scored higher
+        return [len(document) for _, document in pairs]
+
+
+def test_cross_encoder_reranker_keeps_best_documents():
+    loads = []
+
+    def fake_loader(name, device):
+        loads.append((name, device))
+        return FakeCrossEncoder()
+
+    reranker = CrossEncoderReranker(
+        RerankerModelName.MS_MARCO_MINILM_L6_V2,
+        Device.CPU,
+        batch_size=8,
+        loader=fake_loader
+    )
+    docs = [VectorChromaDocument(id_=str(i), document='a' * i, metadata={}) for i in [2, 5, 1, 3]]
+
+    reranked = reranker.rerank('fake', docs, top_k=2)
+    reranker.rerank('fake', docs, top_k=2)
+
+    assert [doc.document for doc in reranked] == ['aaaaa', 'aaa']
+    assert reranker.model.calls[0][1] == 8
+    assert len(loads) == 1
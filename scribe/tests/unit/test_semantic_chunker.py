@@ -0,0 +1,36 @@
+import numpy as np
+
+from src.domain.services.semantic_chunker import VectorizedSemanticChunker
+
+
+def fake_ef_with_calls():
+    calls = []
+    topics = {'cat': [1.0, 0.0], 'car': [0.0, 1.0]}
+
+    def fake_ef(input):
+        calls.append(list(input))
+        return [np.array(topics[sentence.split()[0]], dtype=np.float32) for sentence in input]
+
+    return fake_ef, calls
+
+
+def test_semantic_chunker_splits_on_topic_change_and_max_chunk_size():
+    fake_ef, calls = fake_ef_with_calls()
+    sentences = ['cat 1', 'cat 2', 'cat 3', 'car 1', 'car 2', 'cat 4']
+    chunker = VectorizedSemanticChunker(fake_ef, thresh=0.5, max_chunk_size=2, batch_size=4)
+
+    chunks = chunker(sentences)
+
+    assert [chunk.sentences for chunk in chunks] == [['cat 1', 'cat 2'], ['cat 3'], ['car 1', 'car 2'], ['cat 4']]
+    assert calls == [sentences[:4], sentences[4:]]
+
+
+def test_semantic_chunker_reuses_sentence_embeddings_for_chunks():
+    fake_ef, calls = fake_ef_with_calls()
+    chunker = VectorizedSemanticChunker(fake_ef, thresh=-1.0, max_chunk_size=10)
+
+    chunks = chunker(['cat 1', 'car 1'])
+
+    assert len(calls) == 1
+    assert chunks[0].size == 2
+    np.testing.assert_allclose(chunks[0].embedding, [0.5, 0.5])
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.enums import TraceExporter
+from src.system.tracing import ingestion_stage, setup_tracing
+
+
+def stage_count(service: str, stage: str) -> float:
+    return REGISTRY.get_sample_value(
+        'scribe_ingestion_stage_seconds_count',
+        dict(service=service, stage=stage)
+    ) or 0.0
+
+
+def test_setup_tracing_is_disabled_by_default():
+    assert setup_tracing(TraceExporter.NONE) is None
+
+
+def test_ingestion_stage_exports_spans_and_observes_successful_stages(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    provider = setup_tracing(TraceExporter.FILE, file_path=str(path))
+    before = stage_count('fake', 'parse')
+
+    with ingestion_stage('fake', 'parse', document='fake.txt') as span:
+        span.set_attribute('elements', 3)
+
+    with pytest.raises(ValueError):
+        with ingestion_stage('fake', 'parse', document='broken.txt'):
+            raise ValueError
+
+    provider.shutdown()
+
+    assert stage_count('fake', 'parse') == before + 1
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [span['name'] for span in spans] == ['fake.parse', 'fake.parse']
+    assert spans[0]['attributes'] == {'document': 'fake.txt', 'elements': 3}
+    assert spans[1]['status']['status_code'] == 'ERROR'
@@ -0,0 +1,198 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from src.adapters.chroma_models import decode_embedding, get_result_to_ndjson
+from src.adapters.vector_collection_repository import AsyncChromaDocumentRepository
+from src.domain.models import VectorDocument
+
+
+class FakeAsyncCollection:
+    name = 'fake'
+
+    def __init__(self):
+        self.add_calls = []
+
+    async def add(self, ids, metadatas, documents, embeddings=None):
+        self.add_calls.append(dict(ids=ids, metadatas=metadatas, documents=documents, embeddings=embeddings))
+
+
+@pytest.fixture
+def fake_docs():
+    return [VectorDocument(f'doc {i}', {'filename': 'fake.txt'}) for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_document_repository_adds_documents_in_batches(fake_docs):
+    collection = FakeAsyncCollection()
+    await AsyncChromaDocumentRepository(collection).add(fake_docs, batch_size=4)  # type: ignore
+
+    assert [len(call['ids']) for call in collection.add_calls] == [4, 4, 2]
+
+
+@pytest.mark.asyncio
+async def test_document_repository_removes_duplicate_ids(fake_docs):
+    collection = FakeAsyncCollection()
+    await AsyncChromaDocumentRepository(collection).add(fake_docs + fake_docs[:3])  # type: ignore
+
+    assert collection.add_calls[0]['ids'] == [doc.id_ for doc in fake_docs]
+
+
+@pytest.mark.asyncio
+async def test_document_repository_embeds_batch_with_one_call(fake_docs):
+    calls = []
+
+    def fake_ef(input):
+        calls.append(input)
+        return [[0.1, 0.2] for _ in input]
+
+    collection = FakeAsyncCollection()
+    await AsyncChromaDocumentRepository(collection, embedding_function=fake_ef).add(fake_docs, batch_size=5)  # type: ignore
+
+    assert len(calls) == 2
+    assert len(collection.add_calls[0]['embeddings']) == 5
+
+
+@pytest.mark.asyncio
+async def test_document_repository_stores_streamed_documents_before_source_is_exhausted(fake_docs):
+    collection = FakeAsyncCollection()
+    stored_before_last_doc = []
+
+    async def stream():
+        for doc in fake_docs:
+            await asyncio.sleep(0.001)
+            stored_before_last_doc.append(len(collection.add_calls))
+            yield doc
+
+    await AsyncChromaDocumentRepository(collection).add(stream(), batch_size=2)  # type: ignore
+
+    assert stored_before_last_doc[-1] > 0
+    assert sum(len(call['ids']) for call in collection.add_calls) == 10
+
+
+@pytest.mark.asyncio
+async def test_document_repository_queries_with_embedded_query():
+    class FakeQueryCollection:
+        async def query(self, **kwargs):
+            self.kwargs = kwargs
+            return {'ids': [[]], 'documents': [[]], 'metadatas': [[]], 'embeddings': [[]], 'distances': [[]]}
+
+    collection = FakeQueryCollection()
+    await AsyncChromaDocumentRepository(collection, embedding_function=lambda input: [[0.1, 0.2]]).query('fake')  # type: ignore
+
+    assert collection.kwargs['query_embeddings'] == [[0.1, 0.2]]
+    assert 'query_texts' not in collection.kwargs
+
+
+@pytest.mark.asyncio
+async def test_document_repository_fetches_embeddings_only_on_request():
+    class FakeGetCollection:
+        async def get(self, **kwargs):
+            self.include = kwargs['include']
+            embeddings = [[0.1, 0.2]] if 'embeddings' in self.include else None
+            return {'ids': ['fake-id'], 'documents': ['fake'], 'metadatas': [{}], 'embeddings': embeddings}
+
+    collection = FakeGetCollection()
+    repo = AsyncChromaDocumentRepository(collection)  # type: ignore
+
+    docs = await repo.read_all(limit=None, offset=None)
+    assert 'embeddings' not in collection.include
+    assert docs[0].embedding is None
+
+    docs = await repo.read_all(limit=None, offset=None, include_embeddings=True)
+    assert docs[0].embedding == '[0.1 ... 0.2] 2 items'
+
+
+@pytest.mark.asyncio
+async def test_document_repository_stores_precomputed_embeddings():
+    def fake_ef(input):
+        raise AssertionError('documents with embeddings should not be embedded')
+
+    docs = [VectorDocument(f'doc {i}', {'filename': 'fake.pdf'}, embedding=[float(i), 1.0]) for i in range(3)]
+    collection = FakeAsyncCollection()
+    await AsyncChromaDocumentRepository(collection, embedding_function=fake_ef).add(docs)  # type: ignore
+
+    assert collection.add_calls[0]['embeddings'] == [[0.0, 1.0], [1.0, 1.0], [2.0, 1.0]]
+
+
+class FakeStoringAsyncCollection(FakeAsyncCollection):
+    def __init__(self):
+        super().__init__()
+        self.metadatas = {}
+
+    async def add(self, ids, metadatas, documents, embeddings=None):
+        await super().add(ids, metadatas, documents, embeddings)
+        self.metadatas.update(zip(ids, metadatas))
+
+    async def get(self, where, include):
+        names = where['$or'][0]['filename']['$in']
+        return {'ids': [id_ for id_, metadata in self.metadatas.items() if metadata['filename'] in names]}
+
+    async def delete(self, ids):
+        for id_ in ids:
+            del self.metadatas[id_]
+
+    async def update(self, ids, metadatas):
+        self.metadatas.update(zip(ids, metadatas))
+
+
+@pytest.mark.asyncio
+async def test_document_repository_upsert_stores_only_changed_chunks():
+    collection = FakeStoringAsyncCollection()
+    repo = AsyncChromaDocumentRepository(collection)  # type: ignore
+    await repo.add([VectorDocument(f'doc {i}', {'filename': 'fake.txt', 'chunk_index': i}) for i in range(3)])
+    await repo.add([VectorDocument('other', {'filename': 'other.txt', 'chunk_index': 0})])
+
+    revised = [VectorDocument(text, {'filename': 'fake.txt', 'chunk_index': i}) for i, text in enumerate(
+        ['new', 'doc 0', 'doc 2']
+    )]
+    diff = await repo.upsert(revised)
+
+    assert diff == (1, 1, 2)
+    assert collection.add_calls[-1]['ids'] == [revised[0].id_]
+    assert set(collection.metadatas) == {doc.id_ for doc in revised} | {VectorDocument('other', {}).id_}
+    assert collection.metadatas[revised[2].id_]['chunk_index'] == 2
+
+
+class FakePagedCollection:
+    def __init__(self, size: int):
+        self.size = size
+        self.calls = []
+
+    async def get(self, limit, offset, include):
+        self.calls.append((offset, limit))
+        ids = [f'id-{i}' for i in range(offset, min(offset + limit, self.size))]
+        return {
+            'ids': ids,
+            'documents': [f'doc {id_}' for id_ in ids],
+            'metadatas': [{'filename': 'fake.txt'} for _ in ids],
+            'embeddings': np.ones((len(ids), 3), dtype=np.float32) if 'embeddings' in include else None
+        }
+
+
+@pytest.mark.asyncio
+async def test_document_repository_reads_collection_in_pages():
+    collection = FakePagedCollection(size=10)
+    repo = AsyncChromaDocumentRepository(collection)  # type: ignore
+
+    pages = [res['ids'] async for res in repo.read_pages(page_size=4)]
+    assert [len(ids) for ids in pages] == [4, 4, 2]
+
+    pages = [res['ids'] async for res in repo.read_pages(page_size=4, offset=3, limit=5)]
+    assert sum(pages, []) == [f'id-{i}' for i in range(3, 8)]
+    assert collection.calls[-2:] == [(3, 4), (7, 1)]
+
+
+@pytest.mark.asyncio
+async def test_document_repository_pages_serialize_to_ndjson():
+    repo = AsyncChromaDocumentRepository(FakePagedCollection(size=2))  # type: ignore
+
+    async for res in repo.read_pages(page_size=10, include_embeddings=True):
+        lines = get_result_to_ndjson(res).decode().splitlines()
+
+        record = json.loads(lines[1])
+        assert record['id'] == 'id-1'
+        assert record['metadata'] == {'filename': 'fake.txt'}
+        np.testing.assert_array_equal(decode_embedding(record['embedding']), [1, 1, 1])
@@ -303,7 +303,6 @@ export default function Page() {
                                         <CardContent>
                                             <Typography><strong>ID:</strong> {query.id_}</Typography>
                                             <Typography><strong>Distance:</strong> {query.distance}</Typography>
-                                            <Typography><strong>Embedding:</strong> {query.embedding}</Typography>
                                             <Typography><strong>Document:</strong> {query.document}</Typography>
                                             {/* Metadata*/}
                                             <Typography component={"pre"}>
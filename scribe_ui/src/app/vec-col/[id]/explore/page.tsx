@@ -52,7 +52,8 @@ export default function Page() {
         const request = {
             query_string: query,
             doc_names: docs,
-            n_results: nResults
+            n_results: nResults,
+            include_embeddings: true
         }
 
         try {
@@ -102,7 +102,7 @@ export default function Page() {
     async function fetchVectorCollectionPeek() {
         try {
             const response = await fetch(
-                `${API_URL}/vec-doc/${id}/peek`,
+                `${API_URL}/vec-doc/${id}/peek?include_embeddings=true`,
                 {
                     method: 'GET'
                 }
@@ -296,8 +296,8 @@ export default function Page() {
                 }
             );
 
-            if (response.status === 201) {
-                setSnackbarMessage(`docs were successfully uploaded 🥳`);
+            if (response.status === 202) {
+                setSnackbarMessage(`docs were successfully queued for ingestion 🥳`);
                 setOpenSnackbar(true);
 
                 // emptying selected files, and refetching the peek
@@ -31,7 +31,7 @@ export interface MetadataModel {
 export interface VectorDocumentResponseModel {
     id_: string,
     distance: number | null,
-    embedding: string,
+    embedding: string | null,
     document: string,
     metadata: MetadataModel
 }
\ No newline at end of file